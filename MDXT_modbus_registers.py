@@ -17,7 +17,7 @@ VM = 337 # Max Velocity 32Bit
 AC = 345 # Point to Point Acceleration 32Bit
 DE = 347 # Point to Point Deceleration 32Bit
 VE = 349 # Point to Point Velocity 32Bit 
-AM = 353 # Max Brake Deceleration 32 Bit
+AM = 335 # Max Brake Deceleration 32 Bit
 JA = 339 # Jog Acceleration 32 Bit
 JL = 341 # Jog Deceleration 32 Bit
 JS = 343 # Jog Speed 32 Bit
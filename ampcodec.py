@@ -0,0 +1,117 @@
+import struct
+
+# struct format character for (register count, signed)
+_FORMATS = {(1, False): 'H', (1, True): 'h', (2, False): 'I', (2, True): 'i'}
+
+
+class BlockLayout(object):
+    """
+    Precompiled decoder for one contiguous block read. A single unpack_from call turns the
+    block's registers into every field value, unused registers in between are skipped.
+    """
+    __slots__ = ('count', 'names', '_registers', '_fields')
+
+    def __init__(self, codec, start, count, fields):
+        """
+        :param codec: The RegisterCodec the block is decoded with.
+        :param start: First register of the block.
+        :param count: Number of registers in the block.
+        :param fields: Iterable of (name, register, register count, signed), in any order.
+        """
+        self.count = count
+        fields = sorted(fields, key=lambda field: field[1])
+        self.names = tuple(field[0] for field in fields)
+        layout, position = [codec.value_order], start
+        for _, register, width, signed in fields:
+            if register < position:
+                raise ValueError('Overlapping fields in block starting at {}'.format(start))
+            if register > position:
+                layout.append('{}x'.format(2 * (register - position)))
+            layout.append(_FORMATS[(width, signed)])
+            position = register + width
+        self._registers = struct.Struct('{}{}H'.format(codec.register_order, count))
+        self._fields = struct.Struct(''.join(layout))
+
+    def decode(self, registers):
+        """
+        :param registers: Register values returned by the block read, at least count of them.
+        :return: A tuple of field values, in the order of self.names
+        """
+        return self._fields.unpack_from(self._registers.pack(*registers[:self.count]))
+
+
+class RegisterCodec(object):
+
+    def __init__(self, byteorder='big', wordorder='big'):
+        """
+        Encodes and decodes 16 and 32 bit register values with precompiled struct.Struct objects.
+        :param byteorder: 'big' or 'little', order of the two bytes inside each register.
+        :param wordorder: 'big' or 'little', order of the two registers of a 32 bit value.
+        """
+        assert byteorder in ('big', 'little') and wordorder in ('big', 'little')
+        self.byteorder = byteorder
+        self.wordorder = wordorder
+        # Registers are packed to bytes in register_order and values are unpacked in value_order.
+        # Together the two cover all four byte/word order combinations.
+        self.register_order = '>' if byteorder == wordorder else '<'
+        self.value_order = '>' if wordorder == 'big' else '<'
+        self._values = {key: struct.Struct(self.value_order + fmt) for key, fmt in _FORMATS.items()}
+        self._words = {count: struct.Struct('{}{}H'.format(self.register_order, count)) for count in (1, 2)}
+        self._blocks = {}
+
+    def __reduce__(self):
+        # The precompiled Structs can not be pickled, e.g. when a codec is passed to a worker process
+        return RegisterCodec, (self.byteorder, self.wordorder)
+
+    def decode(self, registers, width, signed, offset=0) -> int:
+        """
+        Decodes one value from a list of registers.
+        :param registers: Register values returned by a read.
+        :param width: 1 for a 16 bit value, 2 for a 32 bit value.
+        :param signed: Whether the value is two's complement.
+        :param offset: Index of the value's first register.
+        :return: The decoded integer
+        """
+        data = self._words[width].pack(*registers[offset:offset + width])
+        return self._values[(width, signed)].unpack(data)[0]
+
+    def encode(self, value, width, signed=None) -> list:
+        """
+        Encodes one value into registers. Negative values are written as two's complement.
+        :param value: The integer to encode.
+        :param width: 1 for a 16 bit value, 2 for a 32 bit value.
+        :param signed: Whether the register holds a signed value. When None, any value that fits the width
+        as either a signed or an unsigned integer is accepted.
+        :return: A list of register values
+        """
+        bits = 16 * width
+        low = -(1 << (bits - 1)) if signed is not False else 0
+        high = (1 << (bits - 1)) - 1 if signed else (1 << bits) - 1
+        if not low <= value <= high:
+            raise ValueError('{} does not fit in a {} bit {}register'.format(
+                value, bits, {True: 'signed ', False: 'unsigned '}.get(signed, '')))
+        data = self._values[(width, False)].pack(value & ((1 << bits) - 1))
+        return list(self._words[width].unpack(data))
+
+    def block(self, start, count, fields) -> BlockLayout:
+        """
+        Returns the cached BlockLayout for a block read.
+        :param start: First register of the block.
+        :param count: Number of registers in the block.
+        :param fields: Tuple of (name, register, register count, signed).
+        """
+        key = (start, count, fields)
+        layout = self._blocks.get(key)
+        if layout is None:
+            layout = self._blocks[key] = BlockLayout(self, start, count, fields)
+        return layout
+
+
+DEFAULT_CODEC = RegisterCodec('big', 'big')
+
+# Register byte/word order of each drive family
+DRIVE_CODECS = {
+    'MDX+': DEFAULT_CODEC,
+    'M5': DEFAULT_CODEC,
+    'MBDV': DEFAULT_CODEC,
+}
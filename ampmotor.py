@@ -1,27 +1,220 @@
-from pymodbus.client import ModbusSerialClient, ModbusTcpClient
-from pymodbus.constants import Endian
-from pymodbus.payload import BinaryPayloadDecoder, BinaryPayloadBuilder
-from MDXT_modbus_registers import *
+# No pymodbus import: motors work with whatever client they are given, so the core loads without it
+from MDXT_modbus_registers import (CMD_WORD, SCL_Param1, SCL_Param2, SCL_Param3, SCL_Param4, IP, IV, IQ, IU, IT, IT1,
+                                   IX, DI, CC, VM, AC, DE, VE, AM, JA, JL, JS, CM)
+from ampcodec import DEFAULT_CODEC
+from snapshot import DEFAULT_MAX_GAP, MAX_READ_COUNT, TELEMETRY_FIELDS, plan_block_reads, decode_blocks, register_spec
+from paramcache import AMP_ParamCache, CACHED_PARAMETERS, CACHED_REGISTERS
+from register_table import REGISTERS_BY_NAME, REGISTERS_BY_ADDRESS
+from instrumentation import AMP_Instrumentation, InstrumentedClient
+from profiles import PROFILE_REGISTERS, validate_profile, load_profile, diff_profile, plan_block_writes
+from retrypolicy import AMP_RetryPolicy, AMP_RetryingClient, bus_errors, modbus_error
+from trajectory import move_profile
+import time
+
+SCL_PARAMS = (SCL_Param1, SCL_Param2, SCL_Param3, SCL_Param4)
+
+
+def scl_command_frames(OP_CODE, params):
+    """
+    Groups an SCL command into as few register writes as possible.
+    The opcode register and the parameters directly following it are written in one frame.
+    Parameters after a gap (a None parameter) are written first in their own frame, so that they
+    are always in place before the opcode is executed.
+    :param OP_CODE: The operation code to be written to the command word register.
+    :param params: Sequence of up to four parameters, None for parameters that are not used.
+    :return: A list of (register, [values]) writes, in the order they must be sent
+    """
+    values = [OP_CODE]
+    index = 0
+    while index < len(params) and params[index] is not None:
+        values.append(params[index])
+        index += 1
+
+    frames = []
+    while index < len(params):
+        if params[index] is None:
+            index += 1
+            continue
+        register, run = SCL_PARAMS[index], []
+        while index < len(params) and params[index] is not None:
+            run.append(params[index])
+            index += 1
+        frames.append((register, run))
+    frames.append((CMD_WORD, values))
+    return frames
+
 
 class AMP_Motor(object):
 
-    def __init__(self, identifier, slave, client):
+    def __init__(self, identifier, slave, client, codec=DEFAULT_CODEC):
         """
         Initializes a new motor with a unique identifier, modbus slave, and modbus client.
         :param identifier: An identifier to recognize your specific motor.
         :param slave: The modbus slave of your motor, set using the AMP Configurator.
         :param modbus_client: The Pymodbus client designed to communicate with AMP motors over modbus. 
-        Parameter should be of ModbusSerialClient or ModbusTCPClient Type
+        Parameter should be of ModbusSerialClient or ModbusTCPClient Type, a connectionpool.PooledConnection
+        or a pipelinedtcp.AMP_PipelinedTcpClient
+        :param codec: The ampcodec.RegisterCodec matching the drive's byte and word order. See ampcodec.DRIVE_CODECS.
         """
         self.identifier = identifier
         self.slave = slave
         self.modbus_client = client
+        self.codec = codec
+        self.param_cache = None
+        self.last_wait = None  # Statistics of the last wait_until_stopped()
         assert isinstance(identifier, str) and isinstance(slave, int)
-        isinstance(client, (ModbusSerialClient, ModbusTcpClient)),\
+
+    def _read_register(self, address, description) -> int:
+        """
+        Reads one register, its width and signedness are taken from the register table.
+        """
+        register = REGISTERS_BY_ADDRESS[address]
+        response = self.modbus_client.read_holding_registers(address-1, count=register.width, slave=self.slave)
+        if response.isError():
+            raise modbus_error('Unable to retrieve {}'.format(description), response)
+        value = self.codec.decode(response.registers, register.width, register.signed)
+        if self.param_cache is not None:
+            self.param_cache.set(address, value)
+        return value
+
+    def _write_register(self, address, value) -> bool:
+        """
+        Writes one register, its width is taken from the register table.
+        """
+        cache = self.param_cache
+        if cache is not None and address in CACHED_REGISTERS and cache.get(address) == value:
+            return True
+        register = REGISTERS_BY_ADDRESS[address]
+        response = self.modbus_client.write_registers(address-1, self.codec.encode(value, register.width, register.signed), slave=self.slave)
+        if cache is not None:
+            if response.isError():
+                cache.invalidate(address)
+            else:
+                cache.set(address, value)
+        return not response.isError()
+
+    def _read_blocks(self, blocks) -> list:
+        """
+        Issues the block reads of a plan_block_reads plan and returns their responses in order.
+        Clients that can pipeline (pipelinedtcp.AMP_PipelinedTcpClient) get every read in flight at once.
+        """
+        submit = getattr(self.modbus_client, 'submit_read_holding_registers', None)
+        if submit is not None:
+            futures = [submit(start-1, count=count, slave=self.slave) for start, count, _ in blocks]
+            return [future.result() for future in futures]
+        return [self.modbus_client.read_holding_registers(start-1, count=count, slave=self.slave)
+                for start, count, _ in blocks]
+
+    def _read_specs(self, specs, max_gap, errors=None) -> dict:
+        """
+        Reads every field of a {name: (register, count, signed)} dictionary with the fewest block reads.
+        When an errors dictionary is given, the fields of a failed block are set to None and their
+        AMP_ModbusError is stored in errors instead of being raised, unless every block failed.
+        """
+        values = {}
+        blocks = plan_block_reads(specs, max_gap=max_gap, specs=specs)
+        for (start, count, block_names), response in zip(blocks, self._read_blocks(blocks)):
+            if response.isError():
+                error = modbus_error('Unable to retrieve {}'.format(', '.join(block_names)), response)
+                if errors is None or len(errors) + len(block_names) == len(specs):
+                    raise error
+                values.update(dict.fromkeys(block_names))
+                errors.update(dict.fromkeys(block_names, error))
+                continue
+            layout = self.codec.block(start, count, tuple((name,) + specs[name] for name in block_names))
+            values.update(zip(layout.names, layout.decode(response.registers)))
+        return values
+
+    def enable_cache(self, ttl=None) -> AMP_ParamCache:
+        """
+        Enables a shadow cache of the writable parameters in paramcache.CACHED_PARAMETERS.
+        Writes of a value the drive already holds are skipped, and get_mode() is answered locally.
+        Only enable it when nothing else (Luna, Q programs, another process) changes these parameters.
+        :param ttl: Seconds a cached value stays valid, None to keep values until invalidated.
+        :return: The motor's AMP_ParamCache
+        """
+        self.param_cache = AMP_ParamCache(ttl)
+        return self.param_cache
+
+    def invalidate_cache(self, register=None):
+        """
+        Forgets one cached parameter register, or all of them when None.
+        """
+        if self.param_cache is not None:
+            self.param_cache.invalidate(register)
+
+    def resync(self) -> dict:
+        """
+        Refreshes every cached parameter from the drive with a single block read.
+        :return: A dictionary of parameter name to value
+        """
+        if self.param_cache is None:
+            self.enable_cache()
+        specs = {name: register_spec(REGISTERS_BY_ADDRESS[register]) for name, register in CACHED_PARAMETERS.items()}
+        values = self._read_specs(specs, max_gap=MAX_READ_COUNT)
+        for name, value in values.items():
+            self.param_cache.set(CACHED_PARAMETERS[name], value)
+        return values
+
+    def enable_retry_policy(self, policy=None) -> AMP_RetryPolicy:
+        """
+        Sends every Modbus call of this motor through an AMP_RetryPolicy: response timeouts that follow the
+        measured round trip time, and bounded retries of lost, garbled or refused frames.
+        Share one policy between the motors of a bus.
+        :param policy: An AMP_RetryPolicy, a new one with the default settings when None.
+        :return: The AMP_RetryPolicy, see its stats() method
+        """
+        self.disable_retry_policy()
+        policy = policy if policy is not None else AMP_RetryPolicy()
+        self._set_transport(AMP_RetryingClient(self._transport(), policy))
+        return policy
+
+    def disable_retry_policy(self):
+        """
+        Stops retrying, every call is sent once with the client's own timeout.
+        """
+        client = self._transport()
+        if isinstance(client, AMP_RetryingClient):
+            self._set_transport(client.client)
+
+    def _transport(self):
+        # The client below the instrumentation, if any. Retries happen below it so every attempt
+        # counts towards the latency of one instrumented call.
+        if isinstance(self.modbus_client, InstrumentedClient):
+            return self.modbus_client.client
+        return self.modbus_client
+
+    def _set_transport(self, client):
+        if isinstance(self.modbus_client, InstrumentedClient):
+            self.modbus_client.client = client
+        else:
+            self.modbus_client = client
+
+    def enable_instrumentation(self, instrumentation=None) -> AMP_Instrumentation:
+        """
+        Records every Modbus call of this motor (function, register, bytes, latency, errors).
+        Motors sharing one AMP_Instrumentation are reported side by side. Without instrumentation
+        the motor talks to its client directly, so there is no cost when it is disabled.
+        :param instrumentation: An AMP_Instrumentation to record into, a new one when None.
+        :return: The AMP_Instrumentation, see its stats() and prometheus() methods
+        """
+        self.disable_instrumentation()
+        instrumentation = instrumentation if instrumentation is not None else AMP_Instrumentation()
+        self.modbus_client = InstrumentedClient(self.modbus_client, instrumentation, self.identifier, self.slave)
+        return instrumentation
+
+    def disable_instrumentation(self):
+        """
+        Stops recording and talks to the modbus client directly again.
+        """
+        if isinstance(self.modbus_client, InstrumentedClient):
+            self.modbus_client = self.modbus_client.client
 
     def SCL_Command(self, OP_CODE, Param1=None, Param2=None, Param3=None, Param4=None) ->bool:
         """
         Executes an SCL command. Some operation codes (OP_CODEs) may require additional parameters.
+        The opcode and its parameters are sent as a single function 16 write covering registers 40125-40129,
+        the drive only executes the opcode once the whole frame has been received.
 
         Parameters:
         - OP_CODE (required): The operation code to be written to register 400125.
@@ -30,109 +223,193 @@ class AMP_Motor(object):
         Returns:
         - bool: True if the command was successfully sent, False otherwise.
         """
-        if Param1 is not None:
-            param1_response = self.modbus_client.write_register(SCL_Param1-1, Param1, slave=self.slave)
-            pass
-    
-        if Param2 is not None:
-            param2_response = self.modbus_client.write_register(SCL_Param2-1, Param2, slave=self.slave)
-            pass
-    
-        if Param3 is not None:
-            param3_response = self.modbus_client.write_register(SCL_Param3-1, Param3, slave=self.slave)
-            pass
-    
-        if Param4 is not None:
-            param4_response = self.modbus_client.write_register(SCL_Param4-1, Param3, slave=self.slave)
-            pass
-        opcode_response = self.modbus_client.write_register(CMD_WORD-1, OP_CODE, slave=self.slave)
-
-        return not opcode_response.isError()
-        
+        for address, values in scl_command_frames(OP_CODE, (Param1, Param2, Param3, Param4)):
+            write_response = self.modbus_client.write_registers(address-1, values, slave=self.slave)
+            if write_response.isError():
+                return False
+        return True
+
+    def SCL_Command_many(self, commands) -> bool:
+        """
+        Executes a list of SCL commands back to back, one frame per command.
+        :param commands: Iterable of opcodes, or tuples of (OP_CODE, Param1, ..., Param4).
+        :return: True if every command was sent, False as soon as one fails. Remaining commands are not sent.
+        """
+        for command in commands:
+            if isinstance(command, int):
+                command = (command,)
+            if not self.SCL_Command(*command):
+                return False
+        return True
 
     def get_position(self) -> int:
         """
         Gets the current position of the motor. This is found in the current position register.
         :return: An integer value for the current position of the motor
         """
-        pos_response = self.modbus_client.read_holding_registers(IP-1, count = 2, slave=self.slave)
-        if pos_response.isError():
-            raise Exception('Unable to retrieve current position. {}'.format(pos_response))
-        decoder = BinaryPayloadDecoder.fromRegisters(pos_response.registers, byteorder=Endian.BIG, wordorder=Endian.BIG)
-        return decoder.decode_32bit_int()
-
+        return self._read_register(IP, 'current position')
 
     def get_drivetemp(self) -> int:
         """
         Gets the current drive temperature of the motor. This is found in the motors drive temperature register.
         :return: An integer value for the current temperature of the motor
         """
-        drivetemp_response = self.modbus_client.read_holding_registers(IT-1, count = 1, slave=self.slave)
-        if drivetemp_response.isError():
-            raise Exception('Unable to retrieve current speed. {}'.format(drivetemp_response))
-        return drivetemp_response.registers[0]
-    
+        return self._read_register(IT, 'current drive temperature')
+
     def get_dsptemp(self) -> int:
         """
         Gets the current dsp temperature of the motor. This is found in the motors dsp temperature register.
         :return: An integer value for the current temperature of the motor
         """
-        dsptemp_response = self.modbus_client.read_holding_registers(IT1-1, count = 1, slave=self.slave)
-        if dsptemp_response.isError():
-            raise Exception('Unable to retrieve current dsp temperature. {}'.format(dsptemp_response))
-        return dsptemp_response.registers[0]
-    
+        return self._read_register(IT1, 'current dsp temperature')
+
     def get_position_error(self) -> int:
         """
         Gets the current encoder position error. This is found in the motors position error.
         :return: An integer value for the immidiate position error of the motor
-        BROKENTBD
         """
-        pos_error_response = self.modbus_client.read_holding_registers(IX-1, count = 2, slave=self.slave)
-        if pos_error_response.isError():
-            raise Exception('Unable to retrieve enc position error. {}'.format(pos_error_response))
-        return pos_error_response.registers[0]
-    
+        return self._read_register(IX, 'enc position error')
+
     def get_speed(self) -> int:
         """
         Gets the current speed of the motor. This is found in the motors speed register.
         :return: An integer value for the current speed of the motor
         """
-        speed_response = self.modbus_client.read_holding_registers(IV-1, count = 1, slave=self.slave)
-        if speed_response.isError():
-            raise Exception('Unable to retrieve current speed. {}'.format(speed_response))
-        return speed_response.registers[0]
-    
+        return self._read_register(IV, 'current speed')
+
     def get_voltage(self) -> int:
         """
         Gets the DC bus voltage of the motor. This is found in the DC bus voltage register.
         :return: An integer value for the current DC Bus Voltage of the motor
         """
-        volt_response = self.modbus_client.read_holding_registers(IU-1, count = 1, slave=self.slave)
-        if volt_response.isError():
-            raise Exception('Unable to retrieve Immidiate DC Bus Voltage. {}'.format(volt_response))
-        return volt_response.registers[0]
-    
+        return self._read_register(IU, 'Immidiate DC Bus Voltage')
+
     def get_current(self):
         """
         Gets the immidiate current of the motor. This is found in the motors current register.
         :return: An integer value for the current of the motor
         """
-        torque_response = self.modbus_client.read_holding_registers(IQ-1, count = 1, slave=self.slave)
-        if torque_response.isError():
-            raise Exception('Unable to retrieve current torque. {}'.format(torque_response))
-        return torque_response.registers[0]        
+        return self._read_register(IQ, 'current torque')
 
     def get_mode(self):
         """
         Gets the current control mode setting of the motor
         :return: An integer describing the various modes of operation for the motor
         """
-        mode = self.modbus_client.read_holding_registers(CM-1, count =2, slave=self.slave)
-        if mode.isError():
-            raise Exception('Unable to retrieve current mode. {}'.format(mode))
-        decoder = BinaryPayloadDecoder.fromRegisters(mode.registers, byteorder=Endian.BIG, wordorder=Endian.BIG)
-        return decoder.decode_32bit_int()
+        if self.param_cache is not None:
+            mode = self.param_cache.get(CM)
+            if mode is not None:
+                return mode
+        return self._read_register(CM, 'current mode')
+
+    def read_snapshot(self, fields=None, max_gap=DEFAULT_MAX_GAP, partial=False):
+        """
+        Reads several telemetry values at once using the fewest contiguous block reads.
+        :param fields: Iterable of field names to read (see snapshot.TELEMETRY_FIELDS). Reads every field when None.
+        :param max_gap: Largest number of unused registers to read through in order to merge two blocks.
+        :param partial: Keep the fields of the blocks that were read when another block fails. Failed fields
+        are left as None and their AMP_ModbusError is kept in the snapshot's errors. Raises only if every block failed.
+        :return: A MotorSnapshot holding the requested values
+        """
+        blocks = plan_block_reads(TELEMETRY_FIELDS if fields is None else fields, max_gap=max_gap)
+        timestamp = time.time()
+        responses, errors = [], {}
+        for (_, _, names), block_response in zip(blocks, self._read_blocks(blocks)):
+            if not block_response.isError():
+                responses.append(block_response.registers)
+                continue
+            error = modbus_error('Unable to retrieve telemetry snapshot', block_response)
+            if not partial or len(errors) + len(names) == sum(len(block[2]) for block in blocks):
+                raise error
+            responses.append(None)
+            errors.update(dict.fromkeys(names, error))
+        snapshot = decode_blocks(blocks, responses, timestamp, self.codec)
+        snapshot.errors = errors or None
+        return snapshot
+
+    def read_into(self, batch, clock=time.monotonic_ns) -> bool:
+        """
+        Reads the fields of a samplebatch.SampleBatch in its block reads and appends the registers as one row,
+        timestamped when the read is issued. Nothing is decoded until the batch's columns() are requested.
+        :param batch: A SampleBatch that is not full, created with this motor's codec.
+        :param clock: Nanosecond clock of the timestamps, e.g. time.perf_counter_ns.
+        :return: True if the read succeeded, a failed read is appended as an invalid row
+        """
+        t_ns = clock()
+        try:
+            responses = self._read_blocks(batch.blocks)
+        except bus_errors():  # Lost connections and failures raised by retrying and pipelined clients
+            responses = None
+        if responses is None or any(response.isError() for response in responses):
+            batch.append(t_ns, None)
+            return False
+        batch.append(t_ns, [response.registers for response in responses])
+        return True
+
+    def read(self, name) -> int:
+        """
+        Reads any register of the register table by name, e.g. motor.read('IV').
+        :param name: Register name from register_table.REGISTERS_BY_NAME.
+        :return: The raw register value, multiply by the register's scale to get units
+        """
+        register = REGISTERS_BY_NAME[name]
+        return self._read_register(register.address, register.description)
+
+    def read_many(self, names, max_gap=DEFAULT_MAX_GAP, errors=None) -> dict:
+        """
+        Reads several registers of the register table using the fewest contiguous block reads.
+        :param names: Iterable of register names from register_table.REGISTERS_BY_NAME.
+        :param max_gap: Largest number of unused registers to read through in order to merge two blocks.
+        :param errors: A dictionary to return partial results: registers of a failed block are set to None and
+        their AMP_ModbusError is stored in errors. Raises only if every block failed. Without it any failure raises.
+        :return: A dictionary of register name to raw value
+        """
+        return self._read_specs({name: register_spec(REGISTERS_BY_NAME[name]) for name in names}, max_gap, errors)
+
+    def write(self, name, value) -> bool:
+        """
+        Writes any writable register of the register table by name, e.g. motor.write('VE', 240).
+        :param name: Register name from register_table.REGISTERS_BY_NAME.
+        :param value: The raw register value.
+        :return: Boolean indicating if the write was successful
+        """
+        register = REGISTERS_BY_NAME[name]
+        if not register.writable:
+            raise ValueError('Register {} is read only'.format(name))
+        return self._write_register(register.address, value)
+
+    def capture_profile(self, names=PROFILE_REGISTERS) -> dict:
+        """
+        Reads the drive's parameters so they can be saved with profiles.save_profile() and applied to other drives.
+        :param names: Iterable of writable register names from register_table.REGISTERS_BY_NAME.
+        :return: A dictionary of register name to raw value
+        """
+        return self.read_many(names, max_gap=MAX_READ_COUNT)
+
+    def apply_profile(self, profile, dry_run=False) -> dict:
+        """
+        Brings the drive in line with a profile. The registers of the profile are read with as few block reads
+        as possible, and only the registers that differ are written, contiguous ones in a single frame.
+        :param profile: A dictionary of register name to raw value, or the path of a .json or .toml profile.
+        :param dry_run: Only report the differences, do not write anything.
+        :return: A dictionary of register name to (current, desired) for every register that differed
+        """
+        profile = load_profile(profile) if isinstance(profile, str) else validate_profile(profile)
+        changes = diff_profile(self.read_many(profile, max_gap=MAX_READ_COUNT), profile)
+        if dry_run:
+            return changes
+        for address, names in plan_block_writes(changes, profile):
+            values = []
+            for name in names:
+                register = REGISTERS_BY_NAME[name]
+                values += self.codec.encode(profile[name], register.width, register.signed)
+            response = self.modbus_client.write_registers(address-1, values, slave=self.slave)
+            if response.isError():
+                raise modbus_error('Unable to write {}'.format(', '.join(names)), response)
+            if self.param_cache is not None:
+                for name in names:
+                    self.param_cache.set(REGISTERS_BY_NAME[name].address, profile[name])
+        return changes
 
     def set_max_speed(self, sm_units) -> bool:
         """
@@ -140,10 +417,7 @@ class AMP_Motor(object):
         :param sm_units: Units of speed measured in SMunits. Use the converter class to convert from RPM to pulses.
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        write_response = self.modbus_client.write_registers(VM-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()
+        return self._write_register(VM, sm_units)
 
     def set_max_torque(self, torque) -> bool:
         """
@@ -151,10 +425,7 @@ class AMP_Motor(object):
         :param torque: Units of torque measured in percentage of rated torque
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(torque)
-        write_response = self.modbus_client.write_registers(CC-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()
+        return self._write_register(CC, torque)
 
     def set_max_acceleration(self, sm_units):
         """
@@ -162,40 +433,28 @@ class AMP_Motor(object):
         :param sm_units: Units of acceleration measured 1/6 rps. Use the converter class to convert from RPM/s to register units.
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        write_response = self.modbus_client.write_registers(AM-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()
-    
+        return self._write_register(AM, sm_units)
+
     def set_jog_acceleration(self, sm_units):
         """
         Sets the jog acceleration for the motor
         :param sm_units: Units of acceleration measured in encoder pulses/s/s. Use the converter class to convert from RPM/s^2 to pulses.
         :return: Boolean indicating if the write was successful"""
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        write_response = self.modbus_client.write_registers(JA-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()    
-    
+        return self._write_register(JA, sm_units)
+
     def set_jog_deceleration(self, sm_units):
         """
         Sets the maximum deceleration for the motor
         :param sm_units: Units of acceleration measured in encoder pulses. Use the converter class to convert from RPM to pulses/s.
         :return: Boolean indicating if the write was successful"""
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        write_response = self.modbus_client.write_registers(JL-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()    
-    
+        return self._write_register(JL, sm_units)
+
     def set_jog_speed(self, sm_units):
         """
         Sets the jog speed for motor speed control
         :param sm_units: Units of speed measured in 1/240 rps. Use the converter class to convert from RPM/s^2 to required units.
         :return: Boolean indicating if the write was successful"""
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        write_response = self.modbus_client.write_registers(JS-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()    
+        return self._write_register(JS, sm_units)
 
     def set_control_mode(self, control_mode):
         """
@@ -203,10 +462,7 @@ class AMP_Motor(object):
         :param control_mode: Integer indicating the intended operating mode. Consult the motor manual for details
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(control_mode)
-        write_response = self.modbus_client.write_registers(CM-1, builder.to_registers(), slave=self.slave)
-        return not write_response.isError()
+        return self._write_register(CM, control_mode)
 
     def set_target_position(self, target):
         """
@@ -214,22 +470,15 @@ class AMP_Motor(object):
         :param target: Point to point distance in pulses measured in SMunits. Use the converter class to convert from desired units to pulses.
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(target)
-        request = self.modbus_client.write_registers(DI-1, builder.to_registers(), slave=self.slave)
-        return not request.isError()
-    
+        return self._write_register(DI, target)
+
     def set_p2p_vel(self, sm_units):
         """
         Sets the target point-to-point velocity
         :param sm_units: Point to point move velocity in pulses measured in SMunits. Use the converter class to convert from desired units to pulses.
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        request = self.modbus_client.write_registers(VE-1, builder.to_registers(), slave=self.slave)
-        return not request.isError()
-    
+        return self._write_register(VE, sm_units)
 
     def set_p2p_accel(self, sm_units):
         """
@@ -237,21 +486,15 @@ class AMP_Motor(object):
         :param sm_units: Point to point move acceleration in units of 10RPM/s. Use the converter class to convert from desired units to required units.
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        request = self.modbus_client.write_registers(AC-1, builder.to_registers(), slave=self.slave)
-        return not request.isError()
-    
+        return self._write_register(AC, sm_units)
+
     def set_p2p_decel(self, sm_units):
         """
         Sets the target point-to-point deceleration
         :param sm_units: Point to point move deceleration of 10RPM/s. Use the converter class to convert from desired units to required units.
         :return: Boolean indicating if the write was successful
         """
-        builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.BIG)
-        builder.add_32bit_int(sm_units)
-        request = self.modbus_client.write_registers(DE-1, builder.to_registers(), slave=self.slave)
-        return not request.isError()
+        return self._write_register(DE, sm_units)
 
     def stop_motor(self):
         """
@@ -270,22 +513,85 @@ class AMP_Motor(object):
         # Check if speed mode, else set to speed and reset target
         read_mode = self.get_mode()
         if read_mode != 10:
-            self.set_mode(10)
+            self.set_control_mode(10)
         self.set_jog_acceleration(acc_units)
         return self.set_jog_speed(speed_units)
 
-    def go_to_position(self, pulses, speed_units, acc_units):
+    def go_to_position(self, pulses, speed_units, acc_units, wait=False, converter=None, timeout=None):
         """
         Rotates the motor with a target position, at a set speed, and acceleration.
         :param pulses: Units of position measured in pulses. Use the converter class to convert from desired units to pulses.
         :param speed_units: Units of speed measured in 1/240rps. Use the converter class to convert from RPM.
         :param acc_units: Units of acceleration measured in 10RPM/s. Use the converter class to convert from RPM/s
-        :return:
+        :param wait: Return once the motor has arrived at the target, see wait_until_stopped().
+        :param converter: The motor's AMP_Converter, used to predict when a waited for move ends.
+        :param timeout: Seconds to wait at most, None to wait until the motor arrives.
+        :return: Boolean indicating if the target was written, or with wait, if the motor arrived
         """
         # Check if position mode, else set to position and reset target
         read_mode = self.get_mode()
         if read_mode != 21:
-            self.set_mode(21)
+            self.set_control_mode(21)
         self.set_p2p_vel(speed_units)
         self.set_p2p_accel(acc_units)
-        return self.set_target_position(pulses)
\ No newline at end of file
+        sent = self.set_target_position(pulses)
+        if not sent or not wait:
+            return sent
+        return self.wait_until_stopped(target=pulses, converter=converter, timeout=timeout)
+
+    def _remaining_move_time(self, converter, profile, position, speed, target) -> float:
+        """
+        Predicts the seconds left until the motor is at rest, from one position and speed reading.
+        """
+        speed = converter.convert_VEunits_to_pulse_rate(speed)
+        decel = converter.convert_smunits_to_pulse_rate_change(profile['DE'])
+        if target is None:
+            return abs(speed) / decel if decel > 0 else 0.0
+        distance = target - position
+        toward = speed if distance >= 0 else -speed
+        duration, _, _ = move_profile(distance, toward, converter.convert_VEunits_to_pulse_rate(profile['VE']),
+                                      converter.convert_smunits_to_pulse_rate_change(profile['AC']), decel)
+        if toward < 0:  # Moving away from the target, it first has to stop
+            duration += -toward / decel if decel > 0 else 0.0
+        return duration
+
+    def wait_until_stopped(self, target=None, converter=None, timeout=None, poll_interval=0.002, tolerance=0) -> bool:
+        """
+        Waits for the motor to come to rest, without a constant poll. Each poll reads position and speed in one
+        block read. With a converter the time left is predicted from the commanded VE, AC and DE as a
+        trapezoidal move, and the wait sleeps through most of it without bus traffic. Polls become tighter as
+        the predicted end approaches, so completion is seen within a few poll intervals. Without a converter
+        the motor is polled every poll_interval. Statistics are kept in last_wait.
+        :param target: Position, in pulses, the motor must be at. None waits for the speed to reach zero,
+        e.g. after stop_motor().
+        :param converter: The motor's AMP_Converter, for its steps_per_rev.
+        :param timeout: Seconds to wait at most, None to wait until the motor stops.
+        :param poll_interval: Seconds between polls near the end of the move.
+        :param tolerance: Pulses the position may differ from target.
+        :return: True once the motor stopped, False if the timeout expired first
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        profile = self.read_many(('AC', 'DE', 'VE')) if converter is not None else None
+        polls, predicted = 0, None
+        while True:
+            snapshot = self.read_snapshot(('position', 'speed'))
+            polls += 1
+            now = time.monotonic()
+            arrived = target is None or abs(snapshot.position - target) <= tolerance
+            if snapshot.speed == 0 and arrived:
+                self.last_wait = {'polls': polls, 'predicted': predicted, 'elapsed': now - started}
+                return True
+            if deadline is not None and now >= deadline:
+                self.last_wait = {'polls': polls, 'predicted': predicted, 'elapsed': now - started}
+                return False
+            delay = poll_interval
+            if profile is not None:
+                remaining = self._remaining_move_time(converter, profile, snapshot.position, snapshot.speed, target)
+                if predicted is None:
+                    predicted = remaining
+                # Sleep through most of the time left and poll again before the predicted end
+                delay = max(poll_interval, remaining - max(0.1 * remaining, 2 * poll_interval))
+            if deadline is not None:
+                delay = min(delay, max(deadline - now, 0.0))
+            time.sleep(delay)
@@ -0,0 +1,280 @@
+import asyncio
+import contextlib
+import time
+import weakref
+from MDXT_modbus_registers import IP, IV, IQ, IU, IT, IT1, IX, DI, CC, VM, AC, DE, VE, AM, JA, JL, JS, CM
+from ampcodec import DEFAULT_CODEC
+from register_table import REGISTERS_BY_ADDRESS
+from snapshot import DEFAULT_MAX_GAP, TELEMETRY_FIELDS, plan_block_reads, decode_blocks
+from ampmotor import scl_command_frames
+from retrypolicy import modbus_error
+
+# One lock per shared RTU line. Motors on the same serial client must not interleave frames.
+_bus_locks = weakref.WeakKeyDictionary()
+
+
+def bus_lock(client):
+    """
+    Returns the lock that serializes transactions on a client.
+    Serial clients share one lock per client, TCP clients get a no-op context so that
+    requests to several drives can be in flight at the same time.
+    :param client: AsyncModbusSerialClient or AsyncModbusTcpClient
+    :return: An async context manager
+    """
+    from pymodbus.client import AsyncModbusSerialClient  # Already loaded, the client is one of its classes
+    if not isinstance(client, AsyncModbusSerialClient):
+        return contextlib.nullcontext()
+    lock = _bus_locks.get(client)
+    if lock is None:
+        lock = _bus_locks[client] = asyncio.Lock()
+    return lock
+
+
+class AsyncAMP_Motor(object):
+
+    def __init__(self, identifier, slave, client, codec=DEFAULT_CODEC):
+        """
+        Initializes a new asyncio motor with a unique identifier, modbus slave, and async modbus client.
+        Mirrors the AMP_Motor API, every getter, setter and motion method is a coroutine.
+        :param identifier: An identifier to recognize your specific motor.
+        :param slave: The modbus slave of your motor, set using the AMP Configurator.
+        :param client: The Pymodbus client designed to communicate with AMP motors over modbus.
+        Parameter should be of AsyncModbusSerialClient or AsyncModbusTcpClient Type
+        :param codec: The ampcodec.RegisterCodec matching the drive's byte and word order.
+        """
+        assert isinstance(identifier, str) and isinstance(slave, int)
+        self.identifier = identifier
+        self.slave = slave
+        self.modbus_client = client
+        self.codec = codec
+
+    async def _read(self, register, count, description):
+        async with bus_lock(self.modbus_client):
+            response = await self.modbus_client.read_holding_registers(register-1, count=count, slave=self.slave)
+        if response.isError():
+            raise modbus_error('Unable to retrieve {}'.format(description), response)
+        return response.registers
+
+    async def _write(self, register, values) -> bool:
+        async with bus_lock(self.modbus_client):
+            response = await self.modbus_client.write_registers(register-1, values, slave=self.slave)
+        return not response.isError()
+
+    async def _read_register(self, address, description) -> int:
+        register = REGISTERS_BY_ADDRESS[address]
+        registers = await self._read(address, register.width, description)
+        return self.codec.decode(registers, register.width, register.signed)
+
+    async def _write_register(self, address, value) -> bool:
+        register = REGISTERS_BY_ADDRESS[address]
+        return await self._write(address, self.codec.encode(value, register.width, register.signed))
+
+    async def SCL_Command(self, OP_CODE, Param1=None, Param2=None, Param3=None, Param4=None) -> bool:
+        """
+        Executes an SCL command. See AMP_Motor.SCL_Command.
+        :return: True if the command was successfully sent, False otherwise.
+        """
+        for address, values in scl_command_frames(OP_CODE, (Param1, Param2, Param3, Param4)):
+            if not await self._write(address, values):
+                return False
+        return True
+
+    async def SCL_Command_many(self, commands) -> bool:
+        """
+        Executes a list of SCL commands back to back. See AMP_Motor.SCL_Command_many.
+        :return: True if every command was sent, False as soon as one fails.
+        """
+        for command in commands:
+            if isinstance(command, int):
+                command = (command,)
+            if not await self.SCL_Command(*command):
+                return False
+        return True
+
+    async def get_position(self) -> int:
+        """
+        Gets the current position of the motor.
+        :return: An integer value for the current position of the motor
+        """
+        return await self._read_register(IP, 'current position')
+
+    async def get_drivetemp(self) -> int:
+        """
+        Gets the current drive temperature of the motor.
+        :return: An integer value for the current temperature of the motor
+        """
+        return await self._read_register(IT, 'current drive temperature')
+
+    async def get_dsptemp(self) -> int:
+        """
+        Gets the current dsp temperature of the motor.
+        :return: An integer value for the current temperature of the motor
+        """
+        return await self._read_register(IT1, 'current dsp temperature')
+
+    async def get_position_error(self) -> int:
+        """
+        Gets the current encoder position error.
+        :return: An integer value for the immidiate position error of the motor
+        """
+        return await self._read_register(IX, 'enc position error')
+
+    async def get_speed(self) -> int:
+        """
+        Gets the current speed of the motor.
+        :return: An integer value for the current speed of the motor
+        """
+        return await self._read_register(IV, 'current speed')
+
+    async def get_voltage(self) -> int:
+        """
+        Gets the DC bus voltage of the motor.
+        :return: An integer value for the current DC Bus Voltage of the motor
+        """
+        return await self._read_register(IU, 'Immidiate DC Bus Voltage')
+
+    async def get_current(self) -> int:
+        """
+        Gets the immidiate current of the motor.
+        :return: An integer value for the current of the motor
+        """
+        return await self._read_register(IQ, 'current torque')
+
+    async def get_mode(self) -> int:
+        """
+        Gets the current control mode setting of the motor
+        :return: An integer describing the various modes of operation for the motor
+        """
+        return await self._read_register(CM, 'current mode')
+
+    async def read_snapshot(self, fields=None, max_gap=DEFAULT_MAX_GAP):
+        """
+        Reads several telemetry values at once using the fewest contiguous block reads.
+        See AMP_Motor.read_snapshot.
+        :return: A MotorSnapshot holding the requested values
+        """
+        blocks = plan_block_reads(TELEMETRY_FIELDS if fields is None else fields, max_gap=max_gap)
+        timestamp = time.time()
+        responses = [await self._read(start, count, 'telemetry snapshot') for start, count, _ in blocks]
+        return decode_blocks(blocks, responses, timestamp, self.codec)
+
+    async def set_max_speed(self, sm_units) -> bool:
+        """
+        Sets the maximum speed for a motor
+        :param sm_units: Units of speed measured in SMunits.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(VM, sm_units)
+
+    async def set_max_torque(self, torque) -> bool:
+        """
+        Sets the maximum torque for the motor
+        :param torque: Units of torque measured in percentage of rated torque
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(CC, torque)
+
+    async def set_max_acceleration(self, sm_units) -> bool:
+        """
+        Sets the maximum acceleration for the motor. Also used for Max Brake deceleration.
+        :param sm_units: Units of acceleration measured 1/6 rps.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(AM, sm_units)
+
+    async def set_jog_acceleration(self, sm_units) -> bool:
+        """
+        Sets the jog acceleration for the motor
+        :param sm_units: Units of acceleration. Use the converter class to convert from rps/s.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(JA, sm_units)
+
+    async def set_jog_deceleration(self, sm_units) -> bool:
+        """
+        Sets the jog deceleration for the motor
+        :param sm_units: Units of acceleration. Use the converter class to convert from rps/s.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(JL, sm_units)
+
+    async def set_jog_speed(self, sm_units) -> bool:
+        """
+        Sets the jog speed for motor speed control
+        :param sm_units: Units of speed measured in 1/240 rps.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(JS, sm_units)
+
+    async def set_control_mode(self, control_mode) -> bool:
+        """
+        Sets the motor operating mode
+        :param control_mode: Integer indicating the intended operating mode. Consult the motor manual for details
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(CM, control_mode)
+
+    async def set_target_position(self, target) -> bool:
+        """
+        Sets the target position for the motor
+        :param target: Point to point distance in pulses.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(DI, target)
+
+    async def set_p2p_vel(self, sm_units) -> bool:
+        """
+        Sets the target point-to-point velocity
+        :param sm_units: Point to point move velocity in SMunits.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(VE, sm_units)
+
+    async def set_p2p_accel(self, sm_units) -> bool:
+        """
+        Sets the target point-to-point acceleration
+        :param sm_units: Point to point move acceleration in SMunits.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(AC, sm_units)
+
+    async def set_p2p_decel(self, sm_units) -> bool:
+        """
+        Sets the target point-to-point deceleration
+        :param sm_units: Point to point move deceleration in SMunits.
+        :return: Boolean indicating if the write was successful
+        """
+        return await self._write_register(DE, sm_units)
+
+    async def stop_motor(self) -> bool:
+        """
+        Stops the motor
+        :return: Boolean indicating if the write was successful
+        """
+        return await self.SCL_Command(0xE2)
+
+    async def go_with_speed(self, speed_units, acc_units) -> bool:
+        """
+        Rotates the motor with a target speed, and acceleration
+        :param speed_units: Units of speed measured in SMUnits. Use the converter class to convert from RPM.
+        :param acc_units: Units of acceleration measured in SMUnits. Use the converter class to convert from RPM/s
+        :return: Boolean indicating if the speed write was successful
+        """
+        if await self.get_mode() != 10:
+            await self.set_control_mode(10)
+        await self.set_jog_acceleration(acc_units)
+        return await self.set_jog_speed(speed_units)
+
+    async def go_to_position(self, pulses, speed_units, acc_units) -> bool:
+        """
+        Rotates the motor with a target position, at a set speed, and acceleration.
+        :param pulses: Units of position measured in pulses.
+        :param speed_units: Units of speed measured in 1/240rps.
+        :param acc_units: Units of acceleration measured in 10RPM/s.
+        :return: Boolean indicating if the target write was successful
+        """
+        if await self.get_mode() != 21:
+            await self.set_control_mode(21)
+        await self.set_p2p_vel(speed_units)
+        await self.set_p2p_accel(acc_units)
+        return await self.set_target_position(pulses)
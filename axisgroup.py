@@ -0,0 +1,261 @@
+import time
+from concurrent.futures import as_completed
+from MDXT_modbus_registers import CMD_WORD
+from ampmotor import AMP_Motor, scl_command_frames
+from instrumentation import InstrumentedClient
+from profiles import plan_block_writes, validate_profile
+from register_table import REGISTERS_BY_NAME
+from retrypolicy import AMP_RetryingClient
+from snapshot import MAX_READ_COUNT, plan_block_reads, register_spec
+
+BROADCAST_SLAVE = 0
+
+
+def bus_client(client):
+    """
+    :return: The client that owns the connection below the instrumentation and retry wrappers of a motor
+    """
+    while isinstance(client, (InstrumentedClient, AMP_RetryingClient)):
+        client = client.client
+    return client
+
+
+class _FailedResponse(object):
+    """
+    Stands in for the response of a pipelined request that raised.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+    def isError(self):
+        return True
+
+
+class AMP_AxisGroup(object):
+
+    def __init__(self, motors, broadcast=False):
+        """
+        Several motors that are configured and started together.
+        :param motors: Iterable of AMP_Motor.
+        :param broadcast: Send commands and write_all() frames as slave 0 broadcast frames, one per bus.
+        Only enable it for drives that execute Modbus broadcasts, they do not answer them, and when the group
+        holds every drive on its buses, since a broadcast reaches them all.
+        """
+        self.motors = list(motors)
+        assert self.motors and all(isinstance(motor, AMP_Motor) for motor in self.motors)
+        self.broadcast = broadcast
+
+    @property
+    def shared_client(self):
+        """
+        The modbus client used by every motor, or None if they use different clients.
+        """
+        client = self.motors[0].modbus_client
+        return client if all(motor.modbus_client is client for motor in self.motors) else None
+
+    def stage(self, values, motors=None) -> bool:
+        """
+        Writes parameters ahead of a start, e.g. group.stage({'JA': 600, 'JL': 600, 'JS': 5520}).
+        :param values: Dictionary of register name (see register_table.REGISTERS_BY_NAME) to raw value.
+        :param motors: Motors to write to, every motor of the group when None.
+        :return: True if every write succeeded
+        """
+        ok = True
+        for motor in self.motors if motors is None else motors:
+            for name, value in values.items():
+                ok = motor.write(name, value) and ok
+        return ok
+
+    @property
+    def clients(self):
+        """
+        Dictionary of each modbus client used by the group to the list of its motors, in group order.
+        """
+        clients = {}
+        for motor in self.motors:
+            clients.setdefault(motor.modbus_client, []).append(motor)
+        return clients
+
+    @property
+    def buses(self):
+        """
+        Dictionary of each connection used by the group to the list of its motors, in group order. Motors with
+        their own instrumentation or retry wrapper around one shared client are on the same bus.
+        """
+        buses = {}
+        for motor in self.motors:
+            buses.setdefault(bus_client(motor.modbus_client), []).append(motor)
+        return buses
+
+    def _can_broadcast(self):
+        return self.broadcast and len(set((motor.codec.byteorder, motor.codec.wordorder) for motor in self.motors)) == 1
+
+    def write_all(self, values, verify=False) -> dict:
+        """
+        Writes identical parameters to every motor, e.g. group.write_all({'JA': 600, 'JL': 600, 'JS': 5520}).
+        Contiguous registers share one frame. With broadcast each frame is sent once per bus to slave 0,
+        otherwise the frames are pipelined when the client supports it and sent in turn when it does not.
+        :param values: Dictionary of writable register name (see register_table.REGISTERS_BY_NAME) to raw value.
+        :param verify: Read the registers back from every motor in one pass of block reads, the only way to
+        confirm a broadcast.
+        :return: A dictionary with 'ok', the 'method' used, the number of 'frames' sent and, with verify,
+        'mismatches': identifier to {name: value read, None if unreadable} for every motor that differs
+        """
+        values = validate_profile(values)
+        writes = plan_block_writes(values, values)
+        ok, frames = True, 0
+        if self._can_broadcast():
+            method = 'broadcast'
+            for motors in self.buses.values():
+                client = motors[0].modbus_client  # Through the first motor's wrappers, the frame is sent once
+                for address, names in writes:
+                    client.write_registers(address-1, self._encode(motors[0], values, names),
+                                           slave=BROADCAST_SLAVE, no_response_expected=True)
+                    frames += 1
+                for motor in motors:
+                    self._update_cache(motor, values, False)  # Not acknowledged, the drives may not hold the values
+        else:
+            method = 'sequential'
+            for client, motors in self.clients.items():
+                submit = getattr(client, 'submit_write_registers', None)
+                if submit is not None:
+                    method = 'pipelined'
+                    futures = [(motor, submit(address-1, self._encode(motor, values, names), slave=motor.slave))
+                               for motor in motors for address, names in writes]
+                    responses = [(motor, self._result(future)) for motor, future in futures]
+                else:
+                    responses = [(motor, client.write_registers(address-1, self._encode(motor, values, names),
+                                                                slave=motor.slave))
+                                 for motor in motors for address, names in writes]
+                failed = set()
+                for motor, response in responses:
+                    frames += 1
+                    if response.isError():
+                        ok = False
+                        failed.add(motor)
+                for motor in motors:
+                    self._update_cache(motor, values, motor not in failed)
+
+        result = {'ok': ok, 'method': method, 'frames': frames}
+        if verify:
+            result['mismatches'] = {identifier: read for identifier, read in self._read_back(values).items()
+                                    if read != values}
+            result['ok'] = ok and not result['mismatches']
+        return result
+
+    @staticmethod
+    def _encode(motor, values, names):
+        registers = []
+        for name in names:
+            register = REGISTERS_BY_NAME[name]
+            registers += motor.codec.encode(values[name], register.width, register.signed)
+        return registers
+
+    @staticmethod
+    def _update_cache(motor, values, acknowledged):
+        if motor.param_cache is not None:
+            for name, value in values.items():
+                if acknowledged:
+                    motor.param_cache.set(REGISTERS_BY_NAME[name].address, value)
+                else:
+                    motor.param_cache.invalidate(REGISTERS_BY_NAME[name].address)
+
+    @staticmethod
+    def _result(future):
+        # A pipelined request that timed out or lost its connection counts as an error response
+        try:
+            return future.result()
+        except Exception as e:
+            return _FailedResponse(e)
+
+    def _read_back(self, values) -> dict:
+        """
+        Reads the registers of values from every motor. The block reads of all the motors sharing a pipelining
+        client are in flight together.
+        :return: A dictionary of identifier to {name: value}, None for the registers of a failed block
+        """
+        specs = {name: register_spec(REGISTERS_BY_NAME[name]) for name in values}
+        blocks = plan_block_reads(specs, max_gap=MAX_READ_COUNT, specs=specs)
+        responses = {}
+        for client, motors in self.clients.items():
+            submit = getattr(client, 'submit_read_holding_registers', None)
+            if submit is not None:
+                futures = {motor: [submit(start-1, count=count, slave=motor.slave) for start, count, _ in blocks]
+                           for motor in motors}
+                for motor in motors:
+                    responses[motor] = [self._result(future) for future in futures[motor]]
+            else:
+                for motor in motors:
+                    responses[motor] = [client.read_holding_registers(start-1, count=count, slave=motor.slave)
+                                        for start, count, _ in blocks]
+
+        read = {}
+        for motor in self.motors:
+            read[motor.identifier] = current = dict.fromkeys(values)
+            for (start, count, names), response in zip(blocks, responses[motor]):
+                if not response.isError():
+                    layout = motor.codec.block(start, count, tuple((name,) + specs[name] for name in names))
+                    current.update(zip(layout.names, layout.decode(response.registers)))
+        return read
+
+    def stop(self) -> dict:
+        """
+        Stops every motor with its normal deceleration, see command().
+        """
+        return self.command(0xE2)
+
+    def start(self, OP_CODE, Param1=None, Param2=None, Param3=None, Param4=None) -> dict:
+        """
+        Starts every motor together, e.g. group.start(CJ). Same as command().
+        """
+        return self.command(OP_CODE, Param1, Param2, Param3, Param4)
+
+    def command(self, OP_CODE, Param1=None, Param2=None, Param3=None, Param4=None) -> dict:
+        """
+        Executes one SCL command on every motor with the smallest possible skew. Command parameters
+        are written to every motor first, then the opcode frames are sent back to back: as one broadcast
+        frame, pipelined when the client supports it, or in a tight loop of pre-built frames.
+        :param OP_CODE: The operation code, e.g. ME or CJ from AMP_Opcodes.
+        :return: A dictionary with 'ok', the 'method' used, the estimated 'skew' in seconds between the first
+        and the last motor, and per motor 'offsets' in seconds from the first one
+        """
+        frames = scl_command_frames(OP_CODE, (Param1, Param2, Param3, Param4))
+        ok = True
+        for motor in self.motors:
+            for address, values in frames[:-1]:
+                ok = not motor.modbus_client.write_registers(address-1, values, slave=motor.slave).isError() and ok
+        values = frames[-1][1]
+
+        if self._can_broadcast():
+            for motors in self.buses.values():
+                motors[0].modbus_client.write_registers(CMD_WORD-1, values, slave=BROADCAST_SLAVE,
+                                                        no_response_expected=True)
+            return {'ok': ok, 'method': 'broadcast', 'skew': 0.0,
+                    'offsets': {motor.identifier: 0.0 for motor in self.motors}}
+
+        # Each drive executes the command somewhere between sending its frame and receiving the answer,
+        # the middle of that interval is used as the estimate.
+        executed = []
+        if len(self.buses) == 1 and all(hasattr(motor.modbus_client, 'submit_write_registers') for motor in self.motors):
+            # Submitted through each motor's wrappers, so instrumentation and retries apply
+            method, pending = 'pipelined', {}
+            submits = [(motor.modbus_client.submit_write_registers, motor.slave) for motor in self.motors]
+            for index, (submit, slave) in enumerate(submits):
+                sent = time.perf_counter()
+                pending[submit(CMD_WORD-1, values, slave=slave)] = (index, sent)
+            executed = [0.0] * len(self.motors)
+            for future in as_completed(pending):
+                index, sent = pending[future]
+                executed[index] = (sent + time.perf_counter()) / 2
+                ok = not self._result(future).isError() and ok
+        else:
+            method = 'sequential'
+            requests = [(motor.modbus_client.write_registers, motor.slave) for motor in self.motors]
+            for write, slave in requests:
+                sent = time.perf_counter()
+                response = write(CMD_WORD-1, values, slave=slave)
+                executed.append((sent + time.perf_counter()) / 2)
+                ok = not response.isError() and ok
+        return {'ok': ok, 'method': method, 'skew': max(executed) - min(executed),
+                'offsets': {motor.identifier: t - executed[0] for motor, t in zip(self.motors, executed)}}
@@ -0,0 +1,150 @@
+"""
+Throughput benchmark of AMP_Motor against simulated drives, no hardware needed.
+Reports transactions/s, samples/s per axis and p50/p99 latency of the getters, setters,
+snapshot reads and multi-axis polling. Example:
+    python benchmark.py --axes 4 --latency 0.002 --baudrate 115200
+Lost frames and their recovery can be compared with and without a retry policy:
+    python benchmark.py --drop-rate 0.01 --timeout 1
+    python benchmark.py --drop-rate 0.01 --timeout 1 --retry
+"""
+import argparse
+import json
+import logging
+import time
+from pymodbus.client import ModbusTcpClient
+from ampmotor import AMP_Motor
+from busscheduler import AMP_BusScheduler
+from pipelinedtcp import AMP_PipelinedTcpClient
+from retrypolicy import AMP_ModbusError, AMP_RetryPolicy
+from simdrive import AMP_SimulatedBus
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def _transactions(bus):
+    return sum(drive.transactions for drive in bus.drives.values())
+
+
+def _report(name, bus, axes, started, transactions, latencies, samples, errors=0):
+    elapsed = time.perf_counter() - started
+    return {
+        'case': name,
+        'transactions_per_s': (_transactions(bus) - transactions) / elapsed,
+        'samples_per_s_per_axis': samples / elapsed / axes,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+        'errors': errors,
+    }
+
+
+def bench_calls(name, bus, motors, call, iterations):
+    """
+    Times call(motor) iterations times, round robin over the motors. Failed calls are counted, not timed.
+    """
+    latencies, errors = [], 0
+    transactions, started = _transactions(bus), time.perf_counter()
+    for i in range(iterations):
+        motor = motors[i % len(motors)]
+        begin = time.perf_counter()
+        try:
+            ok = call(motor) is not False
+        except AMP_ModbusError:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - begin)
+        else:
+            errors += 1
+    return _report(name, bus, len(motors), started, transactions, latencies, iterations - errors, errors)
+
+
+def bench_polling(bus, client, motors, duration, fields):
+    """
+    Polls every motor as fast as the bus allows with AMP_BusScheduler.
+    The bus is saturated, so the interval between two samples is the latency of one poll.
+    """
+    scheduler = AMP_BusScheduler(client)
+    for motor in motors:
+        scheduler.motors[motor.identifier] = motor
+    scheduler.add_poll(fields, rate_hz=10000)
+    latencies, last = [], [time.perf_counter()]
+
+    def on_sample(motor, snapshot):
+        now = time.perf_counter()
+        latencies.append(now - last[0])
+        last[0] = now
+
+    transactions, started = _transactions(bus), time.perf_counter()
+    scheduler.run(duration, on_sample)
+    polls = scheduler.stats()['polls']
+    return _report('multi_axis_poll', bus, len(motors), started, transactions, latencies,
+                   sum(poll['samples'] for poll in polls), sum(poll['errors'] for poll in polls))
+
+
+def run(axes=4, latency=0.0, baudrate=None, iterations=500, duration=2.0, window=0, drop_rate=0.0, timeout=1.0,
+        retry=False):
+    """
+    Runs every benchmark case against a fresh simulated bus.
+    :param axes: Number of simulated drives, slaves 1 to axes.
+    :param latency: Seconds each simulated drive takes to answer a transaction.
+    :param baudrate: Serial baud rate to emulate, None for no line delay.
+    :param iterations: Calls per getter/setter/snapshot case.
+    :param duration: Seconds of multi-axis polling.
+    :param window: Use AMP_PipelinedTcpClient with this window when above 0, else the pymodbus client.
+    :param drop_rate: Fraction of requests the simulated drives lose.
+    :param timeout: Response timeout of the client, in seconds.
+    :param retry: Send every call through one shared retrypolicy.AMP_RetryPolicy.
+    :return: A list of result dictionaries, one per case
+    """
+    if drop_rate:
+        logging.getLogger('pymodbus.logging').setLevel(logging.CRITICAL)  # Every dropped request is logged as an error
+    with AMP_SimulatedBus(slaves=range(1, axes + 1), latency=latency, baudrate=baudrate, drop_rate=drop_rate) as bus:
+        if window > 0:
+            client = AMP_PipelinedTcpClient(bus.host, bus.port, window=window, timeout=timeout)
+        else:
+            client = ModbusTcpClient(bus.host, port=bus.port, timeout=timeout)
+        client.connect()
+        motors = [AMP_Motor('Axis{}'.format(slave), slave, client) for slave in bus.drives]
+        if retry:
+            policy = AMP_RetryPolicy(max_timeout=timeout, baudrate=baudrate)
+            for motor in motors:
+                motor.enable_retry_policy(policy)
+        try:
+            return [
+                bench_calls('get_position', bus, motors, lambda m: m.get_position(), iterations),
+                bench_calls('set_p2p_vel', bus, motors, lambda m: m.set_p2p_vel(240), iterations),
+                bench_calls('read_snapshot', bus, motors, lambda m: m.read_snapshot(), iterations),
+                bench_calls('read_snapshot_split', bus, motors, lambda m: m.read_snapshot(max_gap=0), iterations),
+                bench_polling(bus, client, motors, duration, ('position', 'speed', 'current')),
+            ]
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--axes', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per transaction')
+    parser.add_argument('--baudrate', type=int, default=None, help='Emulated serial baud rate')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds of multi-axis polling')
+    parser.add_argument('--window', type=int, default=0, help='Use the pipelined TCP client with this window')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Fraction of requests the drives lose')
+    parser.add_argument('--timeout', type=float, default=1.0, help='Client response timeout in seconds')
+    parser.add_argument('--retry', action='store_true', help='Use an adaptive retry policy')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.axes, args.latency, args.baudrate, args.iterations, args.duration, args.window,
+                  args.drop_rate, args.timeout, args.retry)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print('{:<22}{:>16}{:>20}{:>10}{:>10}{:>10}{:>8}'.format('case', 'transactions/s', 'samples/s per axis',
+                                                               'p50 ms', 'p99 ms', 'max ms', 'errors'))
+        for result in results:
+            print('{case:<22}{transactions_per_s:>16.0f}{samples_per_s_per_axis:>20.1f}'
+                  '{p50_ms:>10.2f}{p99_ms:>10.2f}{max_ms:>10.2f}{errors:>8}'.format(**result))
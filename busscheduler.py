@@ -0,0 +1,169 @@
+import threading
+import time
+from ampmotor import AMP_Motor
+from retrypolicy import bus_errors
+from snapshot import DEFAULT_MAX_GAP, plan_block_reads
+
+
+class _PollJob(object):
+    __slots__ = ('motor', 'fields', 'period', 'priority', 'next_due', 'samples', 'errors', 'missed')
+
+    def __init__(self, motor, fields, rate_hz, priority):
+        self.motor = motor
+        self.fields = tuple(fields)
+        self.period = 1.0 / rate_hz
+        self.priority = priority
+        self.next_due = 0.0
+        self.samples = 0
+        self.errors = 0
+        self.missed = 0
+
+
+class AMP_BusScheduler(object):
+
+    def __init__(self, client, max_gap=DEFAULT_MAX_GAP):
+        """
+        Polls many motors sharing one modbus client at individual per-field rates.
+        Transactions are issued back to back, the scheduler only sleeps when nothing is due.
+        :param client: The Pymodbus client shared by every motor on the bus.
+        :param max_gap: Passed on to AMP_Motor.read_snapshot when merging fields into block reads.
+        """
+        self.modbus_client = client
+        self.max_gap = max_gap
+        self.motors = {}
+        self.jobs = []
+        self.transactions = 0
+        self.busy_time = 0.0
+        self.started = None
+        self._stop = threading.Event()
+
+    def add_motor(self, identifier, slave) -> AMP_Motor:
+        """
+        Creates a motor on the scheduler's client.
+        :param identifier: An identifier to recognize your specific motor.
+        :param slave: The modbus slave of your motor.
+        :return: The new AMP_Motor
+        """
+        motor = AMP_Motor(identifier=identifier, slave=slave, client=self.modbus_client)
+        self.motors[identifier] = motor
+        return motor
+
+    def add_poll(self, fields, rate_hz, priority=0, motors=None):
+        """
+        Requests that a set of telemetry fields is polled at a fixed rate.
+        :param fields: Iterable of field names from snapshot.TELEMETRY_FIELDS.
+        :param rate_hz: Requested polling rate in Hz.
+        :param priority: Higher priorities are served first when several polls are due at the same time.
+        :param motors: An AMP_Motor, a list of them, or None for every motor added so far.
+        """
+        assert rate_hz > 0, "rate_hz must be positive"
+        fields = tuple(fields)
+        plan_block_reads(fields)  # Raises ValueError for unknown fields now rather than on every poll
+        if motors is None:
+            motors = list(self.motors.values())
+        elif isinstance(motors, AMP_Motor):
+            motors = [motors]
+        for motor in motors:
+            self.jobs.append(_PollJob(motor, fields, rate_hz, priority))
+
+    def _next_job(self, now):
+        # Priority plus the number of periods a poll is overdue, so that a
+        # low priority poll eventually wins over a busy high priority one.
+        best, best_score = None, None
+        for job in self.jobs:
+            if job.next_due <= now:
+                score = job.priority + (now - job.next_due) / job.period
+                if best is None or score > best_score:
+                    best, best_score = job, score
+        return best
+
+    def step(self, on_sample=None) -> bool:
+        """
+        Runs the most urgent due poll, merged with every other due poll of the same motor.
+        :param on_sample: Optional callable(motor, snapshot) called with every successful read.
+        :return: True if a transaction was issued, False if nothing was due
+        """
+        now = time.monotonic()
+        job = self._next_job(now)
+        if job is None:
+            return False
+
+        merged = [j for j in self.jobs if j.motor is job.motor and j.next_due <= now]
+        fields = set()
+        for j in merged:
+            fields.update(j.fields)
+
+        try:
+            snapshot = job.motor.read_snapshot(fields, max_gap=self.max_gap)
+        except bus_errors():
+            snapshot = None
+        finished = time.monotonic()
+        self.transactions += 1
+        self.busy_time += finished - now
+
+        for j in merged:
+            if snapshot is None:
+                j.errors += 1
+            else:
+                j.samples += 1
+            j.next_due += j.period
+            skipped = int((finished - j.next_due) / j.period)
+            if skipped > 0:
+                # Skip the slots we could not serve instead of bursting to catch up
+                j.missed += skipped
+                j.next_due += skipped * j.period
+        if snapshot is not None and on_sample is not None:
+            on_sample(job.motor, snapshot)
+        return True
+
+    def run(self, duration=None, on_sample=None):
+        """
+        Polls until stop() is called or the duration has elapsed.
+        :param duration: Seconds to run for, None to run until stopped.
+        :param on_sample: Optional callable(motor, snapshot) called with every successful read.
+        """
+        self._stop.clear()
+        self.started = time.monotonic()
+        for job in self.jobs:
+            job.next_due = self.started
+        end = None if duration is None else self.started + duration
+        while not self._stop.is_set():
+            if end is not None and time.monotonic() >= end:
+                break
+            if not self.step(on_sample):
+                wait = min(job.next_due for job in self.jobs) - time.monotonic() if self.jobs else 0.01
+                if end is not None:
+                    wait = min(wait, end - time.monotonic())
+                if wait > 0:
+                    self._stop.wait(wait)
+
+    def stop(self):
+        """
+        Stops a running scheduler. Safe to call from another thread.
+        """
+        self._stop.set()
+
+    def stats(self):
+        """
+        Reports achieved polling rates against the requested rates.
+        :return: A dictionary with bus utilization and one entry per poll
+        """
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        polls = []
+        for job in self.jobs:
+            polls.append({
+                'motor': job.motor.identifier,
+                'fields': job.fields,
+                'priority': job.priority,
+                'requested_hz': 1.0 / job.period,
+                'achieved_hz': job.samples / elapsed if elapsed else 0.0,
+                'samples': job.samples,
+                'errors': job.errors,
+                'missed': job.missed,
+            })
+        return {
+            'elapsed': elapsed,
+            'transactions': self.transactions,
+            'bus_utilization': self.busy_time / elapsed if elapsed else 0.0,
+            'polls': polls,
+        }
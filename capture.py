@@ -0,0 +1,172 @@
+import math
+import os
+import threading
+import time
+from array import array
+from samplebatch import SampleBatch
+from snapshot import MAX_READ_COUNT
+
+# IP, EP and IX, read as 32 bit signed values in one block read
+CAPTURE_FIELDS = ('position', 'encoder_position', 'position_error')
+
+
+class AMP_EncoderCapture(object):
+
+    def __init__(self, motor, size=100000, rate_hz=None, cpu=None, spin=0.0005):
+        """
+        Captures commanded position (IP), encoder position (EP) and position error (IX) of one motor for tuning.
+        A dedicated thread reads the three registers in one block read per sample and stamps each sample with
+        time.perf_counter_ns() halfway between the request and its answer. The encoder velocity, the following
+        error (IP - EP) and the sampling jitter statistics are updated as every sample arrives. Only run the
+        capture with a client no other thread is using, or through a pooled connection.
+        :param motor: The AMP_Motor to capture.
+        :param size: Samples to capture, the capture ends once they are taken.
+        :param rate_hz: Sampling rate. None samples as fast as the bus allows.
+        :param cpu: CPU to pin the capture thread to, where the platform supports os.sched_setaffinity.
+        :param spin: Seconds before a sample is due during which the thread polls the clock instead of sleeping.
+        """
+        self.motor = motor
+        self.period_ns = None if rate_hz is None else int(1e9 / rate_hz)
+        self.cpu = cpu
+        self.spin = spin
+        self.batch = SampleBatch(CAPTURE_FIELDS, size, max_gap=MAX_READ_COUNT, codec=motor.codec)
+        assert len(self.batch.blocks) == 1
+        self.velocity = array('d', bytes(8 * size))  # Encoder velocity in pulses/s, 0.0 for invalid samples
+        self.following_error = array('i', bytes(4 * size))
+        self.latest = None  # (t_ns, position, encoder_position, position_error, velocity, following_error)
+        self.errors = 0
+        self.missed = 0  # Sample times skipped because the previous read ended too late
+        self.failure = None  # The exception that ended the capture early, raised again by stop()
+        self._interval_count = 0
+        self._interval_mean = 0.0
+        self._interval_m2 = 0.0
+        self._interval_min = None
+        self._interval_max = None
+        self._error_max = 0
+        self._error_squares = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.failure = None
+        self._thread = threading.Thread(target=self._capture_loop, name='AMP capture {}'.format(self.motor.identifier),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Ends the capture early and waits for the capture thread. Raises the exception that ended the capture
+        early, if any.
+        """
+        self._stop.set()
+        self.wait()
+        if self.failure is not None:
+            raise self.failure
+
+    def wait(self, timeout=None) -> bool:
+        """
+        :return: True once the capture ended
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _capture_loop(self):
+        try:
+            self._capture()
+        except Exception as e:  # Kept for stop(), the thread would otherwise end without a trace
+            self.failure = e
+
+    def _capture(self):
+        if self.cpu is not None and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {self.cpu})  # 0 is the calling thread on Linux
+        batch, motor = self.batch, self.motor
+        unpack, raw, row_size = batch.row_struct.unpack_from, batch.raw, batch.row_size
+        previous = None  # (t_ns, encoder position) of the last valid sample
+        last_t_ns = None
+        next_due = time.perf_counter_ns()
+        while not self._stop.is_set() and not batch.full:
+            if self.period_ns is not None:
+                self._wait_until(next_due)
+                next_due += self.period_ns
+                late = time.perf_counter_ns() - next_due
+                if late >= 0:  # Samples that can no longer be taken on time are skipped, not taken in a burst
+                    skipped = late // self.period_ns + 1
+                    self.missed += skipped
+                    next_due += skipped * self.period_ns
+            row = batch.count
+            if not motor.read_into(batch, time.perf_counter_ns):
+                self.errors += 1
+                previous = None
+                continue
+            t_ns = batch.t_ns[row] = (batch.t_ns[row] + time.perf_counter_ns()) // 2
+            position, encoder_position, position_error = unpack(raw, row * row_size)
+            following_error = position - encoder_position
+            velocity = 0.0
+            if previous is not None:
+                velocity = (encoder_position - previous[1]) * 1e9 / (t_ns - previous[0])
+            self.velocity[row] = velocity
+            self.following_error[row] = following_error
+            self.latest = (t_ns, position, encoder_position, position_error, velocity, following_error)
+            previous = (t_ns, encoder_position)
+            if last_t_ns is not None:
+                self._add_interval(t_ns - last_t_ns)
+            last_t_ns = t_ns
+            self._error_max = max(self._error_max, abs(following_error))
+            self._error_squares += following_error * following_error
+
+    def _wait_until(self, due_ns):
+        remaining = (due_ns - time.perf_counter_ns()) / 1e9 - self.spin
+        if remaining > 0:
+            self._stop.wait(remaining)
+        while time.perf_counter_ns() < due_ns:
+            pass
+
+    def _add_interval(self, interval_ns):
+        # Welford's running mean and variance of the sampling interval
+        self._interval_count += 1
+        delta = interval_ns - self._interval_mean
+        self._interval_mean += delta / self._interval_count
+        self._interval_m2 += delta * (interval_ns - self._interval_mean)
+        self._interval_min = interval_ns if self._interval_min is None else min(self._interval_min, interval_ns)
+        self._interval_max = interval_ns if self._interval_max is None else max(self._interval_max, interval_ns)
+
+    def columns(self) -> dict:
+        """
+        :return: The captured t_ns (perf_counter_ns), valid, position, encoder_position and position_error arrays,
+        plus velocity and following_error
+        """
+        columns = self.batch.columns()
+        columns['velocity'] = self.velocity[:self.batch.count]
+        columns['following_error'] = self.following_error[:self.batch.count]
+        return columns
+
+    def stats(self) -> dict:
+        """
+        :return: A dictionary with the samples taken, failed reads, skipped sample times, the achieved rate,
+        the mean, standard deviation, minimum and maximum interval between samples in microseconds, and the
+        largest and RMS following error in pulses
+        """
+        count = self._interval_count
+        valid = self.batch.count - self.errors
+        return {
+            'samples': valid,
+            'errors': self.errors,
+            'missed': self.missed,
+            'rate_hz': 1e9 / self._interval_mean if count else 0.0,
+            'interval_mean_us': self._interval_mean / 1e3,
+            'interval_std_us': math.sqrt(self._interval_m2 / count) / 1e3 if count else 0.0,
+            'interval_min_us': (self._interval_min or 0) / 1e3,
+            'interval_max_us': (self._interval_max or 0) / 1e3,
+            'max_following_error': self._error_max,
+            'rms_following_error': math.sqrt(self._error_squares / valid) if valid else 0.0,
+        }
@@ -0,0 +1,190 @@
+import threading
+import time
+from ampcodec import DEFAULT_CODEC
+from ampmotor import AMP_Motor
+from retrypolicy import set_client_timeout
+
+
+class PooledConnection(object):
+
+    def __init__(self, endpoint, factory, backoff=0.5, max_backoff=30.0):
+        """
+        A persistent modbus client shared by every motor on one endpoint. Each transaction holds
+        the connection's lock so threads never interleave frames, dropped connections are reopened
+        on the next transaction and failed reconnects back off exponentially.
+        :param endpoint: The pool key, ('tcp', host, port) or ('serial', port, baudrate, parity, stopbits).
+        :param factory: Callable returning a new, unconnected Pymodbus client.
+        :param backoff: Seconds to wait after the first failed connect.
+        :param max_backoff: Longest wait between connect attempts.
+        """
+        self.endpoint = endpoint
+        self.baudrate = endpoint[2] if endpoint[0] == 'serial' else None
+        self.lock = threading.RLock()
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.transactions = 0
+        self.failures = 0
+        self.reconnects = 0
+        self._factory = factory
+        self._client = None
+        self._timeout = None
+        self._delay = 0.0
+        self._retry_at = 0.0
+
+    @property
+    def connected(self):
+        return self._client is not None and self._client.connected
+
+    def _connect(self):
+        if self.connected:
+            return self._client
+        now = time.monotonic()
+        if now < self._retry_at:
+            raise ConnectionError('{} is backing off for {:.1f}s'.format(self.endpoint, self._retry_at - now))
+        if self._client is None:
+            self._client = self._factory()
+            if self._timeout is not None:
+                set_client_timeout(self._client, self._timeout)
+        else:
+            self.reconnects += 1
+        if not self._client.connect():
+            self._delay = min(self.max_backoff, self._delay * 2 if self._delay else self.backoff)
+            self._retry_at = now + self._delay
+            raise ConnectionError('Unable to connect to {}'.format(self.endpoint))
+        self._delay = 0.0
+        return self._client
+
+    def _execute(self, method, *args, **kwargs):
+        from pymodbus.exceptions import ModbusException  # Loaded with the first client, see AMP_ConnectionPool
+        with self.lock:
+            client = self._connect()
+            try:
+                response = getattr(client, method)(*args, **kwargs)
+            except (ModbusException, OSError):
+                self.failures += 1
+                client.close()
+                raise
+            self.transactions += 1
+            return response
+
+    def set_timeout(self, timeout):
+        """
+        Changes the response timeout of the current and of any reopened client, see retrypolicy.AMP_RetryPolicy.
+        """
+        self._timeout = timeout
+        if self._client is not None:
+            set_client_timeout(self._client, timeout)
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        return self._execute('read_holding_registers', address, count=count, slave=slave)
+
+    def write_register(self, address, value, slave=1):
+        return self._execute('write_register', address, value, slave=slave)
+
+    def write_registers(self, address, values, slave=1, no_response_expected=False):
+        return self._execute('write_registers', address, values, slave=slave, no_response_expected=no_response_expected)
+
+    def check_health(self, slave=1, address=0) -> bool:
+        """
+        Verifies the endpoint answers a one register read, reconnecting if needed.
+        :param slave: A slave known to be present on the endpoint.
+        :param address: Zero based register address to read.
+        :return: True if the read succeeded
+        """
+        from pymodbus.exceptions import ModbusException
+        try:
+            return not self.read_holding_registers(address, count=1, slave=slave).isError()
+        except (ModbusException, OSError):
+            return False
+
+    def close(self):
+        with self.lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def __repr__(self):
+        return 'PooledConnection({}, connected={})'.format(self.endpoint, self.connected)
+
+
+class AMP_ConnectionPool(object):
+
+    def __init__(self, timeout=1, retries=3, backoff=0.5, max_backoff=30.0):
+        """
+        Thread-safe pool of persistent modbus connections keyed by endpoint, so one process can
+        drive many motors across several gateways and serial ports.
+        :param timeout: Response timeout in seconds passed to each Pymodbus client.
+        :param retries: Retries passed to each Pymodbus client.
+        :param backoff: Seconds to wait after the first failed connect to an endpoint.
+        :param max_backoff: Longest wait between connect attempts.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connections = {}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint, factory) -> PooledConnection:
+        with self._lock:
+            connection = self.connections.get(endpoint)
+            if connection is None:
+                connection = PooledConnection(endpoint, factory, self.backoff, self.max_backoff)
+                self.connections[endpoint] = connection
+            return connection
+
+    def tcp(self, host, port=502) -> PooledConnection:
+        """
+        :return: The pooled connection to a Modbus TCP drive or gateway
+        """
+        from pymodbus.client import ModbusTcpClient  # Pymodbus is loaded when the first connection is requested
+        return self._get(('tcp', host, port),
+                         lambda: ModbusTcpClient(host, port=port, timeout=self.timeout, retries=self.retries))
+
+    def serial(self, port, baudrate=9600, parity='N', stopbits=1) -> PooledConnection:
+        """
+        :return: The pooled connection to a Modbus RTU serial port
+        """
+        from pymodbus.client import ModbusSerialClient
+        for endpoint in self.connections:
+            if endpoint[0] == 'serial' and endpoint[1] == port and endpoint[2:] != (baudrate, parity, stopbits):
+                raise ValueError('{} is already open with settings {}'.format(port, endpoint[2:]))
+        return self._get(('serial', port, baudrate, parity, stopbits),
+                         lambda: ModbusSerialClient(port, baudrate=baudrate, parity=parity, stopbits=stopbits,
+                                                    timeout=self.timeout, retries=self.retries))
+
+    def motor(self, identifier, slave, host=None, port=502, serial_port=None, baudrate=9600,
+              codec=DEFAULT_CODEC) -> AMP_Motor:
+        """
+        Creates a motor routed to its pooled connection.
+        :param identifier: An identifier to recognize your specific motor.
+        :param slave: The modbus slave of your motor.
+        :param host: IP address of the drive or gateway, for Modbus TCP.
+        :param port: Modbus TCP port.
+        :param serial_port: Serial port name, e.g. 'COM8', for Modbus RTU.
+        :param baudrate: Serial baud rate.
+        :param codec: The ampcodec.RegisterCodec matching the drive's byte and word order.
+        :return: The new AMP_Motor
+        """
+        assert (host is None) != (serial_port is None), "Pass either host or serial_port"
+        connection = self.tcp(host, port) if host is not None else self.serial(serial_port, baudrate)
+        return AMP_Motor(identifier=identifier, slave=slave, client=connection, codec=codec)
+
+    def check_health(self) -> dict:
+        """
+        Checks every pooled endpoint.
+        :return: A dictionary of endpoint to True if it answered
+        """
+        return {endpoint: connection.check_health() for endpoint, connection in list(self.connections.items())}
+
+    def close(self):
+        with self._lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
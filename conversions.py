@@ -1,6 +1,37 @@
 import math
+import numbers
 from math import floor  # Used to round down values to the nearest integer
 
+# Default column conversions used by AMP_Converter.convert_table
+TABLE_CONVERSIONS = {
+    'position': 'convert_pulses_to_degrees',
+    'encoder_position': 'convert_pulses_to_degrees',
+    'position_error': 'convert_pulses_to_degrees',
+    'speed': 'convert_smunits_to_speed',
+}
+
+
+def _operand(value):
+    """
+    Scalars are used as they are. Anything else (lists, array.array, memoryview, NumPy arrays)
+    is turned into a NumPy array, NumPy is only imported the first time this happens.
+    """
+    if isinstance(value, numbers.Real):
+        return value
+    import numpy
+    return numpy.asarray(value)
+
+
+def _floor(value):
+    """
+    Rounds down to an int for scalars, or to an int64 array for arrays.
+    """
+    if isinstance(value, numbers.Real):
+        return int(floor(value))
+    import numpy
+    return numpy.floor(value).astype(numpy.int64)
+
+
 class AMP_Converter:
     
     def __init__(self, gear_multiplier, steps_per_rev, **kwargs):
@@ -20,61 +51,97 @@ class AMP_Converter:
         """
         Converts a given number of motor pulses (steps) to degrees of rotation.
         """
+        steps = _operand(steps)
         percentage_of_steps = steps / (self.steps_per_rev * self.gear_multiplier)
         degrees = percentage_of_steps * 360
-        return int(floor(degrees))  # Return the floored integer value
+        return _floor(degrees)  # Return the floored integer value
 
     def convert_degrees_to_pulses(self, degrees):
         """
         Converts degrees of rotation to the corresponding number of pulses (steps).
         """
+        degrees = _operand(degrees)
         percentage_of_movement = degrees / 360
         steps = percentage_of_movement * self.steps_per_rev * self.gear_multiplier
-        return int(floor(steps))
+        return _floor(steps)
 
     def convert_speed_to_VEunits(self, speed):  # speed in RPM
         """
         Converts speed from RPM to VE units.
         VE units appear to be based on 240 pulses per revolution.
         """
+        speed = _operand(speed)
         VEunits = (speed / 60) * 240 * self.gear_multiplier
-        return int(floor(VEunits))
+        return _floor(VEunits)
 
     def convert_smunits_to_speed(self, VEunits):
         """
         Converts speed from VE units back to RPM.
         """
+        VEunits = _operand(VEunits)
         rpm = (60 * VEunits) / (240 * self.gear_multiplier)
-        return int(floor(rpm))
+        return _floor(rpm)
 
     def convert_acceleration_to_smunits(self, acceleration):  # acceleration in rev/s²
         """
         Converts acceleration from rev/s² to servo motion units (AC register units).
         """
+        acceleration = _operand(acceleration)
         ACunits = acceleration * 6 * self.gear_multiplier
-        return int(floor(ACunits))
+        return _floor(ACunits)
 
     def convert_smunits_to_acceleration(self, AC_value):
         """
         Converts acceleration from servo motion units (AC register units) back to rev/s².
         """
+        AC_value = _operand(AC_value)
         rps_per_sec = AC_value / (6 * self.gear_multiplier)
-        return int(floor(rps_per_sec))
+        return _floor(rps_per_sec)
+
+    def convert_VEunits_to_pulse_rate(self, VEunits):
+        """
+        Converts a motor speed in VE units (1/240 rps) to pulses per second.
+        """
+        return _operand(VEunits) / 240 * self.steps_per_rev
+
+    def convert_smunits_to_pulse_rate_change(self, AC_value):
+        """
+        Converts a motor acceleration in AC register units (1/6 rps/s) to pulses per second².
+        """
+        return _operand(AC_value) / 6 * self.steps_per_rev
 
     def convert_millimeters_to_pulses(self, millimeters):
         """
         Converts a linear distance (millimeters) into the corresponding number of motor pulses.
         Uses hub circumference for calculation.
         """
+        millimeters = _operand(millimeters)
         hub_circumference = self.hub_diameter * math.pi  # Circumference of the hub in mm
         hub_rotations = millimeters / hub_circumference  # Number of hub rotations to cover the distance
         pulses = hub_rotations * self.steps_per_rev * self.gear_multiplier  # Convert to pulses
-        return int(floor(pulses))
+        return _floor(pulses)
 
     def convert_pulses_to_millimeters(self, pulses):
         """
         Converts a number of motor pulses into a linear distance in millimeters.
         """
+        pulses = _operand(pulses)
         steps_as_multiplier = pulses / (self.steps_per_rev * self.gear_multiplier)
         distance = math.pi * self.hub_diameter * steps_as_multiplier  # Convert back to distance
-        return int(floor(distance))
\ No newline at end of file
+        return _floor(distance)
+
+    def convert_table(self, table, conversions=None):
+        """
+        Converts several columns of a recorded table at once, one vectorized pass per column.
+        :param table: Dictionary of column name to values, e.g. one motor of recorder.load_recording().
+        :param conversions: Dictionary of column name to converter method name. Defaults to TABLE_CONVERSIONS.
+        Columns without a conversion are returned unchanged.
+        :return: A new dictionary with the converted columns
+        """
+        if conversions is None:
+            conversions = TABLE_CONVERSIONS
+        converted = dict(table)
+        for column, method in conversions.items():
+            if column in table:
+                converted[column] = getattr(self, method)(table[column])
+        return converted
@@ -0,0 +1,274 @@
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ampcodec import DEFAULT_CODEC
+from ampmotor import AMP_Motor
+from register_table import REGISTERS_BY_NAME
+
+STANDARD_BAUDRATES = (9600, 19200, 38400, 57600, 115200)
+STANDARD_PARITIES = ('N', 'E', 'O')
+MAX_SLAVE = 247  # Highest unicast address on an RTU bus
+QUICK_SLAVES = range(1, 9)  # Probed first under every line setting, drives are usually set to low addresses
+MAX_TURNAROUND = 0.1  # Longest turnaround the scanner adapts to after seeing late answers
+
+# Read together in one block once a drive has answered
+IDENTITY_REGISTERS = ('MODEL_NUMBER', 'SUB_MODEL', 'DSP_FIRMWARE_VERSION', 'FPGA_FIRMWARE_VERSION_NO',
+                      'FPGA_FIRMWARE_VERSION_LA')
+_IDENTITY_START = REGISTERS_BY_NAME[IDENTITY_REGISTERS[0]].address
+assert [REGISTERS_BY_NAME[name].address for name in IDENTITY_REGISTERS] == \
+    list(range(_IDENTITY_START, _IDENTITY_START + len(IDENTITY_REGISTERS)))
+
+READ_HOLDING_REGISTERS = 3
+
+
+def crc16(frame) -> bytes:
+    """
+    :return: The Modbus RTU CRC of a frame, in wire order
+    """
+    crc = 0xFFFF
+    for byte in frame:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return struct.pack('<H', crc)
+
+
+class DiscoveredDrive(object):
+    """
+    A drive that answered a scan, with the line settings it answered on and its identity registers.
+    identity is None when the drive answered the probe but refused the identity read.
+    """
+    __slots__ = ('port', 'baudrate', 'parity', 'stopbits', 'slave', 'identity')
+
+    def __init__(self, port, baudrate, parity, stopbits, slave, identity=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.parity = parity
+        self.stopbits = stopbits
+        self.slave = slave
+        self.identity = identity
+
+    @property
+    def settings(self):
+        return self.port, self.baudrate, self.parity, self.stopbits
+
+    def motor(self, client, identifier=None, codec=DEFAULT_CODEC) -> AMP_Motor:
+        """
+        :param client: A modbus client opened with this drive's settings, shared by the drives of the bus.
+        :param identifier: Identifier of the motor, '<port>:<slave>' when None.
+        :return: An AMP_Motor talking to this drive
+        """
+        identifier = identifier if identifier is not None else '{}:{}'.format(self.port, self.slave)
+        return AMP_Motor(identifier=identifier, slave=self.slave, client=client, codec=codec)
+
+    def __repr__(self):
+        return 'DiscoveredDrive({} {} {}{}{} slave={} identity={})'.format(
+            self.port, self.baudrate, 8, self.parity, self.stopbits, self.slave, self.identity)
+
+
+class AMP_BusScanner(object):
+
+    def __init__(self, port, baudrates=STANDARD_BAUDRATES, parities=STANDARD_PARITIES, stopbits=1,
+                 turnaround=0.005, retries=1):
+        """
+        Finds the drives on one RTU bus: their address, baud rate and parity. Each probe is a one register
+        read sent straight to the port and given just the time the answer needs on the line plus the drive's
+        turnaround, so silent addresses cost milliseconds instead of a client timeout.
+        :param port: Serial port name, e.g. 'COM8' or '/dev/ttyUSB0', or a pyserial URL such as
+        'socket://10.10.10.10:4001' for an RTU over TCP gateway.
+        :param baudrates: Baud rates to try, in order.
+        :param parities: Parities to try, in order, 'N', 'E' or 'O'.
+        :param stopbits: Stop bits of the line.
+        :param turnaround: Time, in seconds, a drive takes to start answering a request. An answer arriving
+        after it is still recognized by its address when the next probe is sent: the turnaround is doubled,
+        up to MAX_TURNAROUND, and the address is probed again at the end of the sweep.
+        :param retries: Extra probes of an address whose answer was garbled.
+        """
+        self.port = port
+        self.baudrates = tuple(baudrates)
+        self.parities = tuple(parities)
+        self.stopbits = stopbits
+        self.turnaround = turnaround
+        self.retries = retries
+        self.probes = 0
+        self.late = set()  # Addresses that answered after their probe timed out, probed again by scan()
+        self.complete = False  # False when the last scan ran out of time
+        self.elapsed = 0.0
+        self._serial = None
+
+    def _char_time(self, baudrate, parity):
+        return (1 + 8 + (parity != 'N') + self.stopbits) / baudrate
+
+    def probe_timeout(self, baudrate, parity, response_bytes) -> float:
+        """
+        :return: Seconds to wait for an answer of response_bytes once the request has been sent
+        """
+        return (response_bytes + 3.5) * self._char_time(baudrate, parity) + self.turnaround
+
+    def _open(self, baudrate, parity):
+        if self._serial is None:
+            import serial  # pyserial, installed with pymodbus[serial]
+            self._serial = serial.serial_for_url(self.port, baudrate=baudrate, parity=parity,
+                                                 stopbits=self.stopbits, timeout=0)
+        else:
+            self._serial.baudrate = baudrate
+            self._serial.parity = parity
+        return self._serial
+
+    def close(self):
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    def _answered_late(self, frame):
+        # A valid frame from an address other than the one probed is the late answer to an earlier probe
+        if len(frame) >= 5 and 1 <= frame[0] <= MAX_SLAVE and crc16(frame[:-2]) == frame[-2:]:
+            self.late.add(frame[0])
+            self.turnaround = min(2 * self.turnaround, MAX_TURNAROUND)
+
+    def _drain(self, port, wait=0.0):
+        # Reads what arrived since the last probe before it is flushed, so a late answer is not lost
+        port.timeout = wait
+        stale = port.read(256)
+        if stale:
+            self._answered_late(stale)
+            port.reset_input_buffer()
+
+    def _read_registers(self, slave, register, count, baudrate, parity):
+        # Returns the registers, the exception code of an exception answer, None for silence,
+        # or False for a garbled answer
+        port = self._open(baudrate, parity)
+        self._drain(port)
+        request = struct.pack('>BBHH', slave, READ_HOLDING_REGISTERS, register - 1, count)
+        port.write(request + crc16(request))
+        port.flush()
+        self.probes += 1
+        char_time = self._char_time(baudrate, parity)
+        port.timeout = self.probe_timeout(baudrate, parity, 5 + 2 * count)
+        header = port.read(3)
+        answer = None
+        if len(header) == 3:
+            remaining = 2 if header[1] & 0x80 else header[2] + 2
+            port.timeout = (remaining + 3.5) * char_time + 0.001
+            frame = header + port.read(remaining)
+            if header[0] != slave:
+                self._answered_late(frame)  # This probe's own answer may still follow, it is probed again
+            elif len(frame) == 3 + remaining and crc16(frame[:-2]) == frame[-2:]:
+                if header[1] == READ_HOLDING_REGISTERS | 0x80:
+                    answer = header[2]
+                elif header[1] == READ_HOLDING_REGISTERS and header[2] == 2 * count:
+                    answer = list(struct.unpack_from('>{}H'.format(count), frame, 3))
+        if answer is None and header:
+            answer = False
+            port.reset_input_buffer()
+        time.sleep(3.5 * char_time)  # Silent interval before the next frame
+        return answer
+
+    def probe(self, slave, baudrate, parity) -> bool:
+        """
+        :return: True if a drive answered at this address and line setting, even with an exception response
+        """
+        for _ in range(1 + self.retries):
+            answer = self._read_registers(slave, _IDENTITY_START, 1, baudrate, parity)
+            if answer is not False:
+                return answer is not None
+        return False
+
+    def identify(self, slave, baudrate, parity):
+        """
+        :return: A dictionary of IDENTITY_REGISTERS values, or None if the drive refused the read
+        """
+        for _ in range(1 + self.retries):
+            answer = self._read_registers(slave, _IDENTITY_START, len(IDENTITY_REGISTERS), baudrate, parity)
+            if isinstance(answer, list):
+                return dict(zip(IDENTITY_REGISTERS, answer))
+        return None
+
+    def scan(self, slaves=range(1, MAX_SLAVE + 1), time_budget=None, all_settings=False) -> list:
+        """
+        Sweeps the bus. QUICK_SLAVES are probed first under every line setting, and the full sweep then
+        only covers the settings something answered on. The full sweep falls back to every setting, up to
+        the first one a drive answers on, when no quick probe got an answer.
+        :param slaves: Addresses to probe.
+        :param time_budget: Seconds after which the scan stops with what it found so far, see complete.
+        :param all_settings: Sweep every setting even after drives were found, for buses mixing settings.
+        :return: A list of DiscoveredDrive, in the order they were found
+        """
+        started = time.monotonic()
+        deadline = None if time_budget is None else started + time_budget
+        settings = [(baudrate, parity) for baudrate in self.baudrates for parity in self.parities]
+        slaves = list(slaves)
+        found, seen = [], set()
+        self.complete = False
+
+        def sweep(setting, addresses):
+            self.late.clear()
+            turnaround = self.turnaround
+            for slave in addresses:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+                if slave in seen or not self.probe(slave, *setting):
+                    continue
+                seen.add(slave)
+                found.append(DiscoveredDrive(self.port, setting[0], setting[1], self.stopbits, slave,
+                                             self.identify(slave, *setting)))
+            # Addresses that answered too late are probed again with the longer turnaround, as long as it grows
+            self._drain(self._open(*setting), self.turnaround)
+            late = [slave for slave in addresses if slave in self.late and slave not in seen]
+            return sweep(setting, late) if late and self.turnaround > turnaround else True
+
+        try:
+            quick = [slave for slave in slaves if slave in QUICK_SLAVES]
+            answered = []
+            for setting in settings:
+                if not sweep(setting, quick):
+                    return found
+                if any((drive.baudrate, drive.parity) == setting for drive in found):
+                    answered.append(setting)
+                    if not all_settings:
+                        break
+            rest = [slave for slave in slaves if slave not in QUICK_SLAVES]
+            for setting in settings if all_settings or not answered else answered:
+                if not sweep(setting, rest):
+                    return found
+                if not answered and found and not all_settings:
+                    break  # The fallback stops at the first setting drives answered on, like the quick probes
+            self.complete = True
+            return found
+        finally:
+            self.elapsed = time.monotonic() - started
+            self.close()
+
+
+def discover(ports, pool=None, time_budget=None, codec=DEFAULT_CODEC, **scanner_options) -> list:
+    """
+    Scans several RTU buses in parallel, one thread per port, and returns a ready to use motor for every drive.
+    Drives found on the same port and settings share one client.
+    :param ports: Serial port names or pyserial URLs, see AMP_BusScanner.
+    :param pool: An AMP_ConnectionPool to open the clients from, else a ModbusSerialClient is created per bus.
+    :param time_budget: Seconds each port may be scanned for.
+    :param codec: The ampcodec.RegisterCodec of the drives.
+    :param scanner_options: Keyword arguments of AMP_BusScanner, e.g. baudrates=(115200,) or parities=('N',).
+    :return: A list of AMP_Motor, each with the DiscoveredDrive it came from in its drive attribute
+    """
+    ports = [ports] if isinstance(ports, str) else list(ports)
+    scanners = [AMP_BusScanner(port, **scanner_options) for port in ports]
+    with ThreadPoolExecutor(max_workers=len(scanners) or 1) as executor:
+        results = list(executor.map(lambda scanner: scanner.scan(time_budget=time_budget), scanners))
+
+    clients, motors = {}, []
+    for drive in (drive for drives in results for drive in drives):
+        client = clients.get(drive.settings)
+        if client is None:
+            if pool is not None:
+                client = pool.serial(drive.port, drive.baudrate, drive.parity, drive.stopbits)
+            else:
+                from pymodbus.client import ModbusSerialClient
+                client = ModbusSerialClient(drive.port, baudrate=drive.baudrate, parity=drive.parity,
+                                            stopbits=drive.stopbits, timeout=1)
+                client.connect()
+            clients[drive.settings] = client
+        motor = drive.motor(client, codec=codec)
+        motor.drive = drive
+        motors.append(motor)
+    return motors
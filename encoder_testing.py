@@ -1,12 +1,12 @@
-from pymodbus.client import ModbusSerialClient as ModbusClientRTU
-#from pymodbus.client import ModbusTcpClient as ModbusClientTCP
+from connectionpool import AMP_ConnectionPool
 from ampmotor import AMP_Motor
+from retrypolicy import AMP_ModbusError, AMP_RetryPolicy
+from capture import AMP_EncoderCapture
 from AMP_Opcodes import *
 from conversions import AMP_Converter
 import time 
 import keyboard
 import threading
-import csv
 
 
 
@@ -18,21 +18,18 @@ def log_values(axis, filename, duration):
 
         while (time.time() - start_time) < duration:
             elapsed_time = round(time.time() - start_time, 2)
+            fields = ('current', 'drivetemp', 'dsptemp', 'voltage', 'speed', 'position')
             try:
-                current = axis.get_current()
-                temp = axis.get_drivetemp() 
-                dsp_temp = axis.get_dsptemp()
-                DCvolts = axis.get_voltage()
-                speed = axis.get_speed()
-                pos= axis.get_position()
-
-            except Exception as e:
-                current = "ERROR"
-                temp = "ERROR"
-                dsp_temp = "ERROR"
-                DCvolts = "ERROR"
-                speed = "ERROR"
-                pos = "ERROR"
+                # One block read instead of six separate getter calls. A block that still fails after
+                # the retries only loses its own fields, the rest of the row is kept.
+                snapshot = axis.read_snapshot(fields, partial=True)
+                current, temp, dsp_temp, DCvolts, speed, pos = (
+                    "ERROR" if getattr(snapshot, field) is None else getattr(snapshot, field) for field in fields)
+                if snapshot.errors:
+                    print(f"Error reading {', '.join(snapshot.errors)}: {next(iter(snapshot.errors.values()))}")
+
+            except (AMP_ModbusError, ConnectionError) as e:
+                current = temp = dsp_temp = DCvolts = speed = pos = "ERROR"
                 print(f"Error reading something: {e}")
 
             if keyboard.is_pressed('esc'):
@@ -49,14 +46,19 @@ def log_values(axis, filename, duration):
 Use either Modbus RTU or Modbus TCP based on the product's supported communication interface.
 Uncomment the appropriate line below
 """
-modbus_client = ModbusClientRTU(port="COM8", baudrate=9600, timeout=1)
-#modbus_client = ModbusClientTCP(host='10.10.10.10', port=502) 
+# The pooled connection serializes transactions, so the logging thread and the main thread can share it
+pool = AMP_ConnectionPool(timeout=1)
+modbus_client = pool.serial("COM8", baudrate=9600)
+#modbus_client = pool.tcp('10.10.10.10', port=502) 
 
 # Create an instance of AMP_Motor
 AMP_Axis = AMP_Motor(identifier="MDXT82", slave=1, client=modbus_client) 
 print(f"AMP_Axis1 identifier: {AMP_Axis.identifier}")  # Output: MDXT82
 print(f"AMP_Axis1 slave address: {AMP_Axis.slave}")  # Output: 1
 
+# A lost frame is retried after a few milliseconds instead of stalling the loop for the full timeout
+retry_policy = AMP_Axis.enable_retry_policy(AMP_RetryPolicy(retries=2, max_timeout=1))
+
 
 AMP_Axis_Convert = AMP_Converter(steps_per_rev=10000, gear_multiplier=1)
 
@@ -78,6 +80,10 @@ print(f"{AMP_Axis.identifier} jog speed sent?: {Jog_speed_sent}")
 # Start logging in a separate thread
 log_thread = threading.Thread(target=log_values, args=(AMP_Axis, "JL_3500_noRegen_30rps4.txt", 10))
 log_thread.start()
+
+# Capture IP, EP and IX as fast as the bus allows while jogging, with velocity and following error for tuning
+encoder_capture = AMP_EncoderCapture(AMP_Axis, size=100000)
+encoder_capture.start()
 time.sleep(1.5)
 
 # Enable all motors
@@ -97,5 +103,14 @@ SCL_cmd_sent = AMP_Axis.SCL_Command(MD)
 print("The motor has been disabled")
 
 log_thread.join()
-
-modbus_client.close()
+encoder_capture.stop()
+print(f"Encoder capture: {encoder_capture.stats()}")
+captured = encoder_capture.columns()
+with open("encoder_capture.txt", "w") as file:
+    file.write("t_ns, position, encoder_position, position_error, velocity, following_error\n")
+    for row in zip(*(captured[name] for name in ('t_ns', 'position', 'encoder_position', 'position_error',
+                                                  'velocity', 'following_error'))):
+        file.write(", ".join(str(value) for value in row) + "\n")
+print(f"Retry policy: {retry_policy.stats()}")
+
+pool.close()
@@ -0,0 +1,156 @@
+"""
+Generates register_table.py from the MDX+ MODBUS REGISTERS.xlsx spreadsheet.
+Only this script needs openpyxl (pip install openpyxl), the generated table imports nothing.
+
+Usage: python generate_register_table.py ["MDX+ MODBUS REGISTERS.xlsx"] [register_table.py]
+"""
+import re
+import sys
+import openpyxl
+
+SPREADSHEET = 'MDX+ MODBUS REGISTERS.xlsx'
+OUTPUT = 'register_table.py'
+SKIPPED_DESCRIPTIONS = ('reserved', 'internal use')
+UNITLESS = ('', '—', '——')
+
+HEADER = '''# Generated by generate_register_table.py from {source}. Do not edit by hand,
+# edit the spreadsheet (or the generator) and regenerate instead.
+
+
+class Register(object):
+    """
+    A holding register of an AMP drive.
+    address: 1-based register number (40001 is address 1), width: 1 or 2 registers,
+    scale: multiply the raw value by scale to get units, access: 'R' or 'RW'.
+    """
+    __slots__ = ('name', 'address', 'width', 'signed', 'scale', 'units', 'access', 'description')
+
+    def __init__(self, name, address, width, signed, scale, units, access, description):
+        self.name = name
+        self.address = address
+        self.width = width
+        self.signed = signed
+        self.scale = scale
+        self.units = units
+        self.access = access
+        self.description = description
+
+    @property
+    def writable(self):
+        return self.access == 'RW'
+
+    def __repr__(self):
+        return 'Register({{!r}}, address={{}}, width={{}})'.format(self.name, self.address, self.width)
+
+
+REGISTERS = (
+'''
+
+FOOTER = ''')
+
+REGISTERS_BY_NAME = {register.name: register for register in REGISTERS}
+REGISTERS_BY_ADDRESS = {register.address: register for register in REGISTERS}
+'''
+
+
+def parse_address(text):
+    """
+    '40007..008' -> (7, 2), '40019' -> (19, 1)
+    """
+    first = str(text).split('..')[0].strip()
+    return int(first) - 40000, 2 if '..' in str(text) else 1
+
+
+def parse_units(text):
+    """
+    Splits a units cell into a scale and a unit name. '0.1℃' -> (0.1, '℃'), '1/240 (rps)' -> (1/240, 'rps')
+    """
+    text = str(text if text is not None else '').strip()
+    if text in UNITLESS or '～' in text:
+        return 1.0, ''
+    match = re.match(r'^(\d+)/(\d+)\s*\(?([^)]*)\)?$', text)
+    if match:
+        return int(match.group(1)) / int(match.group(2)), match.group(3).strip()
+    match = re.match(r'^(\d*\.?\d+)\s*(.*)$', text)
+    if match:
+        return float(match.group(1)), match.group(2).strip()
+    return 1.0, text
+
+
+def parse_range(text):
+    """
+    '-24000 ～ 24000' -> (-24000, 24000), anything else -> None
+    """
+    match = re.match(r'^\s*(-?\d+)\s*～\s*(-?\d+)\s*$', str(text or ''))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def fallback_name(description):
+    """
+    'Alarm Buffer 0 (Alarm Code Record 0)' -> 'ALARM_BUFFER_0'
+    """
+    return re.sub(r'[^A-Z0-9]+', '_', description.split('(')[0].upper()).strip('_')
+
+
+def read_rows(filename):
+    """
+    Yields one dictionary per register row, keyed by the column headers of its sheet.
+    The mnemonic column is titled 'SCL Command' on some sheets and left untitled on others.
+    """
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    for sheet in workbook.worksheets:
+        rows = sheet.iter_rows(values_only=True)
+        headers = [(header or '').strip() for header in next(rows)]
+        for values in rows:
+            row = dict(zip(headers, values))
+            if row.get('Register'):
+                row['Mnemonic'] = row.get('SCL Command') or row.get('') or ''
+                yield row
+
+
+def build_registers(filename):
+    registers = []
+    names = set()
+    for row in read_rows(filename):
+        description = ' '.join(str(row.get('Description') or '').split())
+        if not description or description.lower() in SKIPPED_DESCRIPTIONS:
+            continue
+        address, width = parse_address(row['Register'])
+        if str(row.get('Data Type', '')).upper() == 'LONG':
+            width = 2
+        scale, units = parse_units(row.get('Units'))
+        limits = parse_range(row.get('Range'))
+
+        # Mnemonic from its own column, or trailing "(XX)" in the description
+        name = str(row['Mnemonic']).strip()
+        match = re.search(r'\(([A-Z][A-Z0-9]*)\)$', description)
+        if match:
+            description = description[:match.start()].strip()
+            name = name or match.group(1)
+        name = name or fallback_name(description)
+        if name in names:
+            name = '{}_{}'.format(name, address)
+        names.add(name)
+
+        # Codes and bit fields are unsigned, physical values are signed
+        signed = units != '' or scale != 1.0
+        if limits is not None:
+            signed = limits[0] < 0 or (signed and limits[1] < 2 ** (16 * width - 1))
+        access = 'RW' if str(row.get('Access', '')).strip() == 'R/W' else 'R'
+        registers.append((name, address, width, signed, scale, units, access, description))
+    return sorted(registers, key=lambda register: register[1])
+
+
+def generate(source=SPREADSHEET, output=OUTPUT):
+    registers = build_registers(source)
+    with open(output, 'w', encoding='utf-8') as file:
+        file.write(HEADER.format(source=source))
+        for register in registers:
+            file.write('    Register({!r}, {}, {}, {}, {!r}, {!r}, {!r}, {!r}),\n'.format(*register))
+        file.write(FOOTER)
+    return len(registers)
+
+
+if __name__ == '__main__':
+    count = generate(*sys.argv[1:3])
+    print('Wrote {} registers'.format(count))
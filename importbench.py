@@ -0,0 +1,78 @@
+"""
+Cold start benchmark: imports each module in a fresh interpreter and reports its import time.
+Core modules must load without pymodbus; the exit status is 1 if one of them pulls it in. Example:
+    python importbench.py --repeat 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules a short-lived process such as a health check typically needs, they must not load pymodbus
+CORE_MODULES = ('register_table', 'ampcodec', 'conversions', 'snapshot', 'ampmotor', 'connectionpool',
+                'pipelinedtcp', 'retrypolicy', 'instrumentation')
+# Modules that are built on pymodbus or asyncio
+TRANSPORT_MODULES = ('asyncampmotor', 'simdrive')
+# Heavy dependencies reported for every module
+HEAVY_PACKAGES = ('pymodbus', 'asyncio', 'logging', 'concurrent.futures', 'json')
+
+_PROBE = '''
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+loaded = [name for name in {heavy!r} if name in sys.modules]
+import json
+print(json.dumps([elapsed, loaded]))
+'''
+
+
+def _environment():
+    # Bytecode is cached by the warm-up run, like it is for an installed package
+    environment = dict(os.environ)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    return environment
+
+
+def measure(module, repeat=10) -> dict:
+    """
+    :param module: Name of the module to import.
+    :param repeat: Fresh interpreters to time the import in.
+    :return: A dictionary with the median and fastest import time in ms, and the heavy packages it loaded
+    """
+    environment = _environment()
+    command = [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_PACKAGES)]
+    here = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run(command, cwd=here, env=environment, check=True, stdout=subprocess.DEVNULL)  # Warm-up
+    times, loaded = [], []
+    for _ in range(repeat):
+        output = subprocess.run(command, cwd=here, env=environment, check=True, capture_output=True, text=True)
+        elapsed, loaded = json.loads(output.stdout)
+        times.append(elapsed * 1000)
+    times.sort()
+    return {'module': module, 'median_ms': times[len(times) // 2], 'min_ms': times[0], 'loads': loaded}
+
+
+def run(modules=CORE_MODULES + TRANSPORT_MODULES, repeat=10) -> list:
+    return [measure(module, repeat) for module in modules]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', help='Modules to measure, the core and transport modules when empty')
+    parser.add_argument('--repeat', type=int, default=10, help='Fresh interpreters per module')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.modules or CORE_MODULES + TRANSPORT_MODULES, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print('{:<18}{:>12}{:>10}  {}'.format('module', 'median ms', 'min ms', 'loads'))
+        for result in results:
+            print('{module:<18}{median_ms:>12.2f}{min_ms:>10.2f}  {}'.format(', '.join(result['loads']), **result))
+    heavy_core = [result['module'] for result in results if result['module'] in CORE_MODULES and 'pymodbus' in result['loads']]
+    if heavy_core:
+        print('Core modules importing pymodbus: {}'.format(', '.join(heavy_core)), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,304 @@
+import os
+import threading
+import time
+from register_table import REGISTERS_BY_ADDRESS
+
+_SUB_BUCKET_BITS = 5  # 32 sub-buckets per power of two, about 3% relative precision
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_BUCKET_COUNT = 40 * _SUB_BUCKETS  # Values up to 2**40 microseconds
+
+FUNCTION_NAMES = {3: 'read_holding_registers', 6: 'write_register', 16: 'write_registers'}
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class LatencyHistogram(object):
+    """
+    HDR-style histogram: log-linear buckets with a fixed relative precision, constant time
+    recording and no allocation after construction. Values are in microseconds.
+    """
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < _SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+        return min((shift + 1) * _SUB_BUCKETS + (value >> shift) - _SUB_BUCKETS, _BUCKET_COUNT - 1)
+
+    @staticmethod
+    def _value(index):
+        # Lowest value of a bucket
+        if index < _SUB_BUCKETS:
+            return index
+        shift = index // _SUB_BUCKETS - 1
+        return (index % _SUB_BUCKETS + _SUB_BUCKETS) << shift
+
+    def record(self, value):
+        """
+        :param value: A latency in whole microseconds.
+        """
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction) -> int:
+        """
+        :param fraction: 0.5 for the median, 0.99 for p99.
+        :return: The latency in microseconds below which the fraction of values fall
+        """
+        if not self.count:
+            return 0
+        rank, seen = fraction * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def as_dict(self):
+        summary = {'count': self.count, 'min_us': self.min or 0, 'max_us': self.max,
+                   'mean_us': self.total / self.count if self.count else 0.0}
+        for fraction in QUANTILES:
+            summary['p{:g}_us'.format(fraction * 100)] = self.percentile(fraction)
+        return summary
+
+
+class _Counter(object):
+    __slots__ = ('requests', 'errors', 'retries', 'bytes', 'latency', 'last_wall_time')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency = LatencyHistogram()
+        self.last_wall_time = None
+
+    def as_dict(self):
+        return {'requests': self.requests, 'errors': self.errors, 'retries': self.retries, 'bytes': self.bytes,
+                'last_wall_time': self.last_wall_time, 'latency': self.latency.as_dict()}
+
+
+def pdu_bytes(function_code, count):
+    # Request plus response PDU bytes, without the MBAP header or RTU address and CRC
+    if function_code == 3:
+        return 5 + 2 + 2 * count
+    if function_code == 16:
+        return 6 + 2 * count + 5
+    return 5 + 5
+
+
+class AMP_Instrumentation(object):
+
+    def __init__(self):
+        """
+        Counters and latency histograms of every Modbus call made by instrumented motors,
+        for each axis and for each (axis, function code, register).
+        """
+        self.axes = {}
+        self.registers = {}
+        self._lock = threading.Lock()
+
+    def record(self, axis, slave, function_code, register, count, latency_ns, error=False, retries=0):
+        """
+        Records one Modbus transaction.
+        :param axis: Identifier of the motor.
+        :param slave: Modbus slave of the motor.
+        :param function_code: 3, 6 or 16.
+        :param register: First register of the request, as numbered in MDXT_modbus_registers.
+        :param count: Number of registers read or written.
+        :param latency_ns: Monotonic time the call took, in nanoseconds.
+        :param error: True if the call raised or returned an error response.
+        :param retries: Number of times the request was retried.
+        """
+        latency_us = latency_ns // 1000
+        wall_time = time.time()
+        nbytes = pdu_bytes(function_code, count)
+        with self._lock:
+            key = (axis, slave, function_code, register)
+            axis_counter = self.axes.get(axis)
+            if axis_counter is None:
+                axis_counter = self.axes[axis] = _Counter()
+            register_counter = self.registers.get(key)
+            if register_counter is None:
+                register_counter = self.registers[key] = _Counter()
+            for counter in (axis_counter, register_counter):
+                counter.requests += 1
+                counter.errors += error
+                counter.retries += retries
+                counter.bytes += nbytes
+                counter.latency.record(latency_us)
+                counter.last_wall_time = wall_time
+
+    def stats(self) -> dict:
+        """
+        :return: A dictionary with one entry per axis and one per (axis, function, register)
+        """
+        with self._lock:
+            return {
+                'axes': {axis: counter.as_dict() for axis, counter in self.axes.items()},
+                'registers': [dict(counter.as_dict(), axis=axis, slave=slave, function=FUNCTION_NAMES.get(fc, fc),
+                                   register=register) for (axis, slave, fc, register), counter in self.registers.items()],
+            }
+
+    def reset(self):
+        with self._lock:
+            self.axes.clear()
+            self.registers.clear()
+
+    def prometheus(self) -> str:
+        """
+        :return: Every counter and latency summary in the Prometheus text exposition format
+        """
+        metrics = (
+            ('amp_modbus_requests_total', 'counter', 'Modbus requests sent', 'requests'),
+            ('amp_modbus_errors_total', 'counter', 'Modbus requests that failed', 'errors'),
+            ('amp_modbus_retries_total', 'counter', 'Modbus requests retried', 'retries'),
+            ('amp_modbus_bytes_total', 'counter', 'Modbus PDU bytes sent and received', 'bytes'),
+        )
+        with self._lock:
+            rows = []
+            for (axis, slave, fc, register), counter in sorted(self.registers.items(), key=lambda item: str(item[0])):
+                entry = REGISTERS_BY_ADDRESS.get(register)
+                labels = 'axis="{}",slave="{}",function="{}",register="{}"'.format(
+                    axis, slave, FUNCTION_NAMES.get(fc, fc), entry.name if entry is not None else register)
+                rows.append((labels, counter))
+
+            lines = []
+            for name, kind, description, attribute in metrics:
+                lines.append('# HELP {} {}'.format(name, description))
+                lines.append('# TYPE {} {}'.format(name, kind))
+                for labels, counter in rows:
+                    lines.append('{}{{{}}} {}'.format(name, labels, getattr(counter, attribute)))
+            lines.append('# HELP amp_modbus_latency_seconds Modbus request latency')
+            lines.append('# TYPE amp_modbus_latency_seconds summary')
+            for labels, counter in rows:
+                histogram = counter.latency
+                for fraction in QUANTILES:
+                    lines.append('amp_modbus_latency_seconds{{{},quantile="{:g}"}} {:.6f}'.format(
+                        labels, fraction, histogram.percentile(fraction) / 1e6))
+                lines.append('amp_modbus_latency_seconds_sum{{{}}} {:.6f}'.format(labels, histogram.total / 1e6))
+                lines.append('amp_modbus_latency_seconds_count{{{}}} {}'.format(labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedClient(object):
+
+    def __init__(self, client, instrumentation, axis, slave):
+        """
+        Wraps a modbus client and records every call into an AMP_Instrumentation.
+        Attributes other than the Modbus calls are passed through to the wrapped client.
+        """
+        self.client = client
+        self.instrumentation = instrumentation
+        self.axis = axis
+        self.slave = slave
+        if hasattr(client, 'submit_read_holding_registers'):
+            self.submit_read_holding_registers = self._submit_read_holding_registers
+        if hasattr(client, 'submit_write_registers'):
+            self.submit_write_registers = self._submit_write_registers
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _call(self, function_code, register, size, method, *args, **kwargs):
+        started = time.perf_counter_ns()
+        try:
+            response = method(*args, **kwargs)
+        except Exception:
+            self.instrumentation.record(self.axis, self.slave, function_code, register, size,
+                                        time.perf_counter_ns() - started, error=True)
+            raise
+        # A retrypolicy.AMP_RetryingClient below reports how many retries the call took
+        self.instrumentation.record(self.axis, self.slave, function_code, register, size,
+                                    time.perf_counter_ns() - started, error=response is not None and response.isError(),
+                                    retries=getattr(self.client, 'last_retries', 0))
+        return response
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        return self._call(3, address + 1, count, self.client.read_holding_registers, address, count=count, slave=slave)
+
+    def write_register(self, address, value, slave=1):
+        return self._call(6, address + 1, 1, self.client.write_register, address, value, slave=slave)
+
+    def write_registers(self, address, values, slave=1, no_response_expected=False):
+        return self._call(16, address + 1, len(values), self.client.write_registers, address, values, slave=slave,
+                          no_response_expected=no_response_expected)
+
+    def _submit_read_holding_registers(self, address, count=1, slave=1):
+        return self._submit(3, address + 1, count, self.client.submit_read_holding_registers, address, count=count,
+                            slave=slave)
+
+    def _submit_write_registers(self, address, values, slave=1, no_response_expected=False):
+        return self._submit(16, address + 1, len(values), self.client.submit_write_registers, address, values,
+                            slave=slave, no_response_expected=no_response_expected)
+
+    def _submit(self, function_code, register, size, submit, *args, **kwargs):
+        started = time.perf_counter_ns()
+        future = submit(*args, **kwargs)
+
+        def done(future):
+            exception = future.exception()
+            error = exception is not None or (future.result() is not None and future.result().isError())
+            self.instrumentation.record(self.axis, self.slave, function_code, register, size,
+                                        time.perf_counter_ns() - started, error=error,
+                                        retries=getattr(future, 'retries', 0))
+        future.add_done_callback(done)
+        return future
+
+
+class AMP_PrometheusExporter(object):
+
+    def __init__(self, instrumentation, path, interval=10.0):
+        """
+        Periodically writes AMP_Instrumentation.prometheus() to a file, e.g. for the node_exporter
+        textfile collector. The file is replaced atomically so readers never see a partial write.
+        :param instrumentation: The AMP_Instrumentation to export.
+        :param path: File to write, usually ending in .prom.
+        :param interval: Seconds between two writes.
+        """
+        self.instrumentation = instrumentation
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def export(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(self.instrumentation.prometheus())
+        os.replace(temporary, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.export()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,86 @@
+"""
+Memory and decode cost of buffered telemetry samples, no hardware needed.
+Compares a list of MotorSnapshot objects with a samplebatch.SampleBatch holding the same block reads,
+and exits with status 1 if a batch sample takes more than samplebatch.SAMPLE_BUDGET_BYTES. Example:
+    python membench.py --samples 100000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from samplebatch import SAMPLE_BUDGET_BYTES, SampleBatch
+from snapshot import DEFAULT_MAX_GAP, TELEMETRY_FIELDS, decode_blocks, plan_block_reads
+
+
+def _responses(blocks, count):
+    # Register lists like the ones a client returns, generated up front so they are not measured
+    return [[[random.randrange(0x10000) for _ in range(size)] for _, size, _ in blocks] for _ in range(count)]
+
+
+def _buffer_snapshots(blocks, responses):
+    return [decode_blocks(blocks, block_responses, time.time()) for block_responses in responses]
+
+
+def _buffer_batch(fields, responses, max_gap):
+    batch = SampleBatch(fields, len(responses), max_gap)
+    for t_ns, block_responses in enumerate(responses):
+        batch.append(t_ns, block_responses)
+    return batch
+
+
+def _traced(function, *args):
+    # Bytes still allocated once function returned, the timing is taken in a separate untraced run
+    tracemalloc.start()
+    result = function(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    started = time.perf_counter()
+    result = function(*args)
+    return size, time.perf_counter() - started, result
+
+
+def measure_snapshots(fields, responses, max_gap) -> dict:
+    size, elapsed, _ = _traced(_buffer_snapshots, plan_block_reads(fields, max_gap=max_gap), responses)
+    return {'case': 'MotorSnapshot list', 'bytes_per_sample': size / len(responses),
+            'us_per_sample': elapsed / len(responses) * 1e6}
+
+
+def measure_batch(fields, responses, max_gap) -> dict:
+    size, elapsed, batch = _traced(_buffer_batch, fields, responses, max_gap)
+    started = time.perf_counter()
+    columns = batch.columns()
+    decoded = time.perf_counter() - started
+    column_bytes = sum(column.itemsize * len(column) for column in columns.values())
+    return {'case': 'SampleBatch', 'bytes_per_sample': size / len(responses),
+            'us_per_sample': elapsed / len(responses) * 1e6,
+            'decode_us_per_sample': decoded / len(responses) * 1e6,
+            'column_bytes_per_sample': column_bytes / len(responses)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=50000, help='Samples buffered per case')
+    parser.add_argument('--fields', nargs='*', default=list(TELEMETRY_FIELDS), help='Telemetry fields of each sample')
+    parser.add_argument('--max-gap', type=int, default=DEFAULT_MAX_GAP, help='Unused registers read through per block')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    responses = _responses(plan_block_reads(args.fields, max_gap=args.max_gap), args.samples)
+    results = [measure_snapshots(args.fields, responses, args.max_gap),
+               measure_batch(args.fields, responses, args.max_gap)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print('{:<20}{:>10.1f} bytes/sample{:>8.2f} us/sample'.format(
+                result['case'], result['bytes_per_sample'], result['us_per_sample']))
+        batch = results[-1]
+        print('{:<20}{:>10.1f} bytes/sample{:>8.2f} us/sample to decode all columns'.format(
+            'decoded columns', batch['column_bytes_per_sample'], batch['decode_us_per_sample']))
+    if results[-1]['bytes_per_sample'] > SAMPLE_BUDGET_BYTES:
+        print('SampleBatch uses {:.1f} bytes per sample, the budget is {}'.format(
+            results[-1]['bytes_per_sample'], SAMPLE_BUDGET_BYTES), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,378 @@
+import heapq
+import multiprocessing
+import struct
+import threading
+import time
+from ampcodec import DEFAULT_CODEC
+from snapshot import DEFAULT_MAX_GAP, TELEMETRY_FIELDS, MotorSnapshot, plan_block_reads
+
+_HEADER = struct.Struct('<QQQ')  # Samples written, capacity, failed reads
+
+
+class SampleRing(object):
+    """
+    A single producer, single consumer ring of telemetry samples in a multiprocessing.shared_memory block.
+    Each record holds a time.monotonic_ns timestamp, the motor's index on its bus, a valid flag and one
+    64 bit value per field. The writer fills a record and then publishes it by advancing the head, the
+    reader keeps its own tail. A reader that falls more than capacity samples behind loses the oldest ones.
+    """
+
+    def __init__(self, fields, capacity=65536, name=None):
+        """
+        :param fields: Field names from snapshot.TELEMETRY_FIELDS stored in each record.
+        :param capacity: Records held by the ring.
+        :param name: Name of an existing ring to attach to, a new one is created when None.
+        """
+        from multiprocessing import shared_memory
+        self.fields = tuple(fields)
+        self._record = struct.Struct('<qHB{}q'.format(len(self.fields)))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER.size + capacity * self._record.size)
+            _HEADER.pack_into(self.shm.buf, 0, 0, capacity, 0)
+        else:
+            # Workers share the supervisor's resource tracker, the block is unlinked once by its creator
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.capacity = _HEADER.unpack_from(self.shm.buf, 0)[1]
+        self.tail = 0
+        self.lost = 0
+        self._blank = (0,) * len(self.fields)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def head(self):
+        return _HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    @property
+    def errors(self):
+        return _HEADER.unpack_from(self.shm.buf, 0)[2]
+
+    def write(self, t_ns, motor, values):
+        """
+        :param t_ns: time.monotonic_ns of the read.
+        :param motor: Index of the motor on its bus.
+        :param values: Field values in the order of fields, or None for a failed read.
+        """
+        head, capacity, errors = _HEADER.unpack_from(self.shm.buf, 0)
+        offset = _HEADER.size + (head % capacity) * self._record.size
+        if values is None:
+            self._record.pack_into(self.shm.buf, offset, t_ns, motor, 0, *self._blank)
+            errors += 1
+        else:
+            self._record.pack_into(self.shm.buf, offset, t_ns, motor, 1, *values)
+        _HEADER.pack_into(self.shm.buf, 0, head + 1, capacity, errors)
+
+    def read(self) -> list:
+        """
+        :return: The records written since the last read, as (t_ns, motor, valid, values) tuples, oldest first
+        """
+        head = self.head
+        start = max(self.tail, head - self.capacity)
+        records = [self._record.unpack_from(self.shm.buf, _HEADER.size + (index % self.capacity) * self._record.size)
+                   for index in range(start, head)]
+        # Records the writer may have overwritten while they were being copied are dropped
+        overwritten = max(0, self.head - self.capacity - start)
+        self.lost += start - self.tail + overwritten
+        self.tail = head
+        return [(record[0], record[1], record[2], record[3:]) for record in records[overwritten:]]
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _worker_client(endpoint, timeout):
+    from connectionpool import AMP_ConnectionPool
+    pool = AMP_ConnectionPool(timeout=timeout)
+    if endpoint[0] == 'tcp':
+        return pool, pool.tcp(*endpoint[1:])
+    return pool, pool.serial(*endpoint[1:])
+
+
+def _bus_worker(endpoint, motors, fields, rate_hz, timeout, codec, max_gap, ring_name, connection):
+    # Runs in the bus's own process: owns the client and the motors, samples into the ring
+    # and answers commands from the supervisor between two reads
+    from ampmotor import AMP_Motor
+    from retrypolicy import bus_errors
+    ring = SampleRing(fields, name=ring_name)
+    pool, client = _worker_client(endpoint, timeout)
+    axes = [AMP_Motor(identifier=identifier, slave=slave, client=client, codec=codec) for identifier, slave in motors]
+    by_identifier = {axis.identifier: axis for axis in axes}
+    period = None if rate_hz is None else 1.0 / rate_hz
+    next_due = time.monotonic()
+
+    def serve(wait):
+        # Answers queued commands, returns False once the supervisor asked the worker to stop
+        while connection.poll(wait):
+            wait = 0
+            command = connection.recv()
+            if command is None:
+                return False
+            sequence, identifier, method, args, kwargs = command
+            try:
+                reply = (sequence, True, getattr(by_identifier[identifier], method)(*args, **kwargs))
+            except Exception as e:
+                reply = (sequence, False, e)
+            try:
+                connection.send(reply)
+            except Exception as e:  # An unpicklable result or exception
+                connection.send((sequence, False, RuntimeError('{}: {!r}'.format(method, e))))
+        return True
+
+    try:
+        connection.send(True)  # Ready
+        while True:
+            if not fields:
+                if not serve(None):
+                    return
+                continue
+            for index, axis in enumerate(axes):
+                if not serve(0):
+                    return
+                t_ns = time.monotonic_ns()
+                try:
+                    snapshot = axis.read_snapshot(fields, max_gap=max_gap)
+                except bus_errors():
+                    ring.write(t_ns, index, None)
+                else:
+                    ring.write(t_ns, index, [getattr(snapshot, name) for name in fields])
+            if period is not None:
+                next_due += period
+                delay = next_due - time.monotonic()
+                if delay < 0:
+                    next_due = time.monotonic()
+                elif not serve(delay):
+                    return
+    finally:
+        pool.close()
+        ring.close()
+
+
+class _Bus(object):
+
+    def __init__(self, endpoint, motors, fields, rate_hz, timeout, codec, capacity, max_gap):
+        self.endpoint = endpoint
+        self.motors = [(identifier, slave) for identifier, slave in motors]
+        self.fields = tuple(fields)
+        self.rate_hz = rate_hz
+        self.timeout = timeout
+        self.codec = codec
+        self.capacity = capacity
+        self.max_gap = max_gap
+        self.ring = None
+        self.process = None
+        self.connection = None
+        self.lock = threading.Lock()  # One command in flight per bus
+        self.sequence = 0  # Number of the last command sent, echoed back by the worker with its reply
+
+    def start(self, context):
+        self.ring = SampleRing(self.fields, self.capacity)
+        self.connection, child = context.Pipe()
+        process = context.Process(
+            target=_bus_worker, name='AMP bus {}'.format(self.endpoint[1]), daemon=True,
+            args=(self.endpoint, self.motors, self.fields, self.rate_hz, self.timeout, self.codec, self.max_gap,
+                  self.ring.name, child))
+        process.start()
+        self.process = process
+        child.close()
+
+    def stop(self, timeout):
+        if self.process is not None:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.connection.close()
+            self.process = None
+
+
+class _MotorProxy(object):
+    """
+    Stands in for an AMP_Motor living in a bus worker, every method call is run there.
+    """
+
+    def __init__(self, supervisor, identifier):
+        self._supervisor = supervisor
+        self.identifier = identifier
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self._supervisor.call(self.identifier, method, *args, **kwargs)
+
+    def __repr__(self):
+        return '_MotorProxy({})'.format(self.identifier)
+
+
+class AMP_BusSupervisor(object):
+
+    def __init__(self, start_method=None, command_timeout=5.0):
+        """
+        Runs every bus in its own worker process, so framing and decoding on one bus never waits for the
+        GIL held by another. Each worker owns its client and its AMP_Motor objects and writes its samples
+        to a SampleRing in shared memory. The supervisor merges the rings into one time ordered stream,
+        every sample is stamped with time.monotonic_ns, which is the same clock in every process.
+        Commands are forwarded to the worker owning the motor.
+        :param start_method: multiprocessing start method, e.g. 'spawn'. The platform default when None.
+        :param command_timeout: Seconds call() waits for a worker to answer.
+        """
+        self.context = multiprocessing.get_context(start_method)
+        self.command_timeout = command_timeout
+        self.buses = []
+        self.owners = {}  # identifier: _Bus
+        self.latest = {}  # identifier: the most recent valid MotorSnapshot
+        self._clock_offset = 0.0
+        self._started = False
+
+    def _add_bus(self, endpoint, motors, fields, rate_hz, timeout, codec, capacity, max_gap):
+        assert not self._started, "add buses before start()"
+        fields = tuple(TELEMETRY_FIELDS if fields is None else fields)
+        plan_block_reads(fields)  # Validates the field names
+        bus = _Bus(endpoint, motors, fields, rate_hz, timeout, codec, capacity, max_gap)
+        for identifier, _ in bus.motors:
+            assert identifier not in self.owners, "motor identifiers must be unique"
+            self.owners[identifier] = bus
+        self.buses.append(bus)
+        return bus
+
+    def add_serial_bus(self, port, motors, baudrate=9600, parity='N', stopbits=1, fields=None, rate_hz=None,
+                       timeout=1, codec=DEFAULT_CODEC, capacity=65536, max_gap=DEFAULT_MAX_GAP):
+        """
+        Adds a Modbus RTU bus served by its own worker process.
+        :param port: Serial port name, e.g. 'COM8' or '/dev/ttyUSB0', or a pyserial URL.
+        :param motors: List of (identifier, slave) tuples of the drives on the bus.
+        :param fields: Field names from snapshot.TELEMETRY_FIELDS sampled from every motor. Every field when None,
+        an empty tuple only serves commands.
+        :param rate_hz: Sampling rate of the bus. None samples as fast as the bus allows.
+        :param timeout: Response timeout in seconds of the worker's client.
+        :param codec: The ampcodec.RegisterCodec matching the drives' byte and word order.
+        :param capacity: Samples the bus's ring holds until read() is called.
+        :param max_gap: Passed on to AMP_Motor.read_snapshot when merging fields into block reads.
+        """
+        self._add_bus(('serial', port, baudrate, parity, stopbits), motors, fields, rate_hz, timeout, codec,
+                      capacity, max_gap)
+
+    def add_tcp_bus(self, host, motors, port=502, fields=None, rate_hz=None, timeout=1, codec=DEFAULT_CODEC,
+                    capacity=65536, max_gap=DEFAULT_MAX_GAP):
+        """
+        Adds a Modbus TCP drive or gateway served by its own worker process, see add_serial_bus.
+        """
+        self._add_bus(('tcp', host, port), motors, fields, rate_hz, timeout, codec, capacity, max_gap)
+
+    def start(self):
+        """
+        Starts the worker processes and waits until each one has opened its bus.
+        """
+        self._clock_offset = time.time() - time.monotonic()
+        self._started = True
+        try:
+            for bus in self.buses:
+                bus.start(self.context)
+            for bus in self.buses:
+                if not bus.connection.poll(self.command_timeout + 10):
+                    raise TimeoutError('Worker of {} did not start'.format(bus.endpoint))
+                bus.connection.recv()
+        except BaseException:
+            self.stop()
+            raise
+
+    def stop(self, timeout=5.0):
+        """
+        Stops the workers and releases the rings. Samples not read yet are lost.
+        """
+        for bus in self.buses:
+            bus.stop(timeout)
+        for bus in self.buses:
+            if bus.ring is not None:
+                bus.ring.close()
+                bus.ring.unlink()
+                bus.ring = None
+        self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def read(self) -> list:
+        """
+        Collects the samples written by every worker since the last call and updates latest.
+        :return: A list of (identifier, MotorSnapshot) tuples from every bus, merged in time order.
+        The snapshot timestamps are time.time() values. Failed reads are left out and counted in stats().
+        """
+        streams = []
+        for bus in self.buses:
+            identifiers = [identifier for identifier, _ in bus.motors]
+            streams.append([(t_ns, identifiers[motor], bus.fields, values)
+                            for t_ns, motor, valid, values in bus.ring.read() if valid])
+        samples = []
+        for t_ns, identifier, fields, values in heapq.merge(*streams, key=lambda sample: sample[0]):
+            snapshot = MotorSnapshot(t_ns / 1e9 + self._clock_offset, **dict(zip(fields, values)))
+            self.latest[identifier] = snapshot
+            samples.append((identifier, snapshot))
+        return samples
+
+    def call(self, identifier, method, *args, **kwargs):
+        """
+        Runs an AMP_Motor method in the worker owning the motor, e.g. call('X1', 'set_jog_speed', 7200).
+        :return: What the method returned. Exceptions raised by the method are raised again here
+        """
+        bus = self.owners[identifier]
+        with bus.lock:
+            bus.sequence += 1
+            bus.connection.send((bus.sequence, identifier, method, args, kwargs))
+            deadline = time.monotonic() + self.command_timeout
+            while True:
+                # Late replies to commands that timed out earlier are still in the pipe, they are dropped here
+                if not bus.connection.poll(max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError('{} did not answer {} within {}s'.format(
+                        identifier, method, self.command_timeout))
+                sequence, success, result = bus.connection.recv()
+                if sequence == bus.sequence:
+                    break
+        if not success:
+            raise result
+        return result
+
+    def call_all(self, method, *args, **kwargs) -> dict:
+        """
+        Runs the same AMP_Motor method on every motor. The buses are commanded in parallel.
+        :return: A dictionary of identifier to result, or to the exception the call raised
+        """
+        def run(bus):
+            results = {}
+            for identifier, _ in bus.motors:
+                try:
+                    results[identifier] = self.call(identifier, method, *args, **kwargs)
+                except Exception as e:
+                    results[identifier] = e
+            return results
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(self.buses) or 1) as executor:
+            return {identifier: result for results in executor.map(run, self.buses) for identifier, result in results.items()}
+
+    def motor(self, identifier) -> _MotorProxy:
+        """
+        :return: A proxy whose method calls run on the motor in its worker, e.g. supervisor.motor('X1').stop_motor()
+        """
+        assert identifier in self.owners, "unknown motor {}".format(identifier)
+        return _MotorProxy(self, identifier)
+
+    def stats(self) -> dict:
+        """
+        :return: A dictionary of bus endpoint to samples written, failed reads and samples lost to a full ring
+        """
+        return {bus.endpoint: {'samples': bus.ring.head if bus.ring else 0,
+                               'errors': bus.ring.errors if bus.ring else 0,
+                               'lost': bus.ring.lost if bus.ring else 0,
+                               'alive': bus.process is not None and bus.process.is_alive()}
+                for bus in self.buses}
@@ -0,0 +1,59 @@
+import time
+from MDXT_modbus_registers import CM, VE, AC, DE, JA, JL, JS, VM, CC, AM
+
+# Writable parameters shadowed by the cache, name: register
+CACHED_PARAMETERS = {
+    'CM': CM,
+    'CC': CC,
+    'VM': VM,
+    'JA': JA,
+    'JL': JL,
+    'JS': JS,
+    'AC': AC,
+    'DE': DE,
+    'VE': VE,
+    'AM': AM,
+}
+CACHED_REGISTERS = frozenset(CACHED_PARAMETERS.values())
+
+
+class AMP_ParamCache(object):
+
+    def __init__(self, ttl=None):
+        """
+        Shadow copy of a motor's writable parameters, used to skip redundant writes and mode reads.
+        Values are only trusted for ttl seconds after they were last read or written.
+        :param ttl: Seconds a cached value stays valid, None to keep values until invalidated.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+
+    def get(self, register):
+        """
+        :param register: A register from CACHED_PARAMETERS.
+        :return: The cached value, or None if it is unknown or has expired
+        """
+        entry = self._values.get(register)
+        if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def set(self, register, value):
+        """
+        Records a value that was just read from or written to the drive.
+        """
+        if register in CACHED_REGISTERS:
+            self._values[register] = (value, time.monotonic())
+
+    def invalidate(self, register=None):
+        """
+        Forgets one cached register, or every register when None.
+        """
+        if register is None:
+            self._values.clear()
+        else:
+            self._values.pop(register, None)
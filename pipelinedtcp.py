@@ -0,0 +1,239 @@
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+_MBAP = struct.Struct('>HHHB')  # transaction id, protocol id, length, unit id
+_READ_REQUEST = struct.Struct('>BHH')  # function code, address, count
+_WRITE_SINGLE = struct.Struct('>BHH')  # function code, address, value
+_WRITE_MULTIPLE = struct.Struct('>BHHB')  # function code, address, count, byte count
+
+READ_HOLDING_REGISTERS = 0x03
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+
+class RegistersResponse(object):
+    """
+    Successful response. Mirrors the parts of the pymodbus responses used by AMP_Motor.
+    """
+    __slots__ = ('function_code', 'registers')
+
+    def __init__(self, function_code, registers=()):
+        self.function_code = function_code
+        self.registers = list(registers)
+
+    def isError(self):
+        return False
+
+    def __repr__(self):
+        return 'RegistersResponse(function_code={}, registers={})'.format(self.function_code, self.registers)
+
+
+class ExceptionResponse(object):
+    """
+    Modbus exception response returned by the drive or gateway.
+    """
+    __slots__ = ('function_code', 'exception_code', 'registers')
+
+    def __init__(self, function_code, exception_code):
+        self.function_code = function_code
+        self.exception_code = exception_code
+        self.registers = []
+
+    def isError(self):
+        return True
+
+    def __repr__(self):
+        return 'ExceptionResponse(function_code={}, exception_code={})'.format(self.function_code, self.exception_code)
+
+
+class AMP_PipelinedTcpClient(object):
+
+    def __init__(self, host, port=502, window=8, timeout=1.0):
+        """
+        Modbus TCP client that keeps up to `window` transactions in flight on one connection
+        and matches responses to requests by transaction id. Drop-in client for AMP_Motor: the
+        blocking read_holding_registers/write_register/write_registers calls behave like the
+        pymodbus ones, while the submit_* calls return a concurrent.futures.Future immediately.
+        :param host: IP address or host name of the drive or gateway.
+        :param port: Modbus TCP port.
+        :param window: Largest number of outstanding transactions.
+        :param timeout: Seconds to wait for each response.
+        """
+        assert window >= 1, "window must be at least 1"
+        self.host = host
+        self.port = port
+        self.window = window
+        self.timeout = timeout
+        self.response_timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._slots = threading.BoundedSemaphore(window)
+        self._send_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = {}  # transaction id: (future, function code, deadline)
+        self._next_tid = 0
+
+    @property
+    def connected(self):
+        return self._socket is not None
+
+    def connect(self) -> bool:
+        """
+        Opens the connection and starts the response reader.
+        :return: True if the connection is open
+        """
+        if self._socket is not None:
+            return True
+        try:
+            self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError:
+            return False
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Short timeout so the reader can expire transactions while waiting for data
+        self._socket.settimeout(min(self.response_timeout, 0.05))
+        self._reader = threading.Thread(target=self._read_loop, args=(self._socket,), daemon=True)
+        self._reader.start()
+        return True
+
+    def close(self):
+        """
+        Closes the connection. Outstanding transactions fail with ConnectionError.
+        """
+        sock, self._socket = self._socket, None
+        if sock is not None:
+            sock.close()
+        if self._reader is not None and self._reader is not threading.current_thread():
+            self._reader.join()
+        self._fail_pending(ConnectionError('Connection closed'))
+
+    def set_timeout(self, timeout):
+        """
+        Changes the time to wait for the responses of the transactions submitted from now on,
+        see retrypolicy.AMP_RetryPolicy. Waiting for a free slot in the window still uses timeout.
+        """
+        self.response_timeout = timeout
+        sock = self._socket
+        if sock is not None:
+            sock.settimeout(min(timeout, 0.05))
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit(self, slave, pdu, no_response_expected=False) -> Future:
+        if self._socket is None and not self.connect():
+            raise ConnectionError('Unable to connect to {}:{}'.format(self.host, self.port))
+        if no_response_expected:
+            # Broadcasts are not answered, they are sent outside of the window
+            future = Future()
+            with self._send_lock:
+                self._socket.sendall(_MBAP.pack(0, 0, len(pdu) + 1, slave) + pdu)
+            future.set_result(None)
+            return future
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError('No free transaction slot within {}s'.format(self.timeout))
+        future = Future()
+        with self._pending_lock:
+            tid = self._next_tid
+            while tid in self._pending:
+                tid = (tid + 1) & 0xFFFF
+            self._next_tid = (tid + 1) & 0xFFFF
+            self._pending[tid] = (future, pdu[0], time.monotonic() + self.response_timeout)
+        frame = _MBAP.pack(tid, 0, len(pdu) + 1, slave) + pdu
+        try:
+            with self._send_lock:
+                self._socket.sendall(frame)
+        except (OSError, AttributeError) as error:
+            self._complete(tid, exception=ConnectionError(str(error)))
+        return future
+
+    def submit_read_holding_registers(self, address, count=1, slave=1) -> Future:
+        return self._submit(slave, _READ_REQUEST.pack(READ_HOLDING_REGISTERS, address, count))
+
+    def submit_write_register(self, address, value, slave=1) -> Future:
+        return self._submit(slave, _WRITE_SINGLE.pack(WRITE_SINGLE_REGISTER, address, value))
+
+    def submit_write_registers(self, address, values, slave=1, no_response_expected=False) -> Future:
+        values = list(values)
+        pdu = _WRITE_MULTIPLE.pack(WRITE_MULTIPLE_REGISTERS, address, len(values), 2 * len(values))
+        return self._submit(slave, pdu + struct.pack('>{}H'.format(len(values)), *values), no_response_expected)
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        return self.submit_read_holding_registers(address, count, slave).result()
+
+    def write_register(self, address, value, slave=1):
+        return self.submit_write_register(address, value, slave).result()
+
+    def write_registers(self, address, values, slave=1, no_response_expected=False):
+        return self.submit_write_registers(address, values, slave, no_response_expected).result()
+
+    def _complete(self, tid, response=None, exception=None):
+        with self._pending_lock:
+            entry = self._pending.pop(tid, None)
+        if entry is None:
+            return  # Already expired, or an unknown transaction id
+        self._slots.release()
+        if exception is not None:
+            entry[0].set_exception(exception)
+        else:
+            entry[0].set_result(response)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._pending_lock:
+            expired = [tid for tid, (_, _, deadline) in self._pending.items() if deadline < now]
+        for tid in expired:
+            self._complete(tid, exception=TimeoutError('No response to transaction {}'.format(tid)))
+
+    def _fail_pending(self, exception):
+        with self._pending_lock:
+            tids = list(self._pending)
+        for tid in tids:
+            self._complete(tid, exception=exception)
+
+    def _receive(self, sock, size, buffer):
+        while len(buffer) < size:
+            try:
+                chunk = sock.recv(size - len(buffer))
+            except socket.timeout:
+                self._expire()
+                continue
+            if not chunk:
+                raise ConnectionError('Connection closed by peer')
+            buffer += chunk
+        return bytes(buffer)
+
+    def _read_loop(self, sock):
+        try:
+            while self._socket is sock:
+                header = self._receive(sock, _MBAP.size, bytearray())
+                tid, _, length, _ = _MBAP.unpack(header)
+                pdu = self._receive(sock, length - 1, bytearray())
+                try:
+                    response = self._parse(pdu)
+                except (IndexError, struct.error) as error:
+                    self._complete(tid, exception=ConnectionError('Malformed response: {}'.format(error)))
+                else:
+                    self._complete(tid, response=response)
+                if self._pending:
+                    self._expire()  # Responses keep arriving, so the receive timeout may never fire
+        except (OSError, ConnectionError) as error:
+            if self._socket is sock:
+                self._socket = None
+                sock.close()
+            self._fail_pending(ConnectionError(str(error)))
+
+    @staticmethod
+    def _parse(pdu):
+        function_code = pdu[0]
+        if function_code & 0x80:
+            return ExceptionResponse(function_code & 0x7F, pdu[1])
+        if function_code == READ_HOLDING_REGISTERS:
+            return RegistersResponse(function_code, struct.unpack_from('>{}H'.format(pdu[1] // 2), pdu, 2))
+        return RegistersResponse(function_code)
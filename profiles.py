@@ -0,0 +1,115 @@
+import os
+from register_table import REGISTERS_BY_NAME
+
+MAX_WRITE_COUNT = 123  # Most registers a single function 16 request may write
+
+# Registers captured by default, the motion limits and move/jog parameters.
+# DI is left out on purpose, writing it in position mode starts a move.
+PROFILE_REGISTERS = ('CM', 'CC', 'VM', 'AM', 'DC', 'JA', 'JL', 'JS', 'AC', 'DE', 'VE')
+
+
+def validate_profile(values) -> dict:
+    """
+    Checks that every entry names a writable register of the register table and holds an integer.
+    :param values: Dictionary of register name to raw value.
+    :return: The same values as a new dictionary
+    """
+    profile = {}
+    for name, value in values.items():
+        register = REGISTERS_BY_NAME.get(name)
+        if register is None:
+            raise ValueError('Unknown register {}'.format(name))
+        if not register.writable:
+            raise ValueError('Register {} is read only'.format(name))
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError('Register {} needs an integer value, got {!r}'.format(name, value))
+        profile[name] = value
+    return profile
+
+
+def load_profile(path) -> dict:
+    """
+    Reads a drive profile from a .json or .toml file. Register values are kept in a 'registers' table,
+    anything else in the file (drive model, notes) is ignored.
+    :param path: Path of the profile.
+    :return: Dictionary of register name to raw value
+    """
+    import json  # Loaded on first use, like tomllib, to keep importing ampmotor fast
+    if os.path.splitext(path)[1].lower() == '.toml':
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, 'rb') as file:
+            document = tomllib.load(file)
+    else:
+        with open(path) as file:
+            document = json.load(file)
+    return validate_profile(document.get('registers', {}))
+
+
+def save_profile(path, values, **metadata):
+    """
+    Writes a drive profile to a .json or .toml file.
+    :param path: Path of the profile.
+    :param values: Dictionary of register name to raw value, e.g. from AMP_Motor.capture_profile().
+    :param metadata: Extra string or number fields stored next to the registers, e.g. drive='MDXT82'.
+    """
+    import json
+    values = validate_profile(values)
+    ordered = dict(sorted(values.items(), key=lambda item: REGISTERS_BY_NAME[item[0]].address))
+    if os.path.splitext(path)[1].lower() == '.toml':
+        lines = ['{} = {}'.format(key, json.dumps(value)) for key, value in metadata.items()]
+        lines += ['', '[registers]']
+        for name, value in ordered.items():
+            register = REGISTERS_BY_NAME[name]
+            lines.append('{} = {}  # {}'.format(name, value, register.description))
+        with open(path, 'w') as file:
+            file.write('\n'.join(lines).lstrip() + '\n')
+    else:
+        with open(path, 'w') as file:
+            json.dump(dict(metadata, registers=ordered), file, indent=2)
+
+
+def diff_profile(current, desired) -> dict:
+    """
+    :param current: Dictionary of register name to the value held by the drive.
+    :param desired: Dictionary of register name to the value wanted.
+    :return: Dictionary of register name to (current, desired) for every register that differs
+    """
+    return {name: (current.get(name), value) for name, value in desired.items() if current.get(name) != value}
+
+
+def plan_block_writes(changes, values, max_count=MAX_WRITE_COUNT):
+    """
+    Groups changed registers into as few multi-register writes as possible. Two changed registers are
+    written in one frame when they are contiguous, or only separated by registers whose values are known.
+    :param changes: Iterable of register names to write.
+    :param values: Dictionary of register name to the value to write, for the changed registers and
+    any unchanged register that may be written again to bridge a gap.
+    :param max_count: Largest number of registers a single write may span.
+    :return: A list of (register, [names]) writes, in register order
+    """
+    by_address = sorted(values, key=lambda name: REGISTERS_BY_NAME[name].address)
+    changes = set(changes)
+    writes, run = [], []
+
+    def flush():
+        # Unchanged registers at the ends of a run are not worth writing
+        while run and run[-1] not in changes:
+            run.pop()
+        while run and run[0] not in changes:
+            run.pop(0)
+        if run:
+            writes.append((REGISTERS_BY_NAME[run[0]].address, list(run)))
+        del run[:]
+
+    for name in by_address:
+        register = REGISTERS_BY_NAME[name]
+        if run:
+            first, last = REGISTERS_BY_NAME[run[0]], REGISTERS_BY_NAME[run[-1]]
+            if register.address != last.address + last.width or register.address + register.width - first.address > max_count:
+                flush()
+        run.append(name)
+    flush()
+    return writes
@@ -1,6 +1,7 @@
 from pymodbus.client import ModbusSerialClient as ModbusClientRTU
 #from pymodbus.client import ModbusTcpClient as ModbusClientTCP
 from ampmotor import AMP_Motor
+from axisgroup import AMP_AxisGroup
 from AMP_Opcodes import *
 from conversions import AMP_Converter
 import time 
@@ -35,42 +36,30 @@ Input parameters directly affect motor behavior and must be configured correctly
 - Set 'gear_multiplier' to 1 if only evaluating the motor’s motion profile.
 - If a gearbox or coupling ratio is involved and output-side motion is of interest, 
   set 'gear_multiplier' to reflect the actual mechanical ratio.
+All three axes use the same settings, so one converter serves the group.
 """
-AMP_Axis1_Convert = AMP_Converter(steps_per_rev=20000, gear_multiplier=1)
-AMP_Axis2_Convert = AMP_Converter(steps_per_rev=20000, gear_multiplier=1)
-AMP_Axis3_Convert = AMP_Converter(steps_per_rev=20000, gear_multiplier=1)
-
-# Set acceleration, decleration, and jogging speed of axis1
-Jog_acceleration_sent = AMP_Axis1.set_jog_acceleration(AMP_Axis1_Convert.convert_acceleration_to_smunits(100))
-print(f"{AMP_Axis1.identifier} acceleration set to 100 rps/s: {Jog_acceleration_sent}")
-Jog_deceleration_sent = AMP_Axis1.set_jog_deceleration(AMP_Axis1_Convert.convert_acceleration_to_smunits(100))
-print(f"{AMP_Axis1.identifier}  deceleration set to 100rps/s: {Jog_deceleration_sent}")
-Jog_speed_sent = AMP_Axis1.set_jog_speed(AMP_Axis1_Convert.convert_speed_to_VEunits(23*60))  # 23 rps
-print(f"{AMP_Axis1.identifier} jog speed sent?: {Jog_speed_sent}")
-
-
-# Set acceleration, decleration, and jogging speed of axis2
-Jog_acceleration_sent = AMP_Axis2.set_jog_acceleration(AMP_Axis2_Convert.convert_acceleration_to_smunits(100))
-print(f"{AMP_Axis2.identifier} acceleration set to 100 rps/s: {Jog_acceleration_sent}")  
-Jog_deceleration_sent = AMP_Axis2.set_jog_deceleration(AMP_Axis2_Convert.convert_acceleration_to_smunits(100))
-print(f"{AMP_Axis2.identifier}  deceleration set to 100rps/s: {Jog_deceleration_sent}")
-Jog_speed_sent = AMP_Axis2.set_jog_speed(AMP_Axis2_Convert.convert_speed_to_VEunits(23*60))  # 23 rps
-print(f"{AMP_Axis2.identifier} jog speed sent?: {Jog_speed_sent}")
-
-
-# Set acceleration, decleration, and jogging speed of axis3
-Jog_acceleration_sent = AMP_Axis3.set_jog_acceleration(AMP_Axis3_Convert.convert_acceleration_to_smunits(100))
-print(f"{AMP_Axis3.identifier} acceleration set to 100 rps/s: {Jog_acceleration_sent}")
-Jog_deceleration_sent = AMP_Axis3.set_jog_deceleration(AMP_Axis3_Convert.convert_acceleration_to_smunits(100))
-print(f"{AMP_Axis3.identifier}  deceleration set to 100rps/s: {Jog_deceleration_sent}")
-Jog_speed_sent = AMP_Axis3.set_jog_speed(AMP_Axis3_Convert.convert_speed_to_VEunits(23*60))  # 23 rps
-print(f"{AMP_Axis3.identifier} jog speed sent?: {Jog_speed_sent}")
-
-# Enable all motors, then commensing jog
-SCL_cmd_sent1 = AMP_Axis1.SCL_Command(ME)
-SCL_cmd_sent2 = AMP_Axis2.SCL_Command(ME)
-SCL_cmd_sent3 = AMP_Axis3.SCL_Command(ME)
-print(f"SCL command Motor Enable sent: {SCL_cmd_sent1}")
+AMP_Axes_Convert = AMP_Converter(steps_per_rev=20000, gear_multiplier=1)
+
+"""
+The axis group writes identical parameters to every axis, contiguous registers in one frame per axis.
+Pass broadcast=True when the drives execute Modbus broadcasts and are the only drives on the bus,
+every write and command is then a single slave 0 frame for the whole group.
+"""
+AMP_Axes = AMP_AxisGroup([AMP_Axis1, AMP_Axis2, AMP_Axis3])
+
+# Set acceleration, decleration, and jogging speed of every axis, then read them back to verify
+jog_sent = AMP_Axes.write_all({
+    'JA': AMP_Axes_Convert.convert_acceleration_to_smunits(100),  # 100 rps/s
+    'JL': AMP_Axes_Convert.convert_acceleration_to_smunits(100),  # 100 rps/s
+    'JS': AMP_Axes_Convert.convert_speed_to_VEunits(23*60),  # 23 rps
+}, verify=True)
+print(f"Jog acceleration, deceleration and speed set on every axis: {jog_sent['ok']} ({jog_sent['frames']} frames)")
+for identifier, values in jog_sent['mismatches'].items():
+    print(f"{identifier} holds {values}")
+
+# Enable all motors in one burst, then commensing jog
+enable_result = AMP_Axes.start(ME)
+print(f"SCL command Motor Enable sent: {enable_result['ok']}, skew {enable_result['skew']*1000:.1f} ms")
 
 Commence_jog_sent1 = AMP_Axis1.SCL_Command(CJ)
 time.sleep(15)
@@ -116,14 +105,10 @@ with open(log_filename, "w") as file:
 print("Logging complete.")
 
 # Stop Jogging
-motor_stop_sent1 = AMP_Axis1.stop_motor()
-motor_stop_sent2 = AMP_Axis2.stop_motor()
-motor_stop_sent3 = AMP_Axis3.stop_motor()
-print("All motors have stopped moving")
-
-SCL_cmd_sent1 = AMP_Axis1.SCL_Command(MD)
-SCL_cmd_sent2 = AMP_Axis2.SCL_Command(MD)
-SCL_cmd_sent3 = AMP_Axis3.SCL_Command(MD)
-print("All motors have been disabled")
+motor_stop_sent = AMP_Axes.stop()
+print(f"All motors have stopped moving: {motor_stop_sent['ok']}")
+
+SCL_cmd_sent = AMP_Axes.command(MD)
+print(f"All motors have been disabled: {SCL_cmd_sent['ok']}")
 
 modbus_client.close()
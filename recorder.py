@@ -0,0 +1,217 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+from samplebatch import SampleBatch, field_typecode
+from snapshot import DEFAULT_MAX_GAP, TELEMETRY_FIELDS, plan_block_reads
+
+NPY_HEADER_SIZE = 128  # Fixed so the header can be rewritten in place as the column grows
+_ENDIAN = '<' if sys.byteorder == 'little' else '>'
+# array typecode: numpy dtype descr
+_DESCR = {'q': _ENDIAN + 'i8', 'i': _ENDIAN + 'i4', 'h': _ENDIAN + 'i2', 'H': _ENDIAN + 'u2', 'B': '|u1'}
+
+
+class _NpyColumn(object):
+    """
+    A 1-D .npy file that is appended to in chunks. The header is padded to a fixed size
+    and rewritten after every chunk, so the file is always loadable with numpy.load.
+    """
+
+    def __init__(self, filename, typecode):
+        self.filename = filename
+        self.typecode = typecode
+        self.length = 0
+        self.file = open(filename, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(_DESCR[self.typecode], self.length)
+        header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + '\n'
+        self.file.seek(0)
+        self.file.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+
+    def append(self, values, count):
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(memoryview(values)[:count])
+        self.length += count
+        self._write_header()
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class AMP_Recorder(object):
+
+    def __init__(self, path, motors, fields=None, rate_hz=None, chunk_size=4096, max_gap=DEFAULT_MAX_GAP):
+        """
+        Records telemetry from one or more motors in a background thread into a binary columnar capture.
+        Each motor gets a directory of .npy columns: t_ns (time.monotonic_ns), valid (0 for failed reads)
+        and one column per field. Load a capture with load_recording().
+        :param path: Directory the capture is written to. Created if it does not exist.
+        :param motors: List of AMP_Motor objects to record.
+        :param fields: Iterable of field names from snapshot.TELEMETRY_FIELDS. Records every field when None.
+        :param rate_hz: Sampling rate per motor. None samples as fast as the bus allows.
+        :param chunk_size: Samples buffered per motor before a chunk is flushed to disk.
+        :param max_gap: Passed on to samplebatch.SampleBatch when merging fields into block reads.
+        """
+        assert len(set(motor.identifier for motor in motors)) == len(motors), "motor identifiers must be unique"
+        self.path = path
+        self.motors = list(motors)
+        self.fields = tuple(TELEMETRY_FIELDS if fields is None else fields)
+        plan_block_reads(self.fields)  # Validates the field names
+        self.period = None if rate_hz is None else 1.0 / rate_hz
+        self.chunk_size = chunk_size
+        self.max_gap = max_gap
+        self.samples = 0
+        self.errors = 0
+        self.failure = None  # The exception that ended acquisition early, raised again by stop()
+        self._buffers = None
+        self._chunks = queue.Queue()
+        self._stop = threading.Event()
+        self._acquire_thread = None
+        self._write_thread = None
+
+    def start(self):
+        """
+        Creates the capture directory and starts acquisition.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        meta = {
+            'motors': [{'identifier': motor.identifier, 'slave': motor.slave} for motor in self.motors],
+            'fields': list(self.fields),
+            'rate_hz': None if self.period is None else 1.0 / self.period,
+            'wall_time_start': time.time(),
+            'monotonic_ns_start': time.monotonic_ns(),
+        }
+        with open(os.path.join(self.path, 'recording.json'), 'w') as file:
+            json.dump(meta, file, indent=2)
+
+        self._buffers = [self._new_buffer(motor) for motor in self.motors]
+        self._stop.clear()
+        self.failure = None
+        self._write_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._acquire_thread = threading.Thread(target=self._acquire_loop, daemon=True)
+        self._write_thread.start()
+        self._acquire_thread.start()
+
+    def stop(self):
+        """
+        Stops acquisition, flushes the remaining samples and closes the capture. Raises the exception that
+        ended acquisition early, if any, once the samples taken until then are written.
+        """
+        self._stop.set()
+        if self._acquire_thread is not None:
+            self._acquire_thread.join()
+        for index, buffer in enumerate(self._buffers or ()):
+            if buffer.count:
+                self._chunks.put((index, buffer))
+        self._chunks.put(None)
+        if self._write_thread is not None:
+            self._write_thread.join()
+        if self.failure is not None:
+            raise self.failure
+
+    def _new_buffer(self, motor):
+        # Rows hold the raw registers, they are decoded by the writer thread, off the acquisition thread
+        return SampleBatch(self.fields, self.chunk_size, self.max_gap, motor.codec)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _acquire_loop(self):
+        try:
+            self._acquire()
+        except Exception as e:  # Kept for stop(), the thread would otherwise end without a trace
+            self.failure = e
+
+    def _acquire(self):
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            for index, motor in enumerate(self.motors):
+                buffer = self._buffers[index]
+                if motor.read_into(buffer):
+                    self.samples += 1
+                else:
+                    self.errors += 1
+                if buffer.full:
+                    self._chunks.put((index, buffer))
+                    self._buffers[index] = self._new_buffer(motor)
+
+            if self.period is not None:
+                next_due += self.period
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    next_due = time.monotonic()
+
+    def _write_loop(self):
+        writers = []
+        for motor in self.motors:
+            directory = os.path.join(self.path, motor.identifier)
+            os.makedirs(directory, exist_ok=True)
+            columns = [_NpyColumn(os.path.join(directory, 't_ns.npy'), 'q'),
+                       _NpyColumn(os.path.join(directory, 'valid.npy'), 'B')]
+            columns += [_NpyColumn(os.path.join(directory, name + '.npy'), field_typecode(name)) for name in self.fields]
+            writers.append(columns)
+
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            index, buffer = chunk
+            columns = buffer.columns()
+            for column, name in zip(writers[index], ('t_ns', 'valid') + self.fields):
+                column.append(columns[name], buffer.count)
+
+        for columns in writers:
+            for column in columns:
+                column.close()
+
+
+def _read_npy(filename):
+    with open(filename, 'rb') as file:
+        file.seek(8)
+        header_length = int.from_bytes(file.read(2), 'little')
+        header = file.read(header_length).decode('latin1')
+        descr = header.split("'descr': '")[1].split("'")[0]
+        typecode = next(code for code, value in _DESCR.items() if value[1:] == descr[1:])
+        values = array(typecode)
+        values.frombytes(file.read())
+    if descr[0] not in ('|', _ENDIAN):
+        values.byteswap()
+    return values
+
+
+def load_recording(path, use_numpy=True):
+    """
+    Loads a capture written by AMP_Recorder.
+    :param path: The capture directory.
+    :param use_numpy: Memory maps the columns as NumPy arrays when NumPy is installed, otherwise array.array is used.
+    :return: A dictionary {identifier: {column: values}} plus the capture metadata under 'meta'
+    """
+    with open(os.path.join(path, 'recording.json')) as file:
+        meta = json.load(file)
+
+    loader = _read_npy
+    if use_numpy:
+        try:
+            import numpy
+            loader = lambda filename: numpy.load(filename, mmap_mode='r')
+        except ImportError:
+            pass
+
+    recording = {'meta': meta}
+    for motor in meta['motors']:
+        directory = os.path.join(path, motor['identifier'])
+        columns = ['t_ns', 'valid'] + meta['fields']
+        recording[motor['identifier']] = {name: loader(os.path.join(directory, name + '.npy')) for name in columns}
+    return recording
@@ -0,0 +1,321 @@
+# Generated by generate_register_table.py from MDX+ MODBUS REGISTERS.xlsx. Do not edit by hand,
+# edit the spreadsheet (or the generator) and regenerate instead.
+
+
+class Register(object):
+    """
+    A holding register of an AMP drive.
+    address: 1-based register number (40001 is address 1), width: 1 or 2 registers,
+    scale: multiply the raw value by scale to get units, access: 'R' or 'RW'.
+    """
+    __slots__ = ('name', 'address', 'width', 'signed', 'scale', 'units', 'access', 'description')
+
+    def __init__(self, name, address, width, signed, scale, units, access, description):
+        self.name = name
+        self.address = address
+        self.width = width
+        self.signed = signed
+        self.scale = scale
+        self.units = units
+        self.access = access
+        self.description = description
+
+    @property
+    def writable(self):
+        return self.access == 'RW'
+
+    def __repr__(self):
+        return 'Register({!r}, address={}, width={})'.format(self.name, self.address, self.width)
+
+
+REGISTERS = (
+    Register('AL', 1, 2, False, 1.0, '', 'R', 'Alarm Code'),
+    Register('SC', 3, 2, False, 1.0, '', 'R', 'Status Code'),
+    Register('IO', 5, 1, False, 1.0, '', 'R', 'Digital Output Status'),
+    Register('IS', 6, 1, False, 1.0, '', 'R', 'Digital Input Status'),
+    Register('IP', 7, 2, True, 1.0, 'pulses', 'R', 'Immediate Absolute Position'),
+    Register('EQ', 9, 2, True, 1.0, 'pulses', 'R', 'Secondary Encoder Position'),
+    Register('EP', 11, 2, True, 1.0, 'pulses', 'R', 'Encoder Position'),
+    Register('ENCODER_MULTI_TURN_DATA', 16, 1, False, 1.0, '', 'R', 'Encoder Multi-turn Data'),
+    Register('IV', 17, 1, True, 0.004166666666666667, 'rps', 'R', 'Immediate Actual Velocity'),
+    Register('IV1', 18, 1, True, 0.004166666666666667, 'rps', 'R', 'Immediate Target Velocity'),
+    Register('IT', 19, 1, True, 0.1, '℃', 'R', 'Immediate Drive Temperature'),
+    Register('IT1', 20, 1, True, 0.1, '℃', 'R', 'Immediate DSP Temperature'),
+    Register('IT2', 21, 1, True, 0.1, '℃', 'R', 'Immediate Encoder Temperature'),
+    Register('IU', 22, 1, True, 0.1, 'V', 'R', 'Immediate DC_Bus Voltage'),
+    Register('IX', 23, 2, True, 1.0, 'pulses', 'R', 'Immediate Position Error'),
+    Register('IA1', 26, 1, True, 1.0, 'mv', 'R', 'Analog Input 1'),
+    Register('IA2', 27, 1, True, 1.0, 'mv', 'R', 'Analog Input 2'),
+    Register('OA1', 28, 1, True, 1.0, 'mv', 'RW', 'Analog Output 1'),
+    Register('OA2', 29, 1, True, 1.0, 'mv', 'RW', 'Analog Output 2'),
+    Register('Q_PROGRAM_LINE_NUMBER', 30, 1, False, 1.0, '', 'R', 'Q Program Line Number'),
+    Register('IC', 31, 1, True, 0.001, '', 'R', 'Immediate Current Command'),
+    Register('IQ', 32, 1, True, 0.001, '', 'R', 'Q Current'),
+    Register('ID', 33, 2, True, 1.0, 'pulses', 'R', 'Relative Distance'),
+    Register('SENSOR_POSITION', 35, 2, True, 1.0, 'pulses', 'R', 'Sensor Position'),
+    Register('CONDITION_CODE', 37, 1, False, 1.0, '', 'R', 'Condition Code'),
+    Register('CONTROL_MODE', 38, 1, False, 1.0, '', 'R', 'Control Mode'),
+    Register('VELOCITY_MOVE_STATE', 39, 1, False, 1.0, '', 'R', 'Velocity Move State'),
+    Register('POINT_TO_POINT_MOVE_STATE', 40, 1, False, 1.0, '', 'R', 'Point-to-Point Move State'),
+    Register('Q_SEGMENT_NUMBER', 41, 1, False, 1.0, '', 'R', 'Q Segment Number'),
+    Register('MODEL_NUMBER', 42, 1, False, 1.0, '', 'R', 'Model Number'),
+    Register('SUB_MODEL', 43, 1, False, 1.0, '', 'R', 'Sub Model'),
+    Register('DSP_FIRMWARE_VERSION', 44, 1, False, 1.0, '', 'R', 'DSP Firmware Version'),
+    Register('FPGA_FIRMWARE_VERSION_NO', 45, 1, False, 1.0, '', 'R', 'FPGA Firmware Version NO'),
+    Register('FPGA_FIRMWARE_VERSION_LA', 46, 1, False, 1.0, '', 'R', 'FPGA Firmware Version LA'),
+    Register('INPUT_COUNTER', 47, 2, True, 1.0, 'pulses', 'RW', 'Input Counter'),
+    Register('PULSE_COUNTER', 49, 2, True, 1.0, 'pulses', 'RW', 'Pulse Counter'),
+    Register('POWER_UP_SECONDS', 52, 2, True, 1.0, 's', 'R', 'Power Up Seconds'),
+    Register('POWER_ON_TIMES', 54, 2, True, 1.0, 'times', 'R', 'Power On Times'),
+    Register('ENCODER_FIRMWARE_VERSION', 56, 1, False, 1.0, '', 'R', 'Encoder Firmware Version'),
+    Register('TORQUE_LIMIT_DYNAMIC_CW', 65, 1, False, 1.0, '', 'RW', 'Torque Limit Dynamic CW'),
+    Register('TORQUE_LIMIT_DYNAMIC_CCW', 66, 1, False, 1.0, '', 'RW', 'Torque Limit Dynamic CCW'),
+    Register('ALARM_CODE', 67, 2, False, 1.0, '', 'R', 'Alarm Code'),
+    Register('ALARM_BUFFER_0', 69, 1, False, 1.0, '', 'R', 'Alarm Buffer 0 (Alarm Code Record 0)'),
+    Register('ALARM_BUFFER_1', 70, 1, False, 1.0, '', 'R', 'Alarm Buffer 1 (Alarm Code Record 1)'),
+    Register('ALARM_BUFFER_2', 71, 1, False, 1.0, '', 'R', 'Alarm Buffer 2 (Alarm Code Record 2)'),
+    Register('ALARM_BUFFER_3', 72, 1, False, 1.0, '', 'R', 'Alarm Buffer 3 (Alarm Code Record 3)'),
+    Register('ALARM_BUFFER_4', 73, 1, False, 1.0, '', 'R', 'Alarm Buffer 4 (Alarm Code Record 4)'),
+    Register('ALARM_BUFFER_5', 74, 1, False, 1.0, '', 'R', 'Alarm Buffer 5 (Alarm Code Record 5)'),
+    Register('ALARM_BUFFER_6', 75, 1, False, 1.0, '', 'R', 'Alarm Buffer 6 (Alarm Code Record 6)'),
+    Register('ALARM_BUFFER_7', 76, 1, False, 1.0, '', 'R', 'Alarm Buffer 7 (Alarm Code Record 7)'),
+    Register('ALARM_BUFFER_8', 77, 2, True, 1.0, 's', 'R', 'Alarm Buffer 8 (Generation Time of Alarm Code Record 0)'),
+    Register('ALARM_BUFFER_9', 79, 2, True, 1.0, 's', 'R', 'Alarm Buffer 9 (Generation Time of Alarm Code Record 1)'),
+    Register('ALARM_BUFFER_10', 81, 2, True, 1.0, 's', 'R', 'Alarm Buffer 10 (Generation Time of Alarm Code Record 2)'),
+    Register('ALARM_BUFFER_11', 83, 2, True, 1.0, 's', 'R', 'Alarm Buffer 11 (Generation Time of Alarm Code Record 3)'),
+    Register('ALARM_BUFFER_12', 85, 2, True, 1.0, 's', 'R', 'Alarm Buffer 12 (Generation Time of Alarm Code Record 4)'),
+    Register('ALARM_BUFFER_13', 87, 2, True, 1.0, 's', 'R', 'Alarm Buffer 13 (Generation Time of Alarm Code Record 5)'),
+    Register('ALARM_BUFFER_14', 89, 2, True, 1.0, 's', 'R', 'Alarm Buffer 14 (Generation Time of Alarm Code Record 6)'),
+    Register('ALARM_BUFFER_15', 91, 2, True, 1.0, 's', 'R', 'Alarm Buffer 15 (Generation Time of Alarm Code Record 7)'),
+    Register('ALARM_BUFFER_16', 93, 2, False, 1.0, '', 'R', 'Alarm Buffer 16'),
+    Register('ALARM_BUFFER_17', 95, 2, False, 1.0, '', 'R', 'Alarm Buffer 17'),
+    Register('ALARM_BUFFER_18', 97, 2, False, 1.0, '', 'R', 'Alarm Buffer 18'),
+    Register('ALARM_BUFFER_19', 99, 2, False, 1.0, '', 'R', 'Alarm Buffer 19'),
+    Register('ALARM_BUFFER_20', 101, 2, False, 1.0, '', 'R', 'Alarm Buffer 20'),
+    Register('ALARM_BUFFER_21', 103, 2, False, 1.0, '', 'R', 'Alarm Buffer 21'),
+    Register('ALARM_BUFFER_22', 105, 2, False, 1.0, '', 'R', 'Alarm Buffer 22'),
+    Register('ALARM_BUFFER_23', 107, 2, False, 1.0, '', 'R', 'Alarm Buffer 23'),
+    Register('ALARM_BUFFER_24', 109, 2, False, 1.0, '', 'R', 'Alarm Buffer 24'),
+    Register('ALARM_BUFFER_25', 111, 2, False, 1.0, '', 'R', 'Alarm Buffer 25'),
+    Register('ALARM_BUFFER_26', 113, 2, False, 1.0, '', 'R', 'Alarm Buffer 26'),
+    Register('ALARM_BUFFER_27', 115, 2, False, 1.0, '', 'R', 'Alarm Buffer 27'),
+    Register('ALARM_BUFFER_28', 117, 2, False, 1.0, '', 'R', 'Alarm Buffer 28'),
+    Register('ALARM_BUFFER_29', 119, 2, False, 1.0, '', 'R', 'Alarm Buffer 29'),
+    Register('ALARM_BUFFER_30', 121, 2, False, 1.0, '', 'R', 'Alarm Buffer 30'),
+    Register('ALARM_BUFFER_31', 123, 2, False, 1.0, '', 'R', 'Alarm Buffer 31'),
+    Register('COMMAND_OPCODE', 125, 1, False, 1.0, '', 'RW', 'Command Opcode'),
+    Register('PARAMETER_1', 126, 1, False, 1.0, '', 'RW', 'Parameter 1'),
+    Register('PARAMETER_2', 127, 1, False, 1.0, '', 'RW', 'Parameter 2'),
+    Register('PARAMETER_3', 128, 1, False, 1.0, '', 'RW', 'Parameter 3'),
+    Register('PARAMETER_4', 129, 1, False, 1.0, '', 'RW', 'Parameter 4'),
+    Register('PARAMETER_5', 130, 1, False, 1.0, '', 'RW', 'Parameter 5'),
+    Register('ACCUMULATOR_0', 131, 2, False, 1.0, '', 'R', 'Accumulator 0'),
+    Register('USER_DEFINED_REGISTER_1', 133, 2, False, 1.0, '', 'RW', 'User Defined Register 1'),
+    Register('USER_DEFINED_REGISTER_2', 135, 2, False, 1.0, '', 'RW', 'User Defined Register 2'),
+    Register('USER_DEFINED_REGISTER_3', 137, 2, False, 1.0, '', 'RW', 'User Defined Register 3'),
+    Register('USER_DEFINED_REGISTER_4', 139, 2, False, 1.0, '', 'RW', 'User Defined Register 4'),
+    Register('USER_DEFINED_REGISTER_5', 141, 2, False, 1.0, '', 'RW', 'User Defined Register 5'),
+    Register('USER_DEFINED_REGISTER_6', 143, 2, False, 1.0, '', 'RW', 'User Defined Register 6'),
+    Register('USER_DEFINED_REGISTER_7', 145, 2, False, 1.0, '', 'RW', 'User Defined Register 7'),
+    Register('USER_DEFINED_REGISTER_8', 147, 2, False, 1.0, '', 'RW', 'User Defined Register 8'),
+    Register('USER_DEFINED_REGISTER_9', 149, 2, False, 1.0, '', 'RW', 'User Defined Register 9'),
+    Register('USER_DEFINED_REGISTER_10', 151, 2, False, 1.0, '', 'RW', 'User Defined Register 10'),
+    Register('USER_DEFINED_REGISTER_11', 153, 2, False, 1.0, '', 'RW', 'User Defined Register 11'),
+    Register('USER_DEFINED_REGISTER_12', 155, 2, False, 1.0, '', 'RW', 'User Defined Register 12'),
+    Register('USER_DEFINED_REGISTER_13', 157, 2, False, 1.0, '', 'RW', 'User Defined Register 13'),
+    Register('USER_DEFINED_REGISTER_14', 159, 2, False, 1.0, '', 'RW', 'User Defined Register 14'),
+    Register('USER_DEFINED_REGISTER_15', 161, 2, False, 1.0, '', 'RW', 'User Defined Register 15'),
+    Register('USER_DEFINED_REGISTER_16', 163, 2, False, 1.0, '', 'RW', 'User Defined Register 16'),
+    Register('USER_DEFINED_REGISTER_17', 165, 2, False, 1.0, '', 'RW', 'User Defined Register 17'),
+    Register('USER_DEFINED_REGISTER_18', 167, 2, False, 1.0, '', 'RW', 'User Defined Register 18'),
+    Register('USER_DEFINED_REGISTER_19', 169, 2, False, 1.0, '', 'RW', 'User Defined Register 19'),
+    Register('USER_DEFINED_REGISTER_20', 171, 2, False, 1.0, '', 'RW', 'User Defined Register 20'),
+    Register('USER_DEFINED_REGISTER_21', 173, 2, False, 1.0, '', 'RW', 'User Defined Register 21'),
+    Register('USER_DEFINED_REGISTER_22', 175, 2, False, 1.0, '', 'RW', 'User Defined Register 22'),
+    Register('UM', 177, 2, False, 1.0, '', 'RW', 'Tuning Mode Selection'),
+    Register('LY', 179, 2, False, 1.0, '', 'RW', 'Load Type'),
+    Register('NR', 181, 2, False, 1.0, '', 'RW', 'Inertia Ratio'),
+    Register('KG', 183, 2, False, 1.0, '', 'RW', '1st Mechanical Stiffness Level'),
+    Register('KX', 185, 2, False, 1.0, '', 'RW', '2nd Mechanical Stiffness Level'),
+    Register('KP', 187, 2, True, 0.1, 'Hz', 'RW', '1st Position Loop Gain'),
+    Register('KI', 189, 2, True, 1.0, 'ms', 'RW', '1st Position Loop Integral Time Constant'),
+    Register('KD', 191, 2, True, 1.0, 'ms', 'RW', '1st Position Loop Derivative Time Constant'),
+    Register('KE', 193, 2, True, 0.1, 'Hz', 'RW', '1st Position Loop Derivative Filter'),
+    Register('KL', 195, 2, True, 0.0001, '', 'RW', 'Velocity Feedforward Gain'),
+    Register('KR', 197, 2, True, 0.1, 'Hz', 'RW', 'Velocity Feedforward Filter'),
+    Register('KF', 199, 2, True, 0.0001, '', 'RW', '1st Velocity Command Gain'),
+    Register('VP', 201, 2, True, 0.1, 'Hz', 'RW', '1st Velocity Loop Gain'),
+    Register('VI', 203, 2, True, 1.0, 'ms', 'RW', '1st Velocity Loop Integral Time Constant'),
+    Register('KK', 205, 2, True, 0.0001, '', 'RW', 'Acceleration Feedforward Gain'),
+    Register('KT', 207, 2, True, 0.1, 'Hz', 'RW', 'Acceleration Feedforward Filter'),
+    Register('KC', 209, 2, True, 0.1, 'Hz', 'RW', '1st Torque Command Filter'),
+    Register('UP', 211, 2, True, 0.1, 'Hz', 'RW', '2nd Position Loop Gain'),
+    Register('UI', 213, 2, True, 1.0, 'ms', 'RW', '2nd Position Loop Integral Time Constant'),
+    Register('UD', 215, 2, True, 1.0, 'ms', 'RW', '2nd Position Loop Derivative Time Constant'),
+    Register('UE', 217, 2, True, 0.1, 'Hz', 'RW', '2nd Position Loop Derivative Filter'),
+    Register('UF', 219, 2, True, 0.0001, '', 'RW', '2nd Velocity Command Gain'),
+    Register('UV', 221, 2, True, 0.1, 'Hz', 'RW', '2nd Velocity Loop Gain'),
+    Register('UG', 223, 2, True, 1.0, 'ms', 'RW', '2nd Velocity Loop Integral Time Constant'),
+    Register('UC', 225, 2, True, 0.1, 'Hz', 'RW', '2nd Torque Command Filter'),
+    Register('XP', 227, 2, True, 0.1, 'Hz', 'RW', 'Full Closed-loop Position Loop Gain'),
+    Register('XI', 229, 2, True, 1.0, 'ms', 'RW', 'Full Closed-loop Position Loop Integral Time Constant'),
+    Register('XD', 231, 2, True, 1.0, 'ms', 'RW', 'Full Closed-loop Position Loop Derivative Time Constant'),
+    Register('XE', 233, 2, True, 0.1, 'Hz', 'RW', 'Full Closed-loop Position Loop Derivative Filter'),
+    Register('XF', 235, 2, True, 0.0001, '', 'RW', 'Full Closed-loop Velocity Command Gain'),
+    Register('XV', 237, 2, True, 0.1, 'Hz', 'RW', 'Full Closed-loop Velocity Loop Gain'),
+    Register('XG', 239, 2, True, 1.0, 'ms', 'RW', 'Full Closed-loop Velocity Loop Integral Time Constant'),
+    Register('XC', 241, 2, True, 0.1, 'Hz', 'RW', 'Full Closed-loop Torque Command Filter'),
+    Register('SD', 243, 2, False, 1.0, '', 'RW', 'Automatic Gain Switching Method'),
+    Register('PN', 245, 2, True, 1.0, 'pulses', 'RW', 'Use Position Error as the Condition'),
+    Register('VN', 247, 2, True, 0.004166666666666667, 'rps', 'RW', 'Use Actual Speed as the Condition'),
+    Register('TN', 249, 2, True, 0.001, '', 'RW', 'Use Actual Torque as the Condition'),
+    Register('SE1', 251, 2, True, 1.0, 'ms', 'RW', 'Gain Switching Waiting Time 1'),
+    Register('SE2', 253, 2, True, 1.0, 'ms', 'RW', 'Gain Switching Waiting Time 2'),
+    Register('LR', 255, 2, False, 1.0, '', 'RW', 'Velocity Feedback Filter'),
+    Register('AE', 257, 2, False, 1.0, '', 'RW', 'Self-adapting Filter Switch'),
+    Register('CM', 263, 2, False, 1.0, '', 'RW', 'Main Control Mode'),
+    Register('CN', 265, 2, False, 1.0, '', 'RW', 'Secondary Control Mode'),
+    Register('PM', 267, 2, False, 1.0, '', 'RW', 'Operation Mode When Power-up'),
+    Register('JM', 269, 2, False, 1.0, '', 'RW', 'Speed Control Clamp Mode'),
+    Register('XM', 271, 2, False, 1.0, '', 'RW', 'Full Closed-loop Control Switch'),
+    Register('GC', 273, 2, True, 0.001, '', 'RW', 'Torque Command of Internal Torque Mode'),
+    Register('CC', 275, 2, True, 0.001, '', 'RW', '1st Torque Limit'),
+    Register('CV', 277, 2, True, 0.001, '', 'RW', 'Target Value of Torque Arrival'),
+    Register('HC', 279, 2, True, 0.001, '', 'RW', 'Torque Limit of Hardstop Homing'),
+    Register('CL', 281, 2, True, 1.0, 'ms', 'RW', 'Current Foldback Continuous Time'),
+    Register('LD', 283, 2, False, 1.0, '', 'RW', 'Torque Limit Method'),
+    Register('RN', 285, 2, False, 1.0, '', 'RW', 'Rotational Direction Setup'),
+    Register('PR', 289, 2, False, 1.0, '', 'RW', 'Communication Protocol'),
+    Register('TD', 291, 2, True, 1.0, 'ms', 'RW', 'Transmit Delay'),
+    Register('BR', 293, 2, False, 1.0, '', 'RW', 'RS-485 Baud Rate'),
+    Register('DA', 295, 2, False, 1.0, '', 'RW', 'RS-485 Address'),
+    Register('CO', 297, 2, False, 1.0, '', 'RW', 'CANopen/IP Node ID'),
+    Register('CANOPEN_BAUD_RATE', 299, 2, False, 1.0, '', 'RW', 'CANopen Baud Rate'),
+    Register('ZR', 301, 2, True, 1.0, 'Ω', 'RW', 'Regeneration Resistor Value'),
+    Register('ZW', 303, 2, True, 1.0, 'W', 'RW', 'Regeneration Resistor Wattage'),
+    Register('ZT', 305, 2, True, 1.0, 'ms', 'RW', 'Regeneration Resistor Time Constant'),
+    Register('PK', 307, 2, False, 1.0, '', 'RW', 'Keypad Setting Lock'),
+    Register('DD', 309, 2, False, 1.0, '', 'RW', 'Default Display'),
+    Register('MA', 311, 2, False, 1.0, '', 'RW', 'Alarm Mask'),
+    Register('CX', 313, 2, True, 0.001, '', 'RW', '2nd Torque Limit'),
+    Register('CY', 315, 2, True, 0.001, '', 'RW', '3rd Torque Limit'),
+    Register('CZ', 317, 2, True, 0.001, '', 'RW', '4th Torque Limit'),
+    Register('HT', 319, 2, True, 1.0, 'ms', 'RW', 'Motor Stall Protection Time'),
+    Register('YV', 321, 2, False, 1.0, '', 'RW', 'Dynamic Brake Sequence when Servo Off'),
+    Register('YR', 323, 2, False, 1.0, '', 'RW', 'Dynamic Brake Sequence when Fault Occurs'),
+    Register('YM', 325, 2, True, 1.0, 'ms', 'RW', 'Dynamic Brake Action Time during Deceleration of Servo Off'),
+    Register('YN', 327, 2, True, 1.0, 'ms', 'RW', 'Dynamic Brake Action Time during Deceleration when Fault Occurs'),
+    Register('OT', 329, 2, False, 1.0, '', 'RW', 'Main Power Phase Lost Detecting'),
+    Register('RT', 331, 2, True, 0.001, '', 'RW', 'Current Ramp Limit'),
+    Register('DW', 333, 2, True, 0.1, 'V', 'RW', 'Dumping Circuit Working Voltage (Only for MBDV)'),
+    Register('AM', 335, 2, True, 0.16666666666666666, 'rps/s', 'RW', 'Max Brake Deceleration'),
+    Register('VM', 337, 2, True, 0.004166666666666667, 'rps', 'RW', 'Max Velocity'),
+    Register('JA', 339, 2, True, 0.16666666666666666, 'rps/s', 'RW', 'Jog Accel'),
+    Register('JL', 341, 2, True, 0.16666666666666666, 'rps/s', 'RW', 'Jog Decel'),
+    Register('JS', 343, 2, True, 0.004166666666666667, 'rps', 'RW', 'Jog Velocity'),
+    Register('AC', 345, 2, True, 0.16666666666666666, 'rps/s', 'RW', 'Point-to-Point Accel'),
+    Register('DE', 347, 2, True, 0.16666666666666666, 'rps/s', 'RW', 'Point-to-Point Decel'),
+    Register('VE', 349, 2, True, 0.004166666666666667, 'rps', 'RW', 'Point-to-Point Velocity'),
+    Register('DI', 351, 2, True, 1.0, 'pulses', 'RW', 'Point-to-Point Distance'),
+    Register('DC', 353, 2, True, 1.0, 'pulses', 'RW', 'Point-to-Point Change Distance'),
+    Register('VC', 355, 2, True, 0.004166666666666667, 'rps', 'RW', 'Point-to-Point Change Velocity'),
+    Register('HA1', 357, 2, True, 0.16666666666666666, 'rps/s', 'RW', 'Homing Accel /Decel'),
+    Register('HV1', 361, 2, True, 0.004166666666666667, 'rps', 'RW', 'Homing Velocity 1'),
+    Register('HV2', 363, 2, True, 0.004166666666666667, 'rps', 'RW', 'Homing Velocity 2'),
+    Register('HO', 365, 2, True, 1.0, 'pulses', 'RW', 'Homing Offset'),
+    Register('JC1', 367, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 1'),
+    Register('JC2', 369, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 2'),
+    Register('JC3', 371, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 3'),
+    Register('JC4', 373, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 4'),
+    Register('JC5', 375, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 5'),
+    Register('JC6', 377, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 6'),
+    Register('JC7', 379, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 7'),
+    Register('JC8', 381, 2, True, 0.004166666666666667, 'rps', 'RW', 'Internal Velocity Control: Speed 8'),
+    Register('JT', 383, 2, True, 1.0, 'ms', 'RW', 'Jerk Time'),
+    Register('KJ', 385, 2, True, 1.0, 'ms', 'RW', 'Jerk Filter'),
+    Register('FF', 387, 2, True, 1.0, 'ms', 'RW', 'Interpolation Filter'),
+    Register('VT', 389, 2, True, 0.004166666666666667, 'rps', 'RW', 'Velocity Limit of Torque Mode'),
+    Register('DV', 391, 2, True, 0.004166666666666667, 'rps', 'RW', 'Dynamic Brake Velocity'),
+    Register('ZE', 393, 2, False, 1.0, '', 'RW', 'No COMM Detect Enable (Only for MBDV)'),
+    Register('ZS', 395, 2, True, 1.0, 'ms', 'RW', 'No COMM Detect Time (Only for MBDV)'),
+    Register('ZA', 397, 2, False, 1.0, '', 'RW', 'No COMM Detect Action (Only for MBDV)'),
+    Register('EN', 399, 2, False, 1.0, '', 'RW', 'Electronic Gear Ratio – Numerator'),
+    Register('EU', 401, 2, False, 1.0, '', 'RW', 'Electronic Gear Ratio - Denominator'),
+    Register('SZ', 403, 2, True, 0.1, 'μs', 'RW', 'Pulse Input Noise Filter'),
+    Register('PT', 405, 2, False, 1.0, '', 'RW', 'Pulse Input Setting'),
+    Register('PF', 407, 2, True, 1.0, 'pulses', 'RW', 'Position Error Limit'),
+    Register('EG', 409, 2, True, 1.0, 'pulses/rev', 'RW', 'Command Pulses per Revolution'),
+    Register('PV', 411, 2, False, 1.0, '', 'RW', 'Second Encoder Direction'),
+    Register('XT', 417, 2, True, 1.0, 'rev', 'RW', 'Hybrid Deviation Clear Setting'),
+    Register('XO', 419, 2, True, 1.0, 'pulses', 'RW', 'Hybrid Deviation Fault Threshold'),
+    Register('XR', 421, 2, True, 1.0, 'pulses/rev', 'RW', 'Second Encoder Resolution'),
+    Register('PO', 423, 2, False, 1.0, '', 'RW', 'Pulses Output Mode'),
+    Register('ON', 425, 2, False, 1.0, '', 'RW', 'Pulse Output Gear Ratio - Numerator'),
+    Register('OD', 427, 2, False, 1.0, '', 'RW', 'Pulse Output Gear Ratio - Denominator'),
+    Register('ES', 429, 2, False, 1.0, '', 'RW', 'Absolute Encoder Usage'),
+    Register('PU', 431, 2, False, 1.0, '', 'RW', 'Electronic Gearing Switch'),
+    Register('DYNAMIC_BRAKE_RESISTANCE_OHMS', 433, 2, True, 0.01, 'Ω', 'RW', 'Dynamic Brake Resistance Ohms'),
+    Register('DYNAMIC_BRAKE_RESISTANCE_POWER', 435, 2, True, 1.0, 'W', 'RW', 'Dynamic Brake Resistance Power'),
+    Register('FV', 437, 2, True, 1.0, 'rev', 'RW', 'Absolute Encoder Multi-turn Data Upper Limit @ ES=4'),
+    Register('AG', 443, 2, True, 0.004166666666666667, 'rps', 'RW', 'Analog Input Velocity Gain'),
+    Register('AN', 445, 2, True, 0.001, '', 'RW', 'Analog Input Torque Gain'),
+    Register('AV1', 447, 2, True, 1.0, 'mv', 'RW', 'Analog Input 1 Offset'),
+    Register('AV2', 449, 2, True, 1.0, 'mv', 'RW', 'Analog Input 2 Offset'),
+    Register('AD1', 451, 2, True, 1.0, 'mv', 'RW', 'Analog Input 1 Deadband'),
+    Register('AD2', 453, 2, True, 1.0, 'mv', 'RW', 'Analog Input 2 Deadband'),
+    Register('AF1', 455, 2, True, 0.1, 'Hz', 'RW', 'Analog Input 1 Filter'),
+    Register('AF2', 457, 2, True, 0.1, 'Hz', 'RW', 'Analog Input 2 Filter'),
+    Register('AT1', 459, 2, True, 1.0, 'mv', 'RW', 'Analog Input 1 Threshold'),
+    Register('AT2', 461, 2, True, 1.0, 'mv', 'RW', 'Analog Input 2 Threshold'),
+    Register('FA1', 463, 2, False, 1.0, '', 'RW', 'Velocity Limit Setting of Torque Control'),
+    Register('OS1', 473, 2, False, 1.0, '', 'RW', 'Analog Output 1 Scale'),
+    Register('OS2', 475, 2, False, 1.0, '', 'RW', 'Analog Output 2 Scale'),
+    Register('XA1', 477, 2, False, 1.0, '', 'RW', 'Analog Output 1 Function'),
+    Register('XA2', 479, 2, False, 1.0, '', 'RW', 'Analog Output 2 Function'),
+    Register('MU1', 491, 2, False, 1.0, '', 'RW', 'Digital Input 1 Function'),
+    Register('MU2', 493, 2, False, 1.0, '', 'RW', 'Digital Input 2 Function'),
+    Register('MU3', 495, 2, False, 1.0, '', 'RW', 'Digital Input 3 Function'),
+    Register('MU4', 497, 2, False, 1.0, '', 'RW', 'Digital Input 4 Function'),
+    Register('MU5', 499, 2, False, 1.0, '', 'RW', 'Digital Input 5 Function'),
+    Register('MU6', 501, 2, False, 1.0, '', 'RW', 'Digital Input 6 Function'),
+    Register('MU7', 503, 2, False, 1.0, '', 'RW', 'Digital Input 7 Function'),
+    Register('MU8', 505, 2, False, 1.0, '', 'RW', 'Digital Input 8 Function'),
+    Register('MU9', 507, 2, False, 1.0, '', 'RW', 'Digital Input 9 Function'),
+    Register('MUA', 509, 2, False, 1.0, '', 'RW', 'Digital Input 10 Function'),
+    Register('MO1', 519, 2, False, 1.0, '', 'RW', 'Digital Output 1 Function'),
+    Register('MO2', 521, 2, False, 1.0, '', 'RW', 'Digital Output 2 Function'),
+    Register('MO3', 523, 2, False, 1.0, '', 'RW', 'Digital Output 3 Function'),
+    Register('MO4', 525, 2, False, 1.0, '', 'RW', 'Digital Output 4 Function'),
+    Register('MO5', 527, 2, False, 1.0, '', 'RW', 'Digital Output 5 Function'),
+    Register('MO6', 529, 2, False, 1.0, '', 'RW', 'Digital Output 6 Function'),
+    Register('BD', 539, 2, True, 1.0, 'ms', 'RW', 'Move Command Waiting Time When Brake Release'),
+    Register('BE', 541, 2, True, 1.0, 'ms', 'RW', 'Servo-off Brake Engage Waiting Time'),
+    Register('HX', 545, 2, False, 1.0, '', 'RW', 'Home Sensor'),
+    Register('FI1', 547, 2, True, 1.0, 'ms', 'RW', 'Digital Input 1 Filter'),
+    Register('FI2', 549, 2, True, 1.0, 'ms', 'RW', 'Digital Input 2 Filter'),
+    Register('FI3', 551, 2, True, 1.0, 'ms', 'RW', 'Digital Input 3 Filter'),
+    Register('FI4', 553, 2, True, 1.0, 'ms', 'RW', 'Digital Input 4 Filter'),
+    Register('FI5', 555, 2, True, 1.0, 'ms', 'RW', 'Digital Input 5 Filter'),
+    Register('FI6', 557, 2, True, 1.0, 'ms', 'RW', 'Digital Input 6 Filter'),
+    Register('FI7', 559, 2, True, 1.0, 'ms', 'RW', 'Digital Input 7 Filter'),
+    Register('FI8', 561, 2, True, 1.0, 'ms', 'RW', 'Digital Input 8 Filter'),
+    Register('FI9', 563, 2, True, 1.0, 'ms', 'RW', 'Digital Input 9 Filter'),
+    Register('FIA', 565, 2, True, 1.0, 'ms', 'RW', 'Digital Input 10 Filter'),
+    Register('PL', 567, 2, True, 1.0, 'pulses', 'RW', 'Dynamic Follow Error Threshold'),
+    Register('PD', 569, 2, True, 1.0, 'pulses', 'RW', 'In-position Output Threshold'),
+    Register('PE', 571, 2, True, 1.0, 'ms', 'RW', 'Time Constant of Motion Output Condition'),
+    Register('TT', 573, 2, True, 1.0, 'ms', 'RW', 'Pulse Complete Timing'),
+    Register('ZV', 575, 2, True, 0.004166666666666667, 'rps', 'RW', 'Zero Speed Width'),
+    Register('VR', 577, 2, True, 0.004166666666666667, 'rps', 'RW', 'Speed Coincidence Width'),
+    Register('VV', 579, 2, True, 0.004166666666666667, 'rps', 'RW', 'Target Value of AT-speed'),
+    Register('TV', 581, 2, True, 0.001, '', 'RW', 'Torque Arrival Width'),
+    Register('DG', 583, 2, True, 1.0, 'pulses', 'RW', 'Near Target Position'),
+    Register('LP', 585, 2, True, 1.0, 'pulses', 'RW', 'Positive Software Limit'),
+    Register('LM', 587, 2, True, 1.0, 'pulses', 'RW', 'Negative Software Limit'),
+    Register('HE', 589, 2, True, 1.0, '', 'RW', 'Homing Method'),
+    Register('EO', 591, 2, False, 1.0, '', 'RW', 'Emergency Stop'),
+    Register('MS', 593, 2, False, 1.0, '', 'RW', 'Zero Speed Clamp Function in Velocity Mode'),
+)
+
+REGISTERS_BY_NAME = {register.name: register for register in REGISTERS}
+REGISTERS_BY_ADDRESS = {register.address: register for register in REGISTERS}
@@ -0,0 +1,372 @@
+import random
+import sys
+import threading
+import time
+from MDXT_modbus_registers import CMD_WORD
+from instrumentation import pdu_bytes
+
+# Modbus exception codes after which the request was not executed and may be sent again
+ACKNOWLEDGE = 5
+SLAVE_DEVICE_BUSY = 6
+BUSY_EXCEPTION_CODES = (ACKNOWLEDGE, SLAVE_DEVICE_BUSY)
+
+
+class AMP_ModbusError(Exception):
+    """
+    A Modbus transaction that failed. Subclasses tell why, catch this class to handle every failure.
+    Like a Pymodbus error response, an instance answers isError() with True, so a retrying client
+    can return it in place of the response it stands for.
+    """
+
+    def __init__(self, message, response=None, exception_code=None):
+        super().__init__(message)
+        self.response = response
+        self.exception_code = exception_code
+
+    def isError(self):
+        return True
+
+
+class AMP_TimeoutError(AMP_ModbusError, TimeoutError):
+    """
+    No answer arrived within the response timeout: the request or the response was lost.
+    """
+
+
+class AMP_CRCError(AMP_ModbusError):
+    """
+    An answer arrived but could not be decoded: bad CRC, truncated or garbled frame.
+    """
+
+
+class AMP_ConnectionError(AMP_ModbusError, ConnectionError):
+    """
+    The serial port or TCP connection could not be opened or was closed.
+    """
+
+
+class AMP_ExceptionCodeError(AMP_ModbusError):
+    """
+    The drive answered with a Modbus exception response, see exception_code.
+    """
+
+
+class AMP_SlaveBusyError(AMP_ExceptionCodeError):
+    """
+    The drive answered with exception code 5 (acknowledge) or 6 (slave device busy), the request
+    was not executed and can be sent again later.
+    """
+
+
+def connection_errors() -> tuple:
+    """
+    :return: The exception types raised when a connection cannot be opened or was lost: OSError, which includes
+    ConnectionError, and Pymodbus' ConnectionException once a client has loaded Pymodbus
+    """
+    exceptions = sys.modules.get('pymodbus.exceptions')
+    return (OSError,) if exceptions is None else (OSError, exceptions.ConnectionException)
+
+
+def bus_errors() -> tuple:
+    """
+    The exceptions a failed transaction may raise, for use in an except clause, e.g. except bus_errors():
+    :return: AMP_ModbusError and the connection_errors()
+    """
+    return (AMP_ModbusError,) + connection_errors()
+
+
+def error_type(response, elapsed=None, timeout=None):
+    """
+    Tells which AMP_ModbusError a failed response, or an exception raised by a client, stands for.
+    Pymodbus reports a missing answer and an undecodable one with the same error; an error that came
+    back well before the timeout means bytes did arrive, so it is taken as a CRC error.
+    :param response: The error response or exception.
+    :param elapsed: Seconds the transaction took, if known.
+    :param timeout: Response timeout the transaction was sent with, if known.
+    :return: An AMP_ModbusError subclass
+    """
+    if isinstance(response, AMP_ModbusError):
+        return type(response)
+    code = getattr(response, 'exception_code', None)
+    if code is not None:
+        return AMP_SlaveBusyError if code in BUSY_EXCEPTION_CODES else AMP_ExceptionCodeError
+    if isinstance(response, TimeoutError):
+        return AMP_TimeoutError
+    if isinstance(response, connection_errors()):
+        return AMP_ConnectionError
+    if elapsed is not None and timeout is not None and elapsed < 0.8 * timeout:
+        return AMP_CRCError
+    return AMP_TimeoutError
+
+
+def modbus_error(message, response, elapsed=None, timeout=None) -> AMP_ModbusError:
+    """
+    :param message: What failed, e.g. 'Unable to retrieve current position'.
+    :param response: The error response or exception, see error_type().
+    :return: The matching AMP_ModbusError, ready to be raised
+    """
+    original = response.response if isinstance(response, AMP_ModbusError) else response
+    return error_type(response, elapsed, timeout)('{}. {}'.format(message, response), original,
+                                                  getattr(response, 'exception_code', None))
+
+
+def set_client_timeout(client, timeout):
+    """
+    Changes the response timeout of a connected client: Pymodbus clients, their pooled connections
+    and AMP_PipelinedTcpClient.
+    """
+    setter = getattr(client, 'set_timeout', None)
+    if setter is not None:
+        setter(timeout)
+        return
+    params = getattr(client, 'comm_params', None)
+    if params is None:
+        client.timeout = timeout
+        return
+    params.timeout_connect = timeout
+    port = getattr(client, 'socket', None)
+    if port is not None and hasattr(port, 'inter_byte_timeout'):
+        port.timeout = timeout  # A pyserial port, the timeout is applied when the port opens
+
+
+def _client_baudrate(client):
+    baudrate = getattr(client, 'baudrate', None)
+    if baudrate is None:
+        baudrate = getattr(getattr(client, 'comm_params', None), 'baudrate', None)
+    return baudrate if baudrate is not None and baudrate > 0 else None  # Pymodbus TCP clients report -1
+
+
+class AMP_RetryPolicy(object):
+
+    def __init__(self, retries=2, min_timeout=0.005, max_timeout=1.0, baudrate=None, backoff=0.002,
+                 busy_backoff=0.05, jitter=0.5, bits_per_char=10):
+        """
+        How failed transactions are detected and recovered. The response timeout adapts to the drives:
+        it follows the measured turnaround time and its deviation (the way TCP sets its retransmission
+        timeout) plus the time the frames take on the line at the baud rate. Timeouts, CRC errors and busy
+        drives are retried a bounded number of times after a short randomized delay.
+        Share one policy between the motors of a bus, they share its round trip measurements.
+        :param retries: Attempts after the first one before giving up.
+        :param min_timeout: Shortest response timeout, in seconds.
+        :param max_timeout: Longest response timeout, also used until the first round trip is measured.
+        :param baudrate: Serial baud rate, taken from the client when None. Leave None for TCP.
+        :param backoff: Seconds before the first retry of a lost or garbled frame, doubled on each retry.
+        :param busy_backoff: Seconds before the first retry of a busy drive, doubled on each retry.
+        :param jitter: Random extra delay, as a fraction of the delay, so masters do not retry in lockstep.
+        :param bits_per_char: Bits per byte on the line, 10 for 8N1, 11 with parity or two stop bits.
+        """
+        self.retries = retries
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.baudrate = baudrate
+        self.backoff = backoff
+        self.busy_backoff = busy_backoff
+        self.jitter = jitter
+        self.bits_per_char = bits_per_char
+        self.turnaround = None  # Smoothed drive turnaround, without the time on the line
+        self.deviation = 0.0
+        self.attempts = 0
+        self.failures = {AMP_TimeoutError: 0, AMP_CRCError: 0, AMP_SlaveBusyError: 0}
+        self.recovered = 0
+        self._lock = threading.Lock()
+
+    def line_time(self, function_code, count, baudrate=None) -> float:
+        """
+        :return: Seconds the request and the response take on a serial line, 0 without a baud rate
+        """
+        baudrate = baudrate or self.baudrate
+        if not baudrate:
+            return 0.0
+        characters = pdu_bytes(function_code, count) + 2 * 3 + 2 * 3.5  # Slave id, CRC and the silent intervals
+        return characters * self.bits_per_char / baudrate
+
+    def timeout(self, function_code, count, baudrate=None, attempt=0) -> float:
+        """
+        :param attempt: 0 for the first attempt, the timeout doubles with each retry.
+        :return: The response timeout for a transaction, in seconds
+        """
+        if self.turnaround is None:
+            return self.max_timeout
+        timeout = self.line_time(function_code, count, baudrate) + self.turnaround + max(4 * self.deviation, 0.002)
+        return min(max(timeout * 2 ** attempt, self.min_timeout), self.max_timeout)
+
+    def record(self, function_code, count, elapsed, baudrate=None):
+        """
+        Feeds the round trip time of a successful transaction into the timeout estimate.
+        """
+        sample = max(elapsed - self.line_time(function_code, count, baudrate), 0.0)
+        with self._lock:
+            if self.turnaround is None:
+                self.turnaround, self.deviation = sample, sample / 2
+            else:
+                self.deviation += 0.25 * (abs(sample - self.turnaround) - self.deviation)
+                self.turnaround += 0.125 * (sample - self.turnaround)
+
+    def delay(self, error, attempt) -> float:
+        """
+        :return: Seconds to wait before retry number attempt (1 for the first retry)
+        """
+        base = self.busy_backoff if issubclass(error, AMP_SlaveBusyError) else self.backoff
+        return base * 2 ** (attempt - 1) * (1 + self.jitter * random.random())
+
+    def should_retry(self, error, function_code, address, count, attempt) -> bool:
+        """
+        Timeouts, CRC errors and busy drives are retried. A lost answer to a write of the SCL command word
+        is not: the command may already have run, and running a relative move twice is worse than failing.
+        """
+        if attempt > self.retries or not issubclass(error, (AMP_TimeoutError, AMP_CRCError, AMP_SlaveBusyError)):
+            return False
+        if function_code != 3 and address <= CMD_WORD < address + count:
+            return issubclass(error, AMP_SlaveBusyError)
+        return True
+
+    def count_failure(self, error):
+        with self._lock:
+            for kind in self.failures:
+                if issubclass(error, kind):
+                    self.failures[kind] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'timeouts': self.failures[AMP_TimeoutError],
+                'crc_errors': self.failures[AMP_CRCError],
+                'busy': self.failures[AMP_SlaveBusyError],
+                'recovered': self.recovered,
+                'turnaround': self.turnaround,
+                'deviation': self.deviation,
+            }
+
+
+class AMP_RetryingClient(object):
+
+    def __init__(self, client, policy):
+        """
+        Wraps a modbus client and applies an AMP_RetryPolicy to every call. A call that still fails after
+        the last retry returns the AMP_ModbusError describing the failure, which answers isError() like a
+        Pymodbus error response. Attributes other than the Modbus calls are passed through to the wrapped client.
+        """
+        self.client = client
+        self.policy = policy
+        self.baudrate = policy.baudrate or _client_baudrate(client)
+        self._local = threading.local()
+        if hasattr(client, 'submit_read_holding_registers'):
+            self.submit_read_holding_registers = self._submit_read_holding_registers
+        if hasattr(client, 'submit_write_registers'):
+            self.submit_write_registers = self._submit_write_registers
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    @property
+    def last_retries(self) -> int:
+        """
+        Retries made by the last call of the current thread.
+        """
+        return getattr(self._local, 'retries', 0)
+
+    def _outcome(self, function_code, count, started, timeout, attempt, response=None, exception=None):
+        # Returns None for a success, else the AMP_ModbusError subclass of the failure
+        elapsed = time.perf_counter() - started
+        if exception is None and not response.isError():
+            if attempt == 0:  # The answer to a retry may belong to an earlier attempt, it is not measured
+                self.policy.record(function_code, count, elapsed, self.baudrate)
+            return None
+        return error_type(exception if exception is not None else response, elapsed, timeout)
+
+    def _call(self, function_code, address, size, method, *args, **kwargs):
+        policy = self.policy
+        attempt = 0
+        while True:
+            timeout = policy.timeout(function_code, size, self.baudrate, attempt)
+            set_client_timeout(self.client, timeout)
+            policy.attempts += 1
+            started = time.perf_counter()
+            response = None
+            try:
+                response = method(*args, **kwargs)
+                if response is None:  # No response expected
+                    self._local.retries = attempt
+                    return None
+                error = self._outcome(function_code, size, started, timeout, attempt, response)
+            except connection_errors() as exc:
+                error = self._outcome(function_code, size, started, timeout, attempt, exception=exc)
+                if issubclass(error, AMP_ConnectionError):
+                    raise modbus_error('Connection failed', exc) from exc
+                response = exc
+            if error is None:
+                policy.recovered += attempt > 0
+                self._local.retries = attempt
+                return response
+            policy.count_failure(error)
+            attempt += 1
+            if not policy.should_retry(error, function_code, address + 1, size, attempt):
+                self._local.retries = attempt - 1
+                return modbus_error('No valid answer after {} attempts'.format(attempt), response,
+                                    time.perf_counter() - started, timeout)
+            time.sleep(policy.delay(error, attempt))
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        return self._call(3, address, count, self.client.read_holding_registers, address, count=count, slave=slave)
+
+    def write_register(self, address, value, slave=1):
+        return self._call(6, address, 1, self.client.write_register, address, value, slave=slave)
+
+    def write_registers(self, address, values, slave=1, no_response_expected=False):
+        return self._call(16, address, len(values), self.client.write_registers, address, values, slave=slave,
+                          no_response_expected=no_response_expected)
+
+    def _submit_read_holding_registers(self, address, count=1, slave=1):
+        return self._submit(3, address, count, self.client.submit_read_holding_registers, address, count=count,
+                            slave=slave)
+
+    def _submit_write_registers(self, address, values, slave=1, no_response_expected=False):
+        return self._submit(16, address, len(values), self.client.submit_write_registers, address, values,
+                            slave=slave, no_response_expected=no_response_expected)
+
+    def _submit(self, function_code, address, size, submit, *args, **kwargs):
+        # Retries are sent from the wrapped client's completion callback, the number of retries
+        # made is left in the returned future's retries attribute.
+        from concurrent.futures import Future  # Only pipelining clients need it, it pulls in logging
+        policy, result = self.policy, Future()
+        result.retries = 0
+
+        def attempt(number):
+            timeout = policy.timeout(function_code, size, self.baudrate, number)
+            set_client_timeout(self.client, timeout)
+            policy.attempts += 1
+            started = time.perf_counter()
+            try:
+                future = submit(*args, **kwargs)
+            except Exception as exc:
+                result.set_exception(exc)
+                return
+
+            def done(future):
+                exception = future.exception()
+                response = None if exception is not None else future.result()
+                if exception is None and response is None:  # No response expected
+                    result.set_result(None)
+                    return
+                error = self._outcome(function_code, size, started, timeout, number, response, exception)
+                if error is None:
+                    policy.recovered += number > 0
+                    result.set_result(response)
+                    return
+                policy.count_failure(error)
+                if issubclass(error, AMP_ConnectionError) and exception is not None:
+                    result.set_exception(exception)
+                elif policy.should_retry(error, function_code, address + 1, size, number + 1):
+                    result.retries = number + 1
+                    timer = threading.Timer(policy.delay(error, number + 1), attempt, (number + 1,))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    result.set_result(modbus_error('No valid answer after {} attempts'.format(number + 1),
+                                                   exception if exception is not None else response,
+                                                   time.perf_counter() - started, timeout))
+            future.add_done_callback(done)
+
+        attempt(0)
+        return result
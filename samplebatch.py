@@ -0,0 +1,166 @@
+import struct
+from array import array
+from ampcodec import DEFAULT_CODEC, _FORMATS
+from snapshot import DEFAULT_MAX_GAP, TELEMETRY_FIELDS, plan_block_reads
+
+# Bytes a buffered sample of every telemetry field may take in a SampleBatch, checked by membench.py:
+# no more than a row of one 8 byte value per field plus its 8 byte timestamp
+SAMPLE_BUDGET_BYTES = 8 * (len(TELEMETRY_FIELDS) + 1)
+
+
+def field_typecode(name) -> str:
+    """
+    :param name: A field name from snapshot.TELEMETRY_FIELDS.
+    :return: The smallest array typecode that holds the field's values
+    """
+    _, count, signed = TELEMETRY_FIELDS[name]
+    if count == 2:
+        return 'i' if signed else 'q'
+    return 'h' if signed else 'H'
+
+
+class MotorSample(object):
+    """
+    One row of a SampleBatch. It holds no values of its own, fields are decoded from the batch when read.
+    """
+    __slots__ = ('batch', 'row')
+
+    def __init__(self, batch, row):
+        self.batch = batch
+        self.row = row
+
+    @property
+    def t_ns(self):
+        return self.batch.t_ns[self.row]
+
+    @property
+    def valid(self):
+        return bool(self.batch.valid[self.row])
+
+    def as_dict(self):
+        """
+        :return: A dictionary of every field of the row, None for every field of an invalid row
+        """
+        batch = self.batch
+        if not batch.valid[self.row]:
+            return dict.fromkeys(batch.names)
+        return dict(zip(batch.names, batch.row_struct.unpack_from(batch.raw, self.row * batch.row_size)))
+
+    def __getattr__(self, name):
+        batch = self.batch
+        if name not in batch.names:
+            raise AttributeError(name)
+        if not batch.valid[self.row]:
+            return None
+        return batch.row_struct.unpack_from(batch.raw, self.row * batch.row_size)[batch.names.index(name)]
+
+    def __repr__(self):
+        return 'MotorSample(t_ns={}, {})'.format(
+            self.t_ns, ', '.join('{}={}'.format(k, v) for k, v in self.as_dict().items()))
+
+
+class SampleBatch(object):
+
+    def __init__(self, fields=None, size=4096, max_gap=DEFAULT_MAX_GAP, codec=DEFAULT_CODEC):
+        """
+        A preallocated columnar buffer of telemetry samples from one motor. append() copies the registers
+        of each block read straight into the batch's buffer with one struct.pack_into per block, no object
+        is created per field. columns() later decodes every row at once into one array per field.
+        :param fields: Iterable of field names from snapshot.TELEMETRY_FIELDS. Every field when None.
+        :param size: Rows the batch holds.
+        :param max_gap: Passed on to plan_block_reads. Unused registers read through are buffered as well,
+        a smaller gap saves memory at the cost of more block reads.
+        :param codec: The ampcodec.RegisterCodec matching the drive's byte and word order.
+        """
+        self.blocks = plan_block_reads(TELEMETRY_FIELDS if fields is None else fields, max_gap=max_gap)
+        self.size = size
+        self.codec = codec
+        self.count = 0
+        self.fields = tuple(TELEMETRY_FIELDS if fields is None else fields)
+
+        # Rows hold the blocks back to back, packed in the codec's register order. One Struct in the codec's
+        # value order then decodes a whole row, skipping the unused registers, as ampcodec.BlockLayout does.
+        names, layout, self._packers, offset = [], [codec.value_order], [], 0
+        for start, count, block_names in self.blocks:
+            self._packers.append((offset, count, struct.Struct('{}{}H'.format(codec.register_order, count))))
+            position = start
+            for name in sorted(block_names, key=lambda n: TELEMETRY_FIELDS[n][0]):
+                register, width, signed = TELEMETRY_FIELDS[name]
+                if register > position:
+                    layout.append('{}x'.format(2 * (register - position)))
+                layout.append(_FORMATS[(width, signed)])
+                position = register + width
+                names.append(name)
+            if start + count > position:
+                layout.append('{}x'.format(2 * (start + count - position)))
+            offset += 2 * count
+        self.names = tuple(names)
+        self.row_size = offset
+        self.row_struct = struct.Struct(''.join(layout))
+        assert self.row_struct.size == self.row_size
+
+        self.t_ns = array('q', bytes(8 * size))
+        self.valid = array('B', bytes(size))
+        self.raw = bytearray(self.row_size * size)
+        self._blank = bytes(self.row_size)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, row) -> MotorSample:
+        if not -self.count <= row < self.count:
+            raise IndexError('row {} out of range'.format(row))
+        return MotorSample(self, row % self.count)
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the batch's buffers.
+        """
+        return len(self.raw) + self.t_ns.itemsize * len(self.t_ns) + len(self.valid)
+
+    def append(self, t_ns, responses) -> bool:
+        """
+        Adds one row.
+        :param t_ns: Timestamp of the row, e.g. time.monotonic_ns().
+        :param responses: A register list per block of blocks, or None for a failed read.
+        :return: True when the batch is full
+        """
+        row = self.count
+        if row == self.size:
+            raise IndexError('SampleBatch is full')
+        offset = row * self.row_size
+        self.t_ns[row] = t_ns
+        if responses is None:
+            self.valid[row] = 0
+            self.raw[offset:offset + self.row_size] = self._blank
+        else:
+            self.valid[row] = 1
+            for (start, count, packer), registers in zip(self._packers, responses):
+                packer.pack_into(self.raw, offset + start, *registers[:count])
+        self.count = row + 1
+        return self.count == self.size
+
+    def columns(self) -> dict:
+        """
+        Decodes every row in one pass.
+        :return: A dictionary with a 't_ns' and a 'valid' array, and an array per field holding 0 for invalid rows
+        """
+        columns = {'t_ns': self.t_ns[:self.count], 'valid': self.valid[:self.count]}
+        with memoryview(self.raw) as raw:
+            values = zip(*self.row_struct.iter_unpack(raw[:self.count * self.row_size])) if self.count else ()
+            for name, column in zip(self.names, values):
+                columns[name] = array(field_typecode(name), column)
+        for name in self.names:
+            columns.setdefault(name, array(field_typecode(name)))
+        return columns
+
+    def clear(self):
+        """
+        Empties the batch so its buffers can be filled again.
+        """
+        self.count = 0
@@ -0,0 +1,303 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusServerContext, ModbusSlaveContext
+from pymodbus.exceptions import ModbusException, NoSuchSlaveException
+from pymodbus.server import ModbusTcpServer
+from pymodbus.server.async_io import ModbusServerRequestHandler
+from MDXT_modbus_registers import (CMD_WORD, IP, EP, IV, IQ, IU, IT, IT1, IX, DI, CC, VM, AC, DE, VE, AM, JA, JL, JS,
+                                   CM)
+from AMP_Opcodes import CJ, SJ, FL, FP, MD, ME, SK, SKD, AX
+from ampcodec import DEFAULT_CODEC
+from register_table import REGISTERS_BY_NAME
+from watcher import STATUS_ENABLED, STATUS_IN_POSITION, STATUS_MOVING, STATUS_JOGGING, STATUS_STOPPING, STATUS_ALARM
+
+REGISTER_COUNT = 600  # Covers every register of register_table.REGISTERS
+
+SPEED_MODE = 10  # CM value used by AMP_Motor.go_with_speed
+POSITION_MODE = 21  # CM value used by AMP_Motor.go_to_position
+
+_STEP = 0.001  # Largest integration step of the kinematics, in seconds
+_AL = REGISTERS_BY_NAME['AL'].address
+_SC = REGISTERS_BY_NAME['SC'].address
+_MODEL_NUMBER = REGISTERS_BY_NAME['MODEL_NUMBER'].address
+_DSP_FIRMWARE_VERSION = REGISTERS_BY_NAME['DSP_FIRMWARE_VERSION'].address
+
+
+class SimulatedDrive(ModbusSlaveContext):
+
+    def __init__(self, steps_per_rev=20000, latency=0.0, baudrate=None, model_number=0, firmware_version=0,
+                 drop_rate=0.0):
+        """
+        Modbus slave behaving like an AMP drive: the registers of MDXT_modbus_registers, SCL commands
+        written to the command word, and simple trapezoidal motion kinematics.
+        :param steps_per_rev: Pulses per revolution used to turn speed/acceleration registers into motion.
+        :param latency: Seconds the drive takes to answer each transaction.
+        :param baudrate: Emulates the time an RTU frame takes on a serial line of this baud rate, None to disable.
+        :param model_number: Value of the MODEL_NUMBER register.
+        :param firmware_version: Value of the DSP_FIRMWARE_VERSION register.
+        :param drop_rate: Fraction of requests that are lost and never answered, to exercise timeouts and retries.
+        """
+        super().__init__(hr=ModbusSequentialDataBlock(0, [0] * REGISTER_COUNT))
+        self.steps_per_rev = steps_per_rev
+        self.latency = latency
+        self.baudrate = baudrate
+        self.drop_rate = drop_rate
+        self.codec = DEFAULT_CODEC
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.alarm = 0
+        self.drivetemp = 350  # 0.1 degC
+        self.dsptemp = 300  # 0.1 degC
+        self.voltage = 480  # 0.1 V
+        self.position = 0.0  # pulses
+        self.velocity = 0.0  # pulses/s
+        self.acceleration = 0.0  # pulses/s^2, last applied
+        self.motion = None  # None, 'jog', 'move' or 'stop'
+        self.target = 0.0
+        self.target_velocity = 0.0
+        self.rate = 0.0
+        self.transactions = 0
+        self.dropped = 0
+        self.commands = []  # Executed SCL opcodes, in order
+        self._last = time.monotonic()
+        self._hr = self.store['h']
+        self._hr.values[_MODEL_NUMBER] = model_number
+        self._hr.values[_DSP_FIRMWARE_VERSION] = firmware_version
+        for register, value in ((CM, POSITION_MODE), (VE, 240), (AC, 600), (DE, 600), (JA, 600), (JL, 600),
+                                (JS, 240), (VM, 4800), (AM, 6000), (CC, 1000)):
+            self._set32(register, value)
+
+    def _get32(self, register):
+        return self.codec.decode(self._hr.values, 2, True, register)
+
+    def _set32(self, register, value):
+        self._hr.values[register:register + 2] = self.codec.encode(int(value), 2)
+
+    def _speed(self, register):
+        return abs(self._get32(register)) / 240.0 * self.steps_per_rev  # 1/240 rps to pulses/s
+
+    def _accel(self, register):
+        return max(abs(self._get32(register)), 1) / 6.0 * self.steps_per_rev  # 1/6 rps/s to pulses/s^2
+
+    def _drop(self):
+        # The server does not answer requests for a missing slave, the client sees a lost frame
+        if self.drop_rate and random.random() < self.drop_rate:
+            self.dropped += 1
+            raise NoSuchSlaveException('Request dropped')
+
+    def _wait(self, request_bytes, response_bytes):
+        delay = self.latency
+        if self.baudrate:
+            delay += (request_bytes + response_bytes) * 10.0 / self.baudrate  # 8N1: 10 bits per byte
+        if delay > 0:
+            time.sleep(delay)
+
+    def getValues(self, fc_as_hex, address, count=1):
+        with self.lock:
+            self._drop()
+            self._wait(8, 5 + 2 * count)
+            self.transactions += 1
+            self.update()
+            return super().getValues(fc_as_hex, address, count)
+
+    def setValues(self, fc_as_hex, address, values):
+        values = values if isinstance(values, list) else [values]
+        with self.lock:
+            self._drop()
+            self._wait(9 + 2 * len(values) if fc_as_hex == 16 else 8, 8)
+            self.transactions += 1
+            self.update()
+            super().setValues(fc_as_hex, address, values)
+            register, end = address + 1, address + 1 + len(values)  # The context is one based
+            if self._get32(CM) == POSITION_MODE and register <= DI + 1 and DI < end:
+                self._start_move(self._get32(DI))
+            if self._get32(CM) == SPEED_MODE and register <= JS + 1 and JS < end:
+                self._jog(self._get32(JS) / 240.0 * self.steps_per_rev, JA)
+            if register <= CMD_WORD < end:
+                self.execute(self._hr.values[CMD_WORD])
+
+    def execute(self, opcode):
+        """
+        Runs an SCL command as if it was written to the command word register.
+        """
+        self.commands.append(opcode)
+        if opcode == ME:
+            self.enabled = True
+        elif opcode == MD:
+            self.enabled = False
+            self.motion, self.velocity = None, 0.0
+        elif opcode == AX:
+            self.alarm = 0
+        elif opcode == CJ:
+            self._jog((1 if self._get32(JS) >= 0 else -1) * self._speed(JS), JA)
+        elif opcode == SJ:
+            self._stop(JL)
+        elif opcode == FL:
+            self._start_move(self.position + self._get32(DI))
+        elif opcode == FP:
+            self._start_move(self._get32(DI))
+        elif opcode == SK:
+            self._stop(AM)
+        elif opcode == SKD:
+            self._stop(DE)
+
+    def _jog(self, velocity, accel_register):
+        if self.enabled:
+            self.motion, self.target_velocity, self.rate = 'jog', velocity, self._accel(accel_register)
+
+    def _stop(self, decel_register):
+        if self.motion is not None:
+            self.motion, self.target_velocity, self.rate = 'stop', 0.0, self._accel(decel_register)
+
+    def _start_move(self, target):
+        if self.enabled:
+            self.motion, self.target = 'move', float(target)
+
+    def update(self, now=None):
+        """
+        Advances the kinematics to now and refreshes the telemetry registers.
+        """
+        now = time.monotonic() if now is None else now
+        elapsed, self._last = now - self._last, now
+        while self.motion is not None and elapsed > 0:
+            dt = min(elapsed, _STEP)
+            self._step(dt)
+            elapsed -= dt
+        if self.motion is None:
+            self.acceleration = 0.0
+        self._refresh()
+
+    def _step(self, dt):
+        previous = self.velocity
+        if self.motion == 'move':
+            remaining = self.target - self.position
+            direction = 1.0 if remaining >= 0 else -1.0
+            vmax, accel, decel = self._speed(VE), self._accel(AC), self._accel(DE)
+            if self.velocity * direction < 0:
+                self.velocity += direction * decel * dt
+            elif abs(remaining) <= self.velocity ** 2 / (2 * decel) + abs(self.velocity) * dt:
+                # Keep a crawl speed so the move always reaches its target
+                self.velocity = direction * max(abs(self.velocity) - decel * dt, decel * dt)
+            else:
+                self.velocity = direction * min(abs(self.velocity) + accel * dt, vmax)
+            self.position += self.velocity * dt
+            if (self.target - self.position) * direction <= 0:
+                self.position, self.velocity, self.motion = self.target, 0.0, None
+        else:
+            change = self.target_velocity - self.velocity
+            self.velocity += max(-self.rate * dt, min(self.rate * dt, change))
+            self.position += self.velocity * dt
+            if self.motion == 'stop' and self.velocity == 0.0:
+                self.motion = None
+        self.acceleration = (self.velocity - previous) / dt
+
+    def _refresh(self):
+        status = STATUS_ENABLED if self.enabled else 0
+        if self.motion is None:
+            status |= STATUS_IN_POSITION
+        else:
+            status |= STATUS_MOVING | {'jog': STATUS_JOGGING, 'stop': STATUS_STOPPING}.get(self.motion, 0)
+        if self.alarm:
+            status |= STATUS_ALARM
+        position = int(round(self.position))
+        current = (200 + int(abs(self.acceleration) / self.steps_per_rev)) if self.enabled else 0
+        values = self._hr.values
+        self._set32(_AL, self.alarm)
+        self._set32(_SC, status)
+        self._set32(IP, position)
+        self._set32(EP, position)
+        self._set32(IX, 0)
+        values[IV] = self.codec.encode(int(self.velocity / self.steps_per_rev * 240), 1)[0]
+        values[IT] = self.drivetemp
+        values[IT1] = self.dsptemp
+        values[IU] = self.voltage
+        values[IQ] = min(current, 0x7FFF)
+
+
+class _PipelinedRequestHandler(ModbusServerRequestHandler):
+    """
+    The pymodbus handler decodes one frame per received chunk, so pipelined requests arriving
+    in the same chunk would wait for the next one. Handles every complete frame instead.
+    """
+
+    async def inner_handle(self):
+        await super().inner_handle()
+        while self.databuffer:
+            try:
+                used_len, pdu = self.framer.processIncomingFrame(self.databuffer)
+            except ModbusException:
+                return
+            if not pdu:
+                return
+            self.databuffer = self.databuffer[used_len:]
+            self.execute(pdu, None)
+
+
+class _SimulatedTcpServer(ModbusTcpServer):
+
+    def callback_new_connection(self):
+        return _PipelinedRequestHandler(self)
+
+
+class AMP_SimulatedBus(object):
+
+    def __init__(self, slaves=(1,), host='127.0.0.1', port=None, framer='socket', **drive_options):
+        """
+        Modbus TCP server hosting one SimulatedDrive per slave, run on a background thread.
+        Transactions are handled one at a time, like a gateway in front of a serial bus.
+        :param slaves: Slave ids of the simulated drives.
+        :param host: Address to listen on.
+        :param port: Port to listen on, a free port is picked when None.
+        :param framer: 'socket' for Modbus TCP, 'rtu' for RTU frames over TCP. Serial clients reach an RTU bus
+        through the pyserial URL 'socket://host:port', see the url property.
+        :param drive_options: Keyword arguments passed to every SimulatedDrive, e.g. latency or baudrate.
+        """
+        self.host = host
+        self.port = port if port is not None else self._free_port(host)
+        self.framer = framer
+        self.drives = {slave: SimulatedDrive(**drive_options) for slave in slaves}
+        self.context = ModbusServerContext(slaves=self.drives, single=False)
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'socket://{}:{}'.format(self.host, self.port)
+
+    @staticmethod
+    def _free_port(host):
+        with socket.socket() as probe:
+            probe.bind((host, 0))
+            return probe.getsockname()[1]
+
+    def start(self):
+        started = threading.Event()
+
+        async def serve():
+            self._loop = asyncio.get_running_loop()
+            self._server = _SimulatedTcpServer(self.context, address=(self.host, self.port), framer=self.framer,
+                                               broadcast_enable=True, ignore_missing_slaves=True)
+            await self._server.listen()
+            started.set()
+            await self._server.serving
+
+        self._thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+        self._thread.start()
+        started.wait(5)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            asyncio.run_coroutine_threadsafe(self._server.shutdown(), self._loop).result(5)
+            self._thread.join(5)
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
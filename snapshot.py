@@ -0,0 +1,100 @@
+import time
+from ampcodec import DEFAULT_CODEC
+from register_table import REGISTERS_BY_NAME
+
+MAX_READ_COUNT = 125  # Most registers a single function 3 request may return
+DEFAULT_MAX_GAP = 8  # Unused registers we are willing to read to save a round trip
+
+# Telemetry fields that can be requested in a snapshot, and the register each one is read from.
+TELEMETRY_REGISTERS = {
+    'position': 'IP',
+    'encoder_position': 'EP',
+    'speed': 'IV',
+    'drivetemp': 'IT',
+    'dsptemp': 'IT1',
+    'voltage': 'IU',
+    'position_error': 'IX',
+    'current': 'IQ',
+}
+
+
+def register_spec(register):
+    """
+    :param register: A register_table.Register
+    :return: The (register, register count, signed) tuple used by the block read planner
+    """
+    return register.address, register.width, register.signed
+
+
+# name: (register, register count, signed)
+TELEMETRY_FIELDS = {field: register_spec(REGISTERS_BY_NAME[name]) for field, name in TELEMETRY_REGISTERS.items()}
+
+
+class MotorSnapshot(object):
+    """
+    Telemetry values of a single motor, decoded from one or more block reads.
+    Fields which were not requested, or not read in a partial snapshot, are left as None.
+    errors maps the fields of a partial snapshot that could not be read to their AMP_ModbusError.
+    """
+    __slots__ = ('timestamp', 'errors') + tuple(TELEMETRY_FIELDS)
+
+    def __init__(self, timestamp=None, **values):
+        self.timestamp = timestamp
+        self.errors = None
+        for name in TELEMETRY_FIELDS:
+            setattr(self, name, values.get(name))
+
+    def as_dict(self):
+        """
+        :return: A dictionary of every field that holds a value
+        """
+        return {name: getattr(self, name) for name in ('timestamp',) + tuple(TELEMETRY_FIELDS)
+                if getattr(self, name) is not None}
+
+    def __repr__(self):
+        return 'MotorSnapshot({})'.format(', '.join('{}={}'.format(k, v) for k, v in self.as_dict().items()))
+
+
+def plan_block_reads(fields, max_gap=DEFAULT_MAX_GAP, max_count=MAX_READ_COUNT, specs=TELEMETRY_FIELDS):
+    """
+    Plans the fewest contiguous block reads that cover the requested fields.
+    :param fields: Iterable of field names from specs.
+    :param max_gap: Largest number of unused registers allowed between two fields in the same block.
+    :param max_count: Largest number of registers a single block read may span.
+    :param specs: Dictionary of field name to (register, register count, signed). Defaults to TELEMETRY_FIELDS.
+    :return: A list of (register, count, [field names]) tuples, in register order
+    """
+    unknown = set(fields) - set(specs)
+    if unknown:
+        raise ValueError('Unknown fields: {}'.format(', '.join(sorted(unknown))))
+
+    blocks = []
+    for name in sorted(set(fields), key=lambda n: specs[n][0]):
+        register, count, _ = specs[name]
+        if blocks:
+            start, span, names = blocks[-1]
+            end = start + span
+            if register - end <= max_gap and register + count - start <= max_count:
+                blocks[-1] = (start, max(span, register + count - start), names + [name])
+                continue
+        blocks.append((register, count, [name]))
+    return blocks
+
+
+def decode_blocks(blocks, responses, timestamp=None, codec=DEFAULT_CODEC):
+    """
+    Builds a snapshot from the register lists returned for each planned block.
+    :param blocks: The plan returned by plan_block_reads.
+    :param responses: A list of register lists, one per block. None for a block that could not be read.
+    :param timestamp: Time at which the reads were issued.
+    :param codec: The ampcodec.RegisterCodec matching the drive's byte and word order.
+    :return: A MotorSnapshot
+    """
+    snapshot = MotorSnapshot(timestamp if timestamp is not None else time.time())
+    for (start, count, names), registers in zip(blocks, responses):
+        if registers is None:
+            continue
+        layout = codec.block(start, count, tuple((name,) + TELEMETRY_FIELDS[name] for name in names))
+        for name, value in zip(layout.names, layout.decode(registers)):
+            setattr(snapshot, name, value)
+    return snapshot
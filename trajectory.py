@@ -0,0 +1,174 @@
+import math
+import threading
+import time
+from collections import deque
+from MDXT_modbus_registers import AC, DE, VE, DI
+from retrypolicy import modbus_error
+
+POSITION_MODE = 21  # CM value used by AMP_Motor.go_to_position
+
+# AC, DE, VE and DI are contiguous, so a whole segment is loaded with one write.
+# Writing DI in position mode starts the move.
+_SEGMENT_REGISTERS = (AC, DE, VE, DI)
+assert _SEGMENT_REGISTERS == (AC, AC + 2, AC + 4, AC + 6)
+
+
+def move_profile(distance, start_speed, speed, accel, decel=None):
+    """
+    Predicts a trapezoidal move that starts at start_speed and ends at rest.
+    :param distance: Length of the move, any unit.
+    :param start_speed: Speed at the start of the move towards the target, unit/s.
+    :param speed: Cruise speed, unit/s.
+    :param accel: Acceleration, unit/s^2.
+    :param decel: Deceleration, unit/s^2. Same as accel when None.
+    :return: (duration, time at which deceleration starts, peak speed)
+    """
+    distance = abs(distance)
+    decel = accel if decel is None else decel
+    start_speed = min(max(start_speed, 0.0), speed)
+    if distance == 0 or speed <= 0 or accel <= 0 or decel <= 0:
+        return 0.0, 0.0, 0.0
+    accel_distance = (speed ** 2 - start_speed ** 2) / (2 * accel)
+    decel_distance = speed ** 2 / (2 * decel)
+    if accel_distance + decel_distance <= distance:
+        cruise = (distance - accel_distance - decel_distance) / speed
+        decel_start = (speed - start_speed) / accel + cruise
+        return decel_start + speed / decel, decel_start, speed
+    peak = math.sqrt((distance + start_speed ** 2 / (2 * accel)) / (1 / (2 * accel) + 1 / (2 * decel)))
+    decel_start = max(peak - start_speed, 0.0) / accel
+    return decel_start + peak / decel, decel_start, peak
+
+
+class AMP_TrajectoryStreamer(object):
+
+    def __init__(self, motor, steps_per_rev, lookahead=16):
+        """
+        Streams waypoints to one motor so it keeps moving between them. Each waypoint is loaded with a
+        single write of AC, DE, VE and DI, timed to arrive just before the current move starts to
+        decelerate, while the next waypoints are taken from the generator in the meantime.
+        Requires a drive that accepts a new DI target while a point-to-point move is running.
+        :param motor: The AMP_Motor to stream to.
+        :param steps_per_rev: Pulses per revolution, used to predict when each move will end.
+        :param lookahead: Number of waypoints prepared ahead of the one being executed.
+        """
+        self.motor = motor
+        self.steps_per_rev = steps_per_rev
+        self.lookahead = lookahead
+        self.latency = 0.01  # Estimated time of one segment write, refined while streaming
+        self.segments = 0  # Waypoints executed
+        self.writes = 0  # Segment writes sent, merged waypoints share one write
+        self.underruns = []  # Waypoint indexes that were loaded after the previous move ended
+        self._stop = threading.Event()
+
+    def _encode(self, waypoint, previous):
+        position, velocity, accel, decel = (tuple(waypoint) + (None, None, None))[:4]
+        velocity = previous[1] if velocity is None else velocity
+        accel = previous[2] if accel is None else accel
+        decel = previous[3] if decel is None else decel
+        if velocity is None or accel is None:
+            raise ValueError('The first waypoint needs a velocity and an acceleration')
+        codec = self.motor.codec
+        registers = codec.encode(accel, 2) + codec.encode(decel, 2) + codec.encode(velocity, 2) + codec.encode(position, 2)
+        return (position, velocity, accel, decel), registers
+
+    def _fill(self, buffer, waypoints, previous):
+        # Prepares waypoints until the look-ahead window is full or the generator is exhausted
+        while len(buffer) < self.lookahead:
+            waypoint = next(waypoints, None)
+            if waypoint is None:
+                return False
+            previous = buffer[-1][0] if buffer else previous
+            buffer.append(self._encode(waypoint, previous))
+        return True
+
+    def stream(self, waypoints, wait=True) -> dict:
+        """
+        Executes every waypoint of an iterable or generator.
+        :param waypoints: Iterable of (position, velocity, accel) or (position, velocity, accel, decel) in pulses,
+        SM speed units (1/240 rps) and SM acceleration units (1/6 rps/s). velocity, accel and decel may be None
+        to keep the previous values. Without a decel, the motor's current DE is kept.
+        :param wait: Wait for the predicted end of the last move before returning.
+        :return: A dictionary with the number of segments, underruns and elapsed time
+        """
+        self._stop.clear()
+        self.segments, self.writes, self.underruns = 0, 0, []
+        motor = self.motor
+        if motor.get_mode() != POSITION_MODE:
+            motor.set_control_mode(POSITION_MODE)
+        for register in _SEGMENT_REGISTERS:
+            motor.invalidate_cache(register)
+
+        waypoints = iter(waypoints)
+        buffer = deque()
+        more = self._fill(buffer, waypoints, (None, None, None, motor.read('DE')))
+        # Predicted position and speed of the motor when the next segment arrives
+        origin = target = motor.get_position()
+        direction = 0
+        started = time.monotonic()
+        send_at, ends_at, speed = started, started, 0.0
+
+        while buffer and not self._stop.is_set():
+            # Prepare more waypoints while the current move runs
+            while time.monotonic() < send_at and not self._stop.is_set():
+                if more and len(buffer) < self.lookahead:
+                    more = self._fill(buffer, waypoints, buffer[-1][0])
+                else:
+                    self._stop.wait(min(send_at - time.monotonic(), 0.001))
+            if self._stop.is_set():
+                break
+
+            if more:
+                more = self._fill(buffer, waypoints, buffer[-1][0])
+            segment, registers = buffer.popleft()
+            waypoint_count = 1
+            # A motor passes through waypoints that continue in the same direction with the same speed
+            # and acceleration, so only the furthest of them is sent and the motor keeps its speed
+            while buffer and buffer[0][0][1:] == segment[1:] and \
+                    (buffer[0][0][0] - segment[0]) * (segment[0] - origin) > 0:
+                segment, registers = buffer.popleft()
+                waypoint_count += 1
+            sent = time.monotonic()
+            if self.segments and sent > ends_at:
+                self.underruns.append(self.segments)
+                origin, speed = target, 0.0
+            response = motor.modbus_client.write_registers(AC - 1, registers, slave=motor.slave)
+            finished = time.monotonic()
+            if response.isError():
+                raise modbus_error('Unable to load trajectory segment {}'.format(self.segments), response)
+            self.latency += 0.2 * (finished - sent - self.latency)
+            self.segments += waypoint_count
+            self.writes += 1
+
+            target, velocity, accel, decel = segment
+            distance = target - origin
+            if (distance > 0) - (distance < 0) != direction:
+                speed = 0.0  # Direction change, the move starts from rest
+            direction = (distance > 0) - (distance < 0)
+            accel = abs(accel) / 6.0 * self.steps_per_rev
+            decel = abs(decel) / 6.0 * self.steps_per_rev
+            duration, decel_start, speed = move_profile(distance, speed, abs(velocity) / 240.0 * self.steps_per_rev,
+                                                        accel, decel)
+            ends_at = finished + duration
+            # The next segment is due when this move would start to decelerate
+            send_at = finished + decel_start - self.latency
+            origin = target - direction * speed ** 2 / (2 * decel)
+            if more and not buffer:
+                more = self._fill(buffer, waypoints, segment)
+
+        if self._stop.is_set():
+            motor.stop_motor()
+        elif wait:
+            self._stop.wait(max(ends_at - time.monotonic(), 0.0))
+        return {
+            'segments': self.segments,
+            'writes': self.writes,
+            'underruns': len(self.underruns),
+            'elapsed': time.monotonic() - started,
+            'segment_latency': self.latency,
+        }
+
+    def stop(self):
+        """
+        Aborts a running stream and stops the motor. Safe to call from another thread.
+        """
+        self._stop.set()
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import deque
+from ampmotor import AMP_Motor
+from register_table import REGISTERS_BY_NAME
+from retrypolicy import bus_errors
+
+# Status code (SC) bits
+STATUS_ENABLED = 0x0001
+STATUS_FAULT = 0x0004
+STATUS_IN_POSITION = 0x0008
+STATUS_MOVING = 0x0010
+STATUS_JOGGING = 0x0020
+STATUS_STOPPING = 0x0040
+STATUS_ALARM = 0x0200
+
+# Registers read by every poll, one block read covers all of them
+WATCHED_REGISTERS = ('AL', 'SC', 'IP', 'IT', 'IT1', 'IU')
+WATCH_MAX_GAP = 12
+
+# Events, each condition emits the first name when it becomes true and the second when it clears
+EVENTS = {
+    'moving': ('move_started', 'move_done'),
+    'alarm': ('alarm', 'alarm_cleared'),
+    'overtemp': ('overtemp', 'overtemp_cleared'),
+    'undervoltage': ('undervoltage', 'undervoltage_cleared'),
+}
+
+
+class _WatchState(object):
+    __slots__ = ('motor', 'values', 'active', 'pending', 'interval', 'next_due', 'target', 'position', 'sampled')
+
+    def __init__(self, motor, interval):
+        self.motor = motor
+        self.values = None
+        self.active = dict.fromkeys(EVENTS, False)
+        self.pending = dict.fromkeys(EVENTS, 0)  # Consecutive samples disagreeing with active
+        self.interval = interval
+        self.next_due = 0.0
+        self.target = None
+        self.position = None
+        self.sampled = None
+
+
+class AMP_StatusWatcher(object):
+
+    def __init__(self, motors, min_interval=0.01, max_interval=1.0, backoff=1.5, overtemp=70.0, undervoltage=20.0,
+                 hysteresis=2.0, debounce=3):
+        """
+        Polls the alarm, status, position, temperature and voltage registers of one or more motors and
+        turns changes into events. Polling speeds up to min_interval whenever something changes or a move
+        is about to finish, and backs off towards max_interval while nothing happens.
+        :param motors: An AMP_Motor or a list of them.
+        :param min_interval: Shortest time between two polls of a motor, in seconds.
+        :param max_interval: Longest time between two polls of a motor, in seconds.
+        :param backoff: Factor the interval grows by after every poll without changes.
+        :param overtemp: Drive or DSP temperature, in degC, at which 'overtemp' is emitted.
+        :param undervoltage: DC bus voltage, in V, at which 'undervoltage' is emitted.
+        :param hysteresis: Margin, in degC or V, by which a value must recover before the event clears.
+        :param debounce: Consecutive polls a temperature or voltage condition must hold before it changes.
+        """
+        motors = [motors] if isinstance(motors, AMP_Motor) else list(motors)
+        self.states = [_WatchState(motor, min_interval) for motor in motors]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        # Thresholds in raw register units
+        self.overtemp = overtemp / REGISTERS_BY_NAME['IT'].scale
+        self.undervoltage = undervoltage / REGISTERS_BY_NAME['IU'].scale
+        self.temp_hysteresis = hysteresis / REGISTERS_BY_NAME['IT'].scale
+        self.voltage_hysteresis = hysteresis / REGISTERS_BY_NAME['IU'].scale
+        self.debounce = {'moving': 1, 'alarm': 1, 'overtemp': debounce, 'undervoltage': debounce}
+        self.polls = 0
+        self.errors = 0
+        self._callbacks = {}
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=256)  # Most recent (motor, event, value)
+        self._emitted = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on(self, event, callback):
+        """
+        Registers callback(motor, event, value) for an event name from EVENTS, or '*' for every event.
+        value is the alarm code for 'alarm', otherwise the dictionary of WATCHED_REGISTERS values.
+        Callbacks run on the watcher thread; use loop.call_soon_threadsafe to hand events to asyncio.
+        """
+        self._callbacks.setdefault(event, []).append(callback)
+
+    def expect_move(self, motor, target):
+        """
+        Tells the watcher a point-to-point move to target has been started on motor, so it can
+        poll quickly around the predicted arrival and report 'move_done' promptly.
+        """
+        for state in self.states:
+            if state.motor is motor:
+                state.target = target
+                state.interval = self.min_interval
+                state.next_due = time.monotonic()
+
+    def _conditions(self, state, values):
+        temperature = max(values['IT'], values['IT1'])
+        overtemp = state.active['overtemp']
+        undervoltage = state.active['undervoltage']
+        return {
+            'moving': bool(values['SC'] & STATUS_MOVING),
+            'alarm': values['AL'] != 0,
+            'overtemp': temperature >= self.overtemp - (self.temp_hysteresis if overtemp else 0),
+            'undervoltage': values['IU'] <= self.undervoltage + (self.voltage_hysteresis if undervoltage else 0),
+        }
+
+    def _emit(self, motor, event, value):
+        with self._condition:
+            self._events.append((motor, event, value))
+            self._emitted += 1
+            self._condition.notify_all()
+        for callback in self._callbacks.get(event, []) + self._callbacks.get('*', []):
+            callback(motor, event, value)
+
+    def poll(self, state) -> list:
+        """
+        Polls one motor and emits the events its values trigger.
+        :return: A list of (event, value) emitted by this poll
+        """
+        now = time.monotonic()
+        try:
+            values = state.motor.read_many(WATCHED_REGISTERS, max_gap=WATCH_MAX_GAP)
+        except bus_errors():
+            self.errors += 1
+            state.next_due = now + state.interval
+            return []
+        self.polls += 1
+
+        emitted = []
+        for condition, observed in self._conditions(state, values).items():
+            if observed == state.active[condition]:
+                state.pending[condition] = 0
+                continue
+            state.pending[condition] += 1
+            if state.values is None or state.pending[condition] >= self.debounce[condition]:
+                state.active[condition], state.pending[condition] = observed, 0
+                if state.values is None and not observed:
+                    continue  # Nothing to report on the first poll
+                event = EVENTS[condition][0 if observed else 1]
+                emitted.append((event, values['AL'] if condition == 'alarm' and observed else values))
+        if state.target is not None and not state.active['moving'] and values['IP'] == state.target \
+                and not any(event == 'move_done' for event, _ in emitted):
+            emitted.append(('move_done', values))  # The whole move happened between two polls
+        for event, value in emitted:
+            if event == 'move_done':
+                state.target = None
+            self._emit(state.motor, event, value)
+
+        changed = state.values is None or values['SC'] != state.values['SC'] or values['AL'] != state.values['AL']
+        if emitted or changed or any(state.pending.values()):
+            state.interval = self.min_interval
+        else:
+            state.interval = min(state.interval * self.backoff, self.max_interval)
+        if state.active['moving'] and state.target is not None and state.position is not None:
+            # Poll at half the predicted time to arrival, from the speed seen between the last two polls
+            speed = abs(values['IP'] - state.position) / max(now - state.sampled, 1e-6)
+            remaining = abs(state.target - values['IP'])
+            eta = remaining / speed if speed else self.max_interval
+            state.interval = min(max(eta / 2, self.min_interval), self.max_interval)
+        state.values, state.position, state.sampled = values, values['IP'], now
+        state.next_due = now + state.interval
+        return emitted
+
+    def step(self) -> bool:
+        """
+        Polls the motor that is due first, if any.
+        :return: True if a motor was polled
+        """
+        state = min(self.states, key=lambda s: s.next_due)
+        if state.next_due > time.monotonic():
+            return False
+        self.poll(state)
+        return True
+
+    def run(self, duration=None):
+        """
+        Polls until stop() is called or the duration has elapsed.
+        """
+        self._stop.clear()
+        end = None if duration is None else time.monotonic() + duration
+        while not self._stop.is_set() and (end is None or time.monotonic() < end):
+            if not self.step():
+                wait = min(s.next_due for s in self.states) - time.monotonic()
+                if end is not None:
+                    wait = min(wait, end - time.monotonic())
+                if wait > 0:
+                    self._stop.wait(wait)
+
+    def start(self):
+        """
+        Runs the watcher on a background thread.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def wait(self, event, motor=None, timeout=None):
+        """
+        Blocks until an event is emitted, e.g. watcher.wait('move_done', AMP_Axis1, timeout=10).
+        Only events emitted after the call are considered.
+        :return: The event's value, or None on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            seen = self._emitted
+            while True:
+                new = min(self._emitted - seen, len(self._events))
+                for emitted_motor, emitted, value in list(self._events)[len(self._events) - new:]:
+                    if emitted == event and (motor is None or emitted_motor is motor):
+                        return value
+                seen = self._emitted
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()